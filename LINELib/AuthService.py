@@ -1,19 +1,21 @@
-from typing import Optional, List, Dict, Any, Callable
+from typing import Optional, List, Dict, Any, Callable, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import urllib.parse
 import requests
 import os
 import json
-import time
 from .exceptions import LINEOAError
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
+from .storage import atomic_write_json
 
 class AuthService:
-	def __init__(self, channel_id: Optional[str] = None, channel_secret: Optional[str] = None, access_token: Optional[str] = None, cookie_store_path: Optional[str] = None):
+	def __init__(self, channel_id: Optional[str] = None, channel_secret: Optional[str] = None, access_token: Optional[str] = None, cookie_store_path: Optional[str] = None, max_workers: int = 8, element_timeout: float = 30, login_timeout: float = 600):
 		self.channel_id = channel_id
 		self.channel_secret = channel_secret
 		self.access_token = access_token
 		self.cookie_store_path = cookie_store_path
+		self.max_workers = max_workers
+		self.element_timeout = element_timeout
+		self.login_timeout = login_timeout
 
 	def get_uid_map_from_at_ids(self, at_id_list: List[str], chat_service: Any) -> Dict[str, str]:
 		"""
@@ -45,7 +47,7 @@ class AuthService:
 				if data.get("email") == email and "cookies" in data:
 					session = requests.Session()
 					for c in data["cookies"]:
-						session.cookies.set(c["name"], c["value"], domain=c.get("domain"))
+						session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path") or "/")
 					chat_cookies = {c["name"] for c in data["cookies"] if c.get("domain") == "chat.line.biz"}
 					for c in data["cookies"]:
 						if c["name"] not in chat_cookies and c.get("domain") in [".line.biz", ".manager.line.biz", "manager.line.biz", "account.line.biz"]:
@@ -55,6 +57,11 @@ class AuthService:
 			except Exception as e:
 				raise LINEOAError(f"Cookie storage load error: {e}")
 		if True:
+			# selenium is only needed for a fresh browser login; import it here to keep `import LINELib` fast
+			from selenium import webdriver
+			from selenium.webdriver.chrome.options import Options
+			from selenium.webdriver.support import expected_conditions as EC
+			from selenium.webdriver.support.ui import WebDriverWait
 			session = requests.Session()
 			user_info = {"user_name": None}
 			login_url = "https://account.line.biz/login?redirectUri=https%3A%2F%2Faccount.line.biz%2Foauth2%2Fcallback%3Fclient_id%3D10%26code_challenge%3D4x53SnbmZOYxDeiDFpINCIeh9t1HYiSmIY2E7CblxVY%26code_challenge_method%3DS256%26redirect_uri%3Dhttps%253A%252F%252Fmanager.line.biz%252Fapi%252Foauth2%252FbizId%252Fcallback%26response_type%3Dcode%26state%3DUxTSXVJiwgOWD4cnrk68RCXBwhPLPkBI"
@@ -63,76 +70,120 @@ class AuthService:
 			driver = webdriver.Chrome(options=chrome_options)
 			driver.get(login_url)
 			try:
-				time.sleep(1)
-				btn = driver.find_element("xpath", "/html/body/main/div[2]/div[1]/div[2]/toly-button")
+				wait = WebDriverWait(driver, self.element_timeout, poll_frequency=0.2)
+				btn = wait.until(EC.element_to_be_clickable(("xpath", "/html/body/main/div[2]/div[1]/div[2]/toly-button")))
 				btn.click()
-				time.sleep(1)
-				mail = driver.find_element("xpath", "/html/body/main/div[2]/div[1]/div[2]/div/div/form/div[2]/toly-input[1]/input")
+				mail = wait.until(EC.presence_of_element_located(("xpath", "/html/body/main/div[2]/div[1]/div[2]/div/div/form/div[2]/toly-input[1]/input")))
 				mail.send_keys(email)
 				pwd = driver.find_element("xpath", "/html/body/main/div[2]/div[1]/div[2]/div/div/form/div[2]/toly-input[2]/input")
 				pwd.send_keys(password)
 			except Exception:
-				time.sleep(1)
-			while True:
-				time.sleep(2)
-				try:
-					current_url = driver.current_url
-					if current_url.startswith("https://manager.line.biz/"):
-						break
-				except Exception as e:
-					raise LINEOAError(f"Error while checking current URL: {e}")
+				pass
+			# the user may have to finish 2FA in the browser, so this wait is long
+			try:
+				WebDriverWait(driver, self.login_timeout, poll_frequency=0.5).until(lambda d: d.current_url.startswith("https://manager.line.biz/"))
+			except Exception as e:
+				raise LINEOAError(f"Error while waiting for login redirect: {e}")
 			driver.get("https://chat.line.biz/")
-			time.sleep(2)
-			driver.get("https://chat.line.biz/api/v1/bots?limit=1000&noFilter=true")
-			time.sleep(2)
-			bots_json = None
+			WebDriverWait(driver, self.element_timeout, poll_frequency=0.2).until(lambda d: d.execute_script("return document.readyState") == "complete")
+			all_cookies = driver.get_cookies()[:]
+			for c in all_cookies:
+				session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path") or "/")
 			try:
-				pre = driver.find_element("tag name", "pre")
-				bots_json = json.loads(pre.text)
-			except Exception:
-				try:
-					bots_json = json.loads(driver.find_element("tag name", "body").text)
-				except Exception as e:
-					raise LINEOAError(f"Failed to parse bots JSON: {e}")
+				bots_resp = session.get("https://chat.line.biz/api/v1/bots?limit=1000&noFilter=true", headers={"Accept": "application/json, text/plain, */*"})
+				bots_json = bots_resp.json()
+			except Exception as e:
+				raise LINEOAError(f"Failed to parse bots JSON: {e}")
 			bot_ids = [b["botId"] for b in bots_json.get("list", []) if b.get("botId", "").startswith("U")]
-			all_cookies = driver.get_cookies()[:]
-			for bot_id in bot_ids:
-				url = f"https://chat.line.biz/{bot_id}"
-				driver.get(url)
-				time.sleep(2)
+			harvested, failed = self._harvest_bot_cookies(all_cookies, bot_ids)
+			all_cookies.extend(harvested)
+			for bot_id in failed:
+				# fall back to the browser for bots the HTTP replay could not open
+				driver.get(f"https://chat.line.biz/{bot_id}")
+				WebDriverWait(driver, self.element_timeout, poll_frequency=0.2).until(lambda d: d.execute_script("return document.readyState") == "complete")
 				all_cookies.extend(driver.get_cookies())
 			driver.quit()
-			seen = set()
-			combined_cookies_to_save = []
+			# later entries come from later visits, so they replace what the browser had at login
+			combined: Dict[Tuple[str, Optional[str], str], Dict[str, Any]] = {}
 			for cookie in all_cookies:
 				try:
-					key = (cookie['name'], cookie.get('domain'))
-					if key not in seen:
-						combined_cookies_to_save.append({
-							"name": cookie['name'],
-							"value": cookie['value'],
-							"domain": cookie.get('domain')
-						})
-						seen.add(key)
+					path = cookie.get('path') or "/"
+					combined[(cookie['name'], cookie.get('domain'), path)] = {
+						"name": cookie['name'],
+						"value": cookie['value'],
+						"domain": cookie.get('domain'),
+						"path": path
+					}
 				except Exception as e:
 					raise LINEOAError(f"Error while processing cookies: {e}")
+			combined_cookies_to_save = list(combined.values())
 			for c in combined_cookies_to_save:
 				try:
-					session.cookies.set(c["name"], c["value"], domain=c.get("domain"))
+					session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c["path"])
 				except Exception as e:
 					raise LINEOAError(f"Error while setting session cookies: {e}")
 			if self.cookie_store_path:
 				try:
-					with open(self.cookie_store_path, "w", encoding="utf-8") as f:
-						json.dump({
-							"user_name": user_info.get("user_name"),
-							"cookies": combined_cookies_to_save
-						}, f, ensure_ascii=False, indent=2)
+					atomic_write_json(self.cookie_store_path, {
+						"user_name": user_info.get("user_name"),
+						"cookies": combined_cookies_to_save
+					})
 				except Exception as e:
 					raise LINEOAError(f"Cookie storage save error: {e}")
 			return {"session": session, "user_info": user_info, "bot_ids": bot_ids}
 		raise LINEOAError("login_with_email_and_2fa failed: no valid login path")
 
+	def _harvest_bot_cookies(self, cookies: List[Dict[str, Any]], bot_ids: List[str]) -> Tuple[List[Dict[str, Any]], List[str]]:
+		"""
+		Replay the per-bot chat page visits over HTTP, in parallel, starting from the browser's cookies.
+		A visit only counts when the bot's own cookie is in the jar afterwards: the chat page is an SPA
+		shell that answers 200 even when the cookie is set later by its scripts, so those bots are
+		reported as failed and go through the browser instead
+		:param cookies: Cookies from the logged-in browser (selenium get_cookies format)
+		:param bot_ids: Bot IDs to visit
+		:return: (cookies set or changed by the visits, with their path; bot IDs whose visit failed)
+		 """
+		seeded = {(c["name"], c.get("domain"), c.get("path") or "/"): c["value"] for c in cookies}
+
+		def visit(bot_id: str) -> List[Dict[str, Any]]:
+			s = requests.Session()
+			for (name, domain, path), value in seeded.items():
+				s.cookies.set(name, value, domain=domain, path=path)
+			resp = s.get(f"https://chat.line.biz/{bot_id}", headers={"Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8"}, timeout=30)
+			resp.raise_for_status()
+			if not any(self._is_bot_cookie(bot_id, c.name, c.path) for c in s.cookies):
+				raise LINEOAError(f"chat page visit for {bot_id} did not set a per-bot cookie")
+			# only what the visit set or changed; the seeded browser cookies are already in the caller's list
+			return [
+				{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path}
+				for c in s.cookies
+				if seeded.get((c.name, c.domain, c.path)) != c.value
+			]
+
+		harvested: List[Dict[str, Any]] = []
+		failed: List[str] = []
+		if not bot_ids:
+			return harvested, failed
+		with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(bot_ids)))) as pool:
+			futures = {pool.submit(visit, bot_id): bot_id for bot_id in bot_ids}
+			for future in as_completed(futures):
+				try:
+					harvested.extend(future.result())
+				except Exception:
+					failed.append(futures[future])
+		return harvested, failed
+
+	@staticmethod
+	def _is_bot_cookie(bot_id: str, name: str, path: Optional[str] = None) -> bool:
+		"""
+		Whether a cookie belongs to one bot (its name or path carries the bot ID)
+		:param bot_id: Bot ID
+		:param name: Cookie name
+		:param path: Cookie path
+		:return: bool
+		 """
+		return bot_id in name or bot_id in (path or "")
+
 	def login_and_get_token(self, email: str, password: str, client_id: str, code_challenge: str, redirect_uri: str, state: str, session: Optional[requests.Session] = None) -> Optional[str]:
 		"""
 		Automate OAuth2 authentication flow with email and password only to obtain authorization code (code) template
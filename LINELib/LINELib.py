@@ -1,20 +1,34 @@
-from typing import Optional, List, Dict, Any, Callable
+from typing import Optional, List, Dict, Any, Callable, Iterable, Iterator
 from .AuthService import AuthService
 from .ChatService import ChatService
-from .util import ratelimiter, ratelimit_after
+from .util import IdMap, ratelimiter, ratelimit_after, default_idmap
+from . import jsoncodec
 from .exceptions import LINEOAError
-from .sse import SSEEvent
+from .sse import normalize_message
+from .cache import MetadataCache, ResponseCache
+from .models import BotRecord, ChatRecord
+from .watchdog import StreamWatchdog
+from .metrics import RATELIMIT_REJECTIONS, RATELIMIT_WAIT
+from .clock import ClockSync
+from .storage import CredentialStore, StateStore
+from .receipts import ReadReceipts
+from .typing_indicator import TypingIndicator
+from .cards import CardPool
+from .endpoints import AsyncEndpointClient, EndpointClient
 import os
 import requests
-import json
+import threading
 import time
 import random
+from functools import cached_property
 
 class LINELib:
 
-    def __init__(self, storage: Optional[str] = None, email: Optional[str] = None, password: Optional[str] = None, rate_limit: int = 18, rate_limit_window: float = 60, rate_limit_enabled: bool = True):
+    def __init__(self, storage: Optional[str] = None, email: Optional[str] = None, password: Optional[str] = None, rate_limit: int = 18, rate_limit_window: float = 60, rate_limit_enabled: bool = True, metadata_ttl: Optional[Dict[str, float]] = None, state_path: Optional[str] = None, response_ttl: Optional[Dict[str, float]] = None, response_cache_size: int = 512, card_pool_path: Optional[str] = None):
         self.storage = storage or "lineoa-storage.json"
-        self._storage_cache = None
+        self.credentials = CredentialStore(self.storage)
+        self._state_path = state_path or StateStore.path_for(self.storage)
+        self._lazy_lock = threading.RLock()
         self._rate_limit = rate_limit
         self._rate_limit_window = rate_limit_window
         self._rate_limit_enabled = rate_limit_enabled
@@ -27,6 +41,7 @@ class LINELib:
         except LINEOAError as e:
             if email and password:
                 login_result = self._auth.login_with_email_and_2fa(email, password, get_2fa_code_callback=None)
+                self.credentials.invalidate()
                 self._session = login_result.get("session")
                 self._user_info = login_result.get("user_info")
                 self._bot_ids = login_result.get("bot_ids", [])
@@ -39,65 +54,29 @@ class LINELib:
         if self._session is None:
             self._session = requests.Session()
         self._chat_service = ChatService()
-        self._bots = None
+        self.response_cache = ResponseCache(ttl=response_ttl, maxsize=response_cache_size)
+        self._chat_service.response_cache = self.response_cache
         self._bot_ids = getattr(self, "_bot_ids", [])
-        self._chats = None
-        self._provider = None
+        self.metadata = MetadataCache(self, ttl=metadata_ttl)
+        self._card_pool_path = card_pool_path or f"{os.path.splitext(self.storage)[0]}.cards.json"
 
     def _load_storage(self):
-        if getattr(self, "_storage_cache", None) is not None:
-            return self._storage_cache
-        if not os.path.exists(self.storage):
-            self._storage_cache = {}
-            return self._storage_cache
-        try:
-            with open(self.storage, "r", encoding="utf-8") as f:
-                self._storage_cache = json.load(f)
-        except Exception:
-            self._storage_cache = {}
-        return self._storage_cache
+        return self.credentials.load()
 
     def _save_storage(self, data):
-        self._storage_cache = data
-        with open(self.storage, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.credentials.save(data)
 
     def get_final_send_time(self):
-        data = self._load_storage()
-        return data.get("FinalsendTime")
+        return self.state.get("FinalsendTime")
 
     def set_final_send_time(self, timestamp):
-        data = self._load_storage()
-        data["FinalsendTime"] = timestamp
-        self._save_storage(data)
+        self.state.set("FinalsendTime", timestamp)
 
     def get_send_timestamps(self):
-        self._clean_send_timestamps()
-        data = self._load_storage()
-        return data.get("SendTimestamps", [])
+        return self.state.send_timestamps(window=max(60.0, float(self._rate_limit_window)))
 
     def add_send_timestamp(self, timestamp: float):
-        data = self._load_storage() or {}
-        timestamps = data.get("SendTimestamps", [])
-        timestamps.append(timestamp)
-        if len(timestamps) > 20:
-            timestamps = timestamps[-20:]
-        data["SendTimestamps"] = timestamps
-        self._save_storage(data)
-
-    def _clean_send_timestamps(self) -> None:
-        """Remove timestamps older than 60 seconds from storage."""
-        data = self._load_storage() or {}
-        timestamps = data.get("SendTimestamps", [])
-        if not timestamps:
-            return
-        now = time.time()
-        cleaned = [t for t in timestamps if now - t < 60]
-        if len(cleaned) > 20:
-            cleaned = cleaned[-20:]
-        if cleaned != timestamps:
-            data["SendTimestamps"] = cleaned
-            self._save_storage(data)
+        self.state.add_send_timestamp(timestamp)
 
     def check_rate_limit(self) -> Dict[str, Any]:
         """Return current rate-limit status."""
@@ -112,13 +91,70 @@ class LINELib:
             "ratelimit_after": ratelimit_after(timestamps, limit=self._rate_limit, window=self._rate_limit_window) if limited else 0,
         }
 
+    def _rate_limit_rejection(self) -> Optional[Dict[str, Any]]:
+        """送信前のレートリミット判定。制限中なら返却用dictを返し、メトリクスに記録する"""
+        timestamps = self.get_send_timestamps()
+        if not (self._rate_limit_enabled and ratelimiter(timestamps, limit=self._rate_limit, window=self._rate_limit_window)):
+            return None
+        lifted_at = ratelimit_after(timestamps, limit=self._rate_limit, window=self._rate_limit_window)
+        RATELIMIT_REJECTIONS.inc(source="local")
+        RATELIMIT_WAIT.observe(max(0.0, lifted_at - time.time()))
+        return {"ratelimit": True, "ratelimit_after": lifted_at}
+
     def reset_rate_limit(self) -> None:
         """Clear all send timestamps to reset the rate-limit counter."""
-        data = self._load_storage() or {}
-        data["SendTimestamps"] = []
-        self._save_storage(data)
-
-    def get_streaming_api_token_and_listen_stream_events(self, bot_id: str, device_type: str = "", client_type: str = "PC", ping_secs: int = 60, last_event_id: Optional[str] = None, on_event: Optional[Callable[[Dict[str, Any]], None]] = None, stop_event: Optional[Callable[[], bool]] = None, max_stream_seconds: float = 82800) -> Optional[str]:
+        self.state.clear_send_timestamps()
+
+    def _build_once(self, name: str, build: Callable[[], Any]) -> Any:
+        """遅延生成するコンポーネントを 1 度だけ作る (複数スレッドから同時に触られても同じものを返す)"""
+        with self._lazy_lock:
+            if name not in self.__dict__:
+                self.__dict__[name] = build()
+            return self.__dict__[name]
+
+    @cached_property
+    def state(self) -> StateStore:
+        """送信履歴 (SQLite)。最初に使われたときに開くので、送信しないインスタンスはファイルを作らない"""
+        return self._build_once("state", self._open_state)
+
+    # state と同じく、以下も使われたときに初めて作る (インスタンス生成時にディスク I/O を伴わないように)
+    @cached_property
+    def cards(self) -> CardPool:
+        """カードの使い回しプール。最初に使ったときに索引ファイルを読み込み、掃除する"""
+        return self._build_once("cards", lambda: CardPool(self._create_card, self._delete_card, path=self._card_pool_path))
+
+    @cached_property
+    def id_map(self) -> IdMap:
+        """グループ/チャットIDの対応表 (util.default_idmap)"""
+        return self._build_once("id_map", default_idmap)
+
+    @cached_property
+    def receipts(self) -> ReadReceipts:
+        """既読のまとめ送り"""
+        return self._build_once("receipts", lambda: ReadReceipts(self.mark_as_read))
+
+    @cached_property
+    def typing(self) -> TypingIndicator:
+        """入力中表示の間引き・維持"""
+        return self._build_once("typing", lambda: TypingIndicator(self.set_typing))
+
+    @cached_property
+    def clock(self) -> ClockSync:
+        """サーバー時刻との差分"""
+        return self._build_once("clock", lambda: ClockSync(self.get_clock_now))
+
+    def _open_state(self) -> StateStore:
+        state = StateStore(self._state_path, keep=max(20, int(self._rate_limit)))
+        self._migrate_storage(state)
+        return state
+
+    def _migrate_storage(self, state: StateStore) -> None:
+        """旧形式のストレージ (Cookie と送信履歴が同じJSON) から送信履歴を StateStore に移す"""
+        data = self.credentials.load()
+        if state.import_legacy(data):
+            self.credentials.save(data)
+
+    def get_streaming_api_token_and_listen_stream_events(self, bot_id: str, device_type: str = "", client_type: str = "PC", ping_secs: int = 60, last_event_id: Optional[str] = None, on_event: Optional[Callable[[Dict[str, Any]], None]] = None, stop_event: Optional[Callable[[], bool]] = None, max_stream_seconds: float = 82800, watchdog: Optional[StreamWatchdog] = None, retries: int = 0) -> Optional[str]:
         """
         streamingApiToken取得→SSE接続を一連で行う
         :param bot_id: BotのID
@@ -128,10 +164,12 @@ class LINELib:
         :param last_event_id: 前回受信したイベントID（省略可）
         :param on_event: イベント受信時のコールバック (dict)
         :param stop_event: 停止判定コールバック。Trueを返すとループを抜ける
+        :param watchdog: ping途絶を検知して接続を閉じるStreamWatchdog（省略可）
+        :param retries: 再接続の試行回数（リクエストフックに渡される）
         :return: 最後に受信したevent id（再接続時に使用）
         """
         try:
-            token_info = self._chat_service.get_streaming_api_token(bot_id, session=self._session, xsrf_token=self._xsrf_token)
+            token_info = self._chat_service.get_streaming_api_token(bot_id, session=self._session, xsrf_token=self._xsrf_token, retries=retries)
             streaming_api_token = token_info.get("streamingApiToken")
             if not isinstance(streaming_api_token, str) or not streaming_api_token:
                 raise LINEOAError("streamingApiToken is missing or invalid")
@@ -149,6 +187,8 @@ class LINELib:
                     state={"connectionId": connection_id, "idle": True},
                 )
             last_event_id = last_event_id or token_info.get("lastEventId")
+            if watchdog is not None:
+                watchdog.max_stream_seconds = max_stream_seconds
             for event in self._chat_service.stream_events(
                 streaming_api_token,
                 device_type=device_type,
@@ -160,6 +200,8 @@ class LINELib:
                 max_stream_seconds=max_stream_seconds,
                 base_url=streaming_api_base_url,
                 version=streaming_api_version,
+                watchdog=watchdog,
+                retries=retries,
             ):
                 if stop_event and stop_event():
                     break
@@ -172,10 +214,41 @@ class LINELib:
             raise
         return last_event_id
 
-    def get_chat_members(self, bot_id=None, chat_id=None, limit: int = 100) -> Dict[str, Any]:
-        """チャットメンバー一覧取得"""
+    def get_chat_members(self, bot_id=None, chat_id=None, limit: int = 100, use_cache: bool = True) -> Dict[str, Any]:
+        """チャットメンバー一覧取得 (metadata キャッシュ経由)"""
+        if use_cache:
+            return self.metadata.members(str(bot_id), str(chat_id), limit)
+        return self._fetch_chat_members(str(bot_id), str(chat_id), limit)
+
+    def get_chat(self, bot_id: str, chat_id: str, use_cache: bool = True) -> Dict[str, Any]:
+        """チャット情報取得 (metadata キャッシュ経由)"""
+        if use_cache:
+            return self.metadata.chat(bot_id, chat_id)
+        return self._fetch_chat(bot_id, chat_id)
+
+    def get_profile(self, bot_id: str, chat_id: str) -> Dict[str, Any]:
+        """チャット相手のプロフィール (name / pictureUrl など) をキャッシュから取得"""
+        return self.metadata.profile(bot_id, chat_id)
+
+    def _fetch_bots(self) -> "BotsInfo":
+        bots = self._chat_service.get_bot_accounts(session=self._session, xsrf_token=self._xsrf_token)
+        # bots: list of dicts with 'botId' and 'name'
+        return BotsInfo(bots.get("list", []))
+
+    def _fetch_chats(self, bot_id: str) -> "ChatsInfo":
+        try:
+            chats = self._chat_service.get_chats(bot_id, session=self._session, xsrf_token=self._xsrf_token)
+        except Exception as e:
+            raise LINEOAError(f"チャット一覧取得失敗: {e}")
+        self.id_map.observe_chats(chats.get("list", []))
+        return ChatsInfo(chats.get("list", []))
+
+    def _fetch_chat(self, bot_id: str, chat_id: str) -> Dict[str, Any]:
+        return self._chat_service.get_chat(bot_id, chat_id, session=self._session, xsrf_token=self._xsrf_token)
+
+    def _fetch_chat_members(self, bot_id: str, chat_id: str, limit: int = 100) -> Dict[str, Any]:
         return self._chat_service.get_chat_members(
-            bot_id=str(bot_id), chat_id=str(chat_id), limit=limit, session=self._session, xsrf_token=self._xsrf_token
+            bot_id=bot_id, chat_id=chat_id, limit=limit, session=self._session, xsrf_token=self._xsrf_token
         )
 
     def get_me(self) -> Dict[str, Any]:
@@ -191,7 +264,22 @@ class LINELib:
         return self._chat_service.get_pinned_messages(bot_id=bot_id, chat_id=chat_id)
 
     def set_typing(self, bot_id: str, chat_id: str) -> Dict[str, Any]:
-        return self._chat_service.set_typing(bot_id=bot_id, chat_id=chat_id)
+        return self._chat_service.set_typing(bot_id=bot_id, chat_id=chat_id, session=self._session, xsrf_token=self._xsrf_token)
+
+    def mark_as_read(self, bot_id: str, chat_id: str, message_id: str, timestamp: Optional[int] = None) -> Dict[str, Any]:
+        """
+        指定メッセージまで既読にする (即時送信)
+        :param timestamp: メッセージのタイムスタンプ (ms, 省略時は現在時刻)
+        """
+        return self._chat_service.mark_as_read(
+            bot_id, chat_id, message_id, timestamp=timestamp, session=self._session, xsrf_token=self._xsrf_token
+        )
+
+    def mark_as_read_later(self, bot_id: str, chat_id: str, message_id: str, timestamp: Optional[int] = None) -> None:
+        """
+        既読をキューに入れ、チャットごとに最新のものだけをまとめて送信する (ReadReceipts)
+        """
+        self.receipts.mark(bot_id, chat_id, message_id, timestamp)
 
     def streaming_state(self, bot_id: str, state: Dict[str, Any]) -> Dict[str, Any]:
         return self._chat_service.streaming_state(bot_id=bot_id, state=state)
@@ -257,8 +345,7 @@ class LINELib:
         return file_path
 
     def normalize_message_event(self, event: Dict[str, Any]) -> Dict[str, Any]:
-        sse_event = SSEEvent(id=event.get("id"), event=event.get("type"), data=json.dumps(event.get("payload", {}), ensure_ascii=False))
-        normalized = sse_event.normalized_message()
+        normalized = normalize_message(event.get("payload", {}))
         if normalized is None:
             return {
                 "kind": "unknown",
@@ -292,7 +379,7 @@ class LINELib:
                 "raw": normalized.get("raw"),
             }
             with open(target_path, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
+                f.write(jsoncodec.dumps(payload, indent=2))
             return target_path
 
         if message_type == "sticker":
@@ -324,13 +411,14 @@ class LINELib:
         :param bot_id: 利用するbotId（省略時は先頭bot）
         """
         if bot_id is None:
-            bot_id = next(iter(self.bots.ids.values()), None)
+            bot_id = self.bots.first_id
         if not bot_id:
             raise LINEOAError("No bot found")
-        timestamps = self.get_send_timestamps()
-        if self._rate_limit_enabled and ratelimiter(timestamps, limit=self._rate_limit, window=self._rate_limit_window):
-            return {"ratelimit": True, "ratelimit_after": ratelimit_after(timestamps, limit=self._rate_limit, window=self._rate_limit_window)}
+        rejected = self._rate_limit_rejection()
+        if rejected:
+            return rejected
         self.add_send_timestamp(time.time())
+        self.typing.stop(bot_id, chat_id)
         return self._chat_service.send_file(
             bot_id, chat_id, file_path, session=self._session, xsrf_token=self._xsrf_token
         )
@@ -378,6 +466,24 @@ class LINELib:
             after=after
         )
 
+    def iter_chat_messages(self, bot_id: str, chat_id: str, since: Optional[int] = None, until: Optional[int] = None, page_size: int = 50):
+        """
+        指定チャットの履歴を新しい順に全件イテレート (次ページを先読み)
+        :param bot_id: BotのID
+        :param chat_id: チャットID
+        :param since: これ以降のメッセージのみ (ミリ秒タイムスタンプ、任意)
+        :param until: これ以前のメッセージのみ (ミリ秒タイムスタンプ、任意)
+        :param page_size: 1リクエストあたりの取得件数
+        """
+        return self._chat_service.iter_chat_messages(
+            bot_id, chat_id,
+            since=since,
+            until=until,
+            page_size=page_size,
+            session=self._session,
+            xsrf_token=self._xsrf_token,
+        )
+
     def listen_messages(self, bot_id: str, chat_id: str, on_message: Optional[Callable[[Dict[str, Any]], None]] = None) -> None:
         """
         指定チャットのメッセージをリアルタイムで監視 (SSE)
@@ -388,20 +494,48 @@ class LINELib:
         return self._chat_service.listen_messages(bot_id, chat_id, on_message)
 
     def get_bots(self):
-        if self._bots is None:
-            bots = self._chat_service.get_bot_accounts(session=self._session, xsrf_token=self._xsrf_token)
-            # bots: list of dicts with 'botId' and 'name'
-            self._bots = BotsInfo(bots.get("list", []))
-        return self._bots
+        return self.metadata.bots()
     
     def get_chats(self, bot_id: str, limit: int) -> Dict[str, Any]:
         """
         指定Botのチャット一覧を取得
         :param bot_id: BotのID
         """
-        return self._chat_service.get_chats(
+        chats = self._chat_service.get_chats(
             bot_id, session=self._session, xsrf_token=self._xsrf_token, limit=limit
         )
+        self.id_map.observe_chats(chats.get("list", []))
+        return chats
+
+    def iter_chats(self, bot_id: Optional[str] = None, folder_types=("ALL",), tag_ids=("",), page_size: int = 100, max_workers: int = 4):
+        """
+        指定Botの全チャットをカーソルを辿って列挙 (ChatRecord)
+        :param bot_id: BotのID（省略時は先頭bot）
+        :param folder_types: 列挙する folderType の一覧（並列取得）
+        :param tag_ids: 列挙する tagIds の一覧（並列取得）
+        :param page_size: 1リクエストあたりの取得件数
+        :param max_workers: 同時に取得するパーティション数
+        """
+        if bot_id is None:
+            bot_id = self.bots.first_id
+        if not bot_id:
+            raise LINEOAError("No bot found")
+        return self._chat_service.iter_chats(
+            bot_id,
+            session=self._session,
+            xsrf_token=self._xsrf_token,
+            folder_types=tuple(folder_types),
+            tag_ids=tuple(tag_ids),
+            page_size=page_size,
+            max_workers=max_workers,
+        )
+
+    def get_all_chats(self, bot_id: Optional[str] = None, folder_types=("ALL",), tag_ids=("",), page_size: int = 100) -> "ChatsInfo":
+        """
+        指定Botの全チャットを ChatsInfo として取得
+        :param bot_id: BotのID（省略時は先頭bot）
+        """
+        return ChatsInfo(self.iter_chats(bot_id=bot_id, folder_types=folder_types, tag_ids=tag_ids, page_size=page_size))
 
     def send_message(self, user_id: str, context: str, bot_id: Optional[str] = None, quoteToken: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -412,12 +546,12 @@ class LINELib:
         :param quoteToken: リプライ用(省略時は普通のメッセージ)
         """
         if bot_id is None:
-            bot_id = next(iter(self.bots.ids.values()), None)
+            bot_id = self.bots.first_id
         if not bot_id:
             raise LINEOAError("No bot found")
-        timestamps = self.get_send_timestamps()
-        if self._rate_limit_enabled and ratelimiter(timestamps, limit=self._rate_limit, window=self._rate_limit_window):
-            return {"ratelimit": True, "ratelimit_after": ratelimit_after(timestamps, limit=self._rate_limit, window=self._rate_limit_window)}
+        rejected = self._rate_limit_rejection()
+        if rejected:
+            return rejected
         now = int(time.time() * 1000)
         send_id = f"{user_id}_{now}_{random.randint(1000000,9999999)}"
         payload = {
@@ -430,13 +564,14 @@ class LINELib:
             payload["quoteToken"] = quoteToken
         self.set_final_send_time(int(time.time()))
         self.add_send_timestamp(time.time())
+        self.typing.stop(bot_id, user_id)
         return self._chat_service.send_message(
             bot_id, user_id, payload, session=self._session, xsrf_token=self._xsrf_token
         )
     async def async_send_message(self, user_id: str, context: str, bot_id: Optional[str] = None, quoteToken: Optional[str] = None) -> Dict[str, Any]:
         """Async wrapper for sending a text message."""
         if bot_id is None:
-            bot_id = next(iter(self.bots.ids.values()), None)
+            bot_id = self.bots.first_id
         if not bot_id:
             raise LINEOAError("No bot found")
         now = int(time.time() * 1000)
@@ -444,6 +579,7 @@ class LINELib:
         payload = {"id": "", "type": "textV2", "text": context, "sendId": send_id}
         if quoteToken:
             payload["quoteToken"] = quoteToken
+        self.typing.stop(bot_id, user_id)
         cookies = {}
         if hasattr(self, '_session') and isinstance(self._session, requests.Session):
             for c in self._session.cookies:
@@ -454,12 +590,47 @@ class LINELib:
         """
         メンション送信（レートリミット判定あり）
         """
-        timestamps = self.get_send_timestamps()
-        if self._rate_limit_enabled and ratelimiter(timestamps, limit=self._rate_limit, window=self._rate_limit_window):
-            return {"ratelimit": True, "ratelimit_after": ratelimit_after(timestamps, limit=self._rate_limit, window=self._rate_limit_window)}
+        rejected = self._rate_limit_rejection()
+        if rejected:
+            return rejected
         self.add_send_timestamp(time.time())
+        self.typing.stop(bot_id, chat_id)
         return self._chat_service.send_mention(bot_id, chat_id, mentionee_id, session=self._session, xsrf_token=self._xsrf_token)
 
+    def _create_card(self, at_id: str, spec: Dict[str, Any]) -> int:
+        return self._chat_service.create_card_type_message(at_id=at_id, session=self._session, xsrf_token=self._xsrf_token, **spec)
+
+    def _delete_card(self, at_id: str, card_id: int) -> None:
+        self._chat_service.delete_card_type_message(at_id=at_id, card_id=card_id, session=self._session, xsrf_token=self._xsrf_token)
+
+    def send_card(self, chat_id: str, title: str, image_url: str, bot_id: Optional[str] = None, at_id: Optional[str] = None, **card: Any) -> Dict[str, Any]:
+        """
+        カードメッセージを送信（同じ内容のカードは CardPool で使い回す、レートリミット判定あり）
+        :param chat_id: 送信先チャットID
+        :param bot_id: 利用するbotId（省略時は先頭bot）
+        :param at_id: Bot の @ID（省略時は bot 一覧の basicSearchId）
+        :param card: tag_name / tag_color / description / action_label / action_text
+        """
+        if bot_id is None:
+            bot_id = self.bots.first_id
+        if not bot_id:
+            raise LINEOAError("No bot found")
+        if at_id is None:
+            record = self.bots.get(bot_id)
+            at_id = record.basic_search_id if record is not None else None
+            if not at_id:
+                raise LINEOAError(f"No basicSearchId for bot {bot_id}")
+        rejected = self._rate_limit_rejection()
+        if rejected:
+            return rejected
+        self.add_send_timestamp(time.time())
+        self.typing.stop(bot_id, chat_id)
+        card_id = self._chat_service.create_and_send_flex(
+            bot_id=bot_id, at_id=at_id, chat_id=chat_id, title=title, image_url=image_url,
+            session=self._session, xsrf_token=self._xsrf_token, card_pool=self.cards, **card
+        )
+        return {"cardTypeMessageId": card_id}
+
     def sendMessage(self, user_id: str, text: str, bot_id: Optional[str] = None, quoteToken: Optional[str] = None):
         return self.send_message(user_id, text, bot_id=bot_id, quoteToken=quoteToken)
 
@@ -483,13 +654,12 @@ class LINELib:
             raise LINEOAError("cookie storage does not exist. Please save logged-in cookies.")
         if os.path.getsize(self.storage) == 0:
             raise LINEOAError("cookie storage is empty. Please save logged-in cookies.")
-        with open(self.storage, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        data = self.credentials.load()
         if "cookies" not in data:
             raise LINEOAError("cookie storage is invalid")
         session = requests.Session()
         for c in data["cookies"]:
-            session.cookies.set(c["name"], c["value"], domain=c.get("domain"))
+            session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path") or "/")
         self._session = session
         self._user_info = {"email": data.get("email"), "user_name": data.get("user_name")}
         for c in session.cookies:
@@ -500,7 +670,7 @@ class LINELib:
     async def async_send_file(self, chat_id: str, file_path: str, bot_id: Optional[str] = None) -> Dict[str, Any]:
         """Async wrapper for sending a file."""
         if bot_id is None:
-            bot_id = next(iter(self.bots.ids.values()), None)
+            bot_id = self.bots.first_id
         if not bot_id:
             raise LINEOAError("No bot found")
         cookies = {}
@@ -531,99 +701,222 @@ class LINELib:
                 cookies[c.name] = c.value
         return await self._chat_service.async_get_chat_messages(bot_id, chat_id, cookies=cookies, xsrf_token=self._xsrf_token, limit=limit, before=before, after=after)
 
+    async def async_iter_chat_messages(self, bot_id: str, chat_id: str, since: Optional[int] = None, until: Optional[int] = None, page_size: int = 50):
+        """Async wrapper for iterating over a whole chat history."""
+        cookies = {}
+        if hasattr(self, '_session') and isinstance(self._session, requests.Session):
+            for c in self._session.cookies:
+                cookies[c.name] = c.value
+        async for message in self._chat_service.async_iter_chat_messages(bot_id, chat_id, cookies=cookies, xsrf_token=self._xsrf_token, since=since, until=until, page_size=page_size):
+            yield message
+
     @property
     def bots(self):
-        if self._bots is None:
-            bots = self._chat_service.get_bot_accounts(session=self._session, xsrf_token=self._xsrf_token)
-            # bots: list of dicts with 'botId' and 'name'
-            self._bots = BotsInfo(bots.get("list", []))
-        return self._bots
+        return self.metadata.bots()
     @property
     def chats(self):
-        if self._chats is None:
-            bot_id = next(iter(self.bots.ids.values()), None)
-            if not bot_id:
-                raise LINEOAError("No bot found")
-            try:
-                chats = self._chat_service.get_chats(bot_id, session=self._session, xsrf_token=self._xsrf_token)
-                self._chats = ChatsInfo(chats.get("list", []))
-            except Exception as e:
-                raise LINEOAError(f"チャット一覧取得失敗: {e}")
-        return self._chats
+        bot_id = self.bots.first_id
+        if not bot_id:
+            raise LINEOAError("No bot found")
+        return self.metadata.chats(bot_id)
+
+    @property
+    def api(self) -> "EndpointClient":
+        """Registry-generated sync client (endpoints.py) using this instance's session."""
+        client = getattr(self, "_api", None)
+        if client is None or client.session is not self._session or client.xsrf_token != self._xsrf_token:
+            client = self._api = self._chat_service.client(session=self._session, xsrf_token=self._xsrf_token)
+        return client
+
+    def async_api(self) -> "AsyncEndpointClient":
+        """Registry-generated asyncio client carrying this instance's cookies; use with `async with`."""
+        cookies = {}
+        if isinstance(self._session, requests.Session):
+            for c in self._session.cookies:
+                cookies[c.name] = c.value
+        return self._chat_service.async_client(cookies=cookies, xsrf_token=self._xsrf_token)
 
     @property
     def provider(self):
-        if self._provider is None:
-            try:
-                url = "https://chat.line.biz/api/v1/providers"
-                headers = {
-                    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36",
-                    "Accept": "application/json, text/plain, */*",
-                }
-                if self._session is None:
-                    self._session = requests.Session()
-                resp = self._session.get(url, headers=headers)
-                if resp.ok:
-                    self._provider = resp.json()
-                else:
-                    self._provider = []
-                    raise LINEOAError(f"プロバイダー取得失敗: {resp.status_code} {resp.text}")
-            except Exception as e:
-                self._provider = []
-                raise LINEOAError(f"プロバイダー取得例外: {e}")
-        return self._provider
+        if self._session is None:
+            self._session = requests.Session()
+        try:
+            return self._chat_service.get_providers(session=self._session, xsrf_token=self._xsrf_token)
+        except LINEOAError as e:
+            raise LINEOAError(f"プロバイダー取得失敗: {e}")
+        except Exception as e:
+            raise LINEOAError(f"プロバイダー取得例外: {e}")
 
 class BotsInfo:
-    def __init__(self, bots_list: List[Dict[str, Any]]):
-        self._bots = bots_list
+    """Bot list with indexes by botId, basicSearchId and name built once at load time."""
+
+    def __init__(self, bots_list: Iterable[Any]):
+        self._by_id: Dict[str, BotRecord] = {}
+        self._by_search_id: Dict[str, BotRecord] = {}
+        self._by_name: Dict[str, BotRecord] = {}
+        self._ids: Dict[str, str] = {}
+        for bot in bots_list:
+            self.add(bot)
+
+    def add(self, bot: Any) -> Optional[BotRecord]:
+        record = bot if isinstance(bot, BotRecord) else BotRecord.from_api(bot)
+        if not record.bot_id:
+            return None
+        self.remove(record.bot_id)
+        self._by_id[record.bot_id] = record
+        if record.basic_search_id:
+            self._by_search_id[record.basic_search_id] = record
+        if record.name:
+            self._by_name.setdefault(record.name, record)
+        self._ids[record.basic_search_id or record.name] = record.bot_id
+        return record
+
+    def remove(self, bot_id: str) -> Optional[BotRecord]:
+        record = self._by_id.pop(bot_id, None)
+        if record is None:
+            return None
+        if self._by_search_id.get(record.basic_search_id) is record:
+            del self._by_search_id[record.basic_search_id]
+        if self._by_name.get(record.name) is record:
+            del self._by_name[record.name]
+        key = record.basic_search_id or record.name
+        if self._ids.get(key) == bot_id:
+            del self._ids[key]
+        return record
+
     @property
     def ids(self) -> Dict[str, str]:
-        result = {}
-        for b in self._bots:
-            u_id = b.get("botId")
-            at_id = b.get("basicSearchId")
-            name = b.get("name", "")
-            if u_id:
-                key = at_id if at_id else name
-                result[key] = u_id
-        return result
+        return self._ids
+
+    @property
+    def first_id(self) -> Optional[str]:
+        return next(iter(self._ids.values()), None)
+
+    def get(self, bot_id: str) -> Optional[BotRecord]:
+        return self._by_id.get(bot_id)
+
+    def by_search_id(self, basic_search_id: str) -> Optional[BotRecord]:
+        return self._by_search_id.get(basic_search_id) or self._by_search_id.get(f"@{basic_search_id.lstrip('@')}")
+
+    def by_name(self, name: str) -> Optional[BotRecord]:
+        return self._by_name.get(name)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[BotRecord]:
+        return iter(self._by_id.values())
+
+    def __contains__(self, bot_id: object) -> bool:
+        return bot_id in self._by_id
+
     def __repr__(self) -> str:
         entries = []
-        for b in self._bots:
-            name = b.get("name", "unknown")
-            bot_id = b.get("botId", "")
-            search_id = b.get("basicSearchId", "")
-            entries.append(f"  {name} : {bot_id} ({search_id})")
-        return f"BotsInfo({len(self._bots)} bots)\n" + "\n".join(entries)
+        for b in self._by_id.values():
+            entries.append(f"  {b.name or 'unknown'} : {b.bot_id} ({b.basic_search_id or ''})")
+        return f"BotsInfo({len(self._by_id)} bots)\n" + "\n".join(entries)
 
 class ChatsInfo:
-    def __init__(self, chats_list: List[Dict[str, Any]]):
-        self._chats = chats_list
-        self.group = ChatTypeIds(self._chats, "GROUP")
-        self.user = ChatTypeIds(self._chats, "USER")
+    """Chat list with indexes by chatId, name and chatType, updated incrementally by add/remove."""
+
+    def __init__(self, chats_list: Iterable[Any]):
+        self._by_id: Dict[str, ChatRecord] = {}
+        self._by_name: Dict[str, Dict[str, None]] = {}
+        self._by_type: Dict[str, Dict[str, None]] = {}
+        self._type_views: Dict[str, ChatTypeIds] = {}
+        for chat in chats_list:
+            self.add(chat)
+        self.group = self.by_type("GROUP")
+        self.user = self.by_type("USER")
+
+    def add(self, chat: Any) -> Optional[ChatRecord]:
+        record = chat if isinstance(chat, ChatRecord) else ChatRecord.from_api(chat)
+        if not record.chat_id:
+            return None
+        self.remove(record.chat_id)
+        self._by_id[record.chat_id] = record
+        if record.name:
+            self._by_name.setdefault(record.name, {})[record.chat_id] = None
+        self._by_type.setdefault(record.chat_type or "", {})[record.chat_id] = None
+        view = self._type_views.get(record.chat_type or "")
+        if view is not None:
+            view._ids_cache = None
+        return record
+
+    def remove(self, chat_id: str) -> Optional[ChatRecord]:
+        record = self._by_id.pop(chat_id, None)
+        if record is None:
+            return None
+        names = self._by_name.get(record.name)
+        if names is not None:
+            names.pop(chat_id, None)
+            if not names:
+                del self._by_name[record.name]
+        self._by_type.get(record.chat_type or "", {}).pop(chat_id, None)
+        view = self._type_views.get(record.chat_type or "")
+        if view is not None:
+            view._ids_cache = None
+        return record
+
+    def get(self, chat_id: str) -> Optional[ChatRecord]:
+        return self._by_id.get(chat_id)
+
+    def by_name(self, name: str) -> List[ChatRecord]:
+        return [self._by_id[chat_id] for chat_id in self._by_name.get(name, ())]
+
+    def by_type(self, chat_type: str) -> "ChatTypeIds":
+        view = self._type_views.get(chat_type)
+        if view is None:
+            view = self._type_views[chat_type] = ChatTypeIds(self, chat_type)
+        return view
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._by_id)
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[ChatRecord]:
+        return iter(self._by_id.values())
+
+    def __contains__(self, chat_id: object) -> bool:
+        return chat_id in self._by_id
+
     def __repr__(self) -> str:
         lines = []
-        for c in self._chats:
-            profile = c.get("profile", {})
-            chat_id = c.get("chatId", "unknown")
-            name = profile.get("name", chat_id)
-            chat_type = c.get("chatType", "")
-            lines.append(f"  {name} : {chat_id}  [{chat_type}]")
-        return f"ChatsInfo({len(self._chats)} chats)\n" + "\n".join(lines)
+        for c in self._by_id.values():
+            lines.append(f"  {c.name or c.chat_id} : {c.chat_id}  [{c.chat_type or ''}]")
+        return f"ChatsInfo({len(self._by_id)} chats)\n" + "\n".join(lines)
 
 class ChatTypeIds:
-    def __init__(self, chats: List[Dict[str, Any]], chat_type: str):
+    """Live view of the chats of one chatType inside a ChatsInfo."""
+
+    def __init__(self, chats: ChatsInfo, chat_type: str):
         self._type = chat_type
-        self._chats = [c for c in chats if c.get("chatType") == chat_type]
-        self._ids = [c["chatId"] for c in self._chats]
+        self._chats = chats
+        self._ids_cache: Optional[List[str]] = None
+
+    def _index(self) -> Dict[str, None]:
+        return self._chats._by_type.get(self._type, {})
+
     @property
     def ids(self) -> List[str]:
-        return self._ids
+        if self._ids_cache is None:
+            self._ids_cache = list(self._index())
+        return self._ids_cache
+
+    def __len__(self) -> int:
+        return len(self._index())
+
+    def __iter__(self) -> Iterator[ChatRecord]:
+        return (self._chats._by_id[chat_id] for chat_id in self._index())
+
+    def __contains__(self, chat_id: object) -> bool:
+        return chat_id in self._index()
+
     def __repr__(self) -> str:
         lines = []
-        for c in self._chats:
-            profile = c.get("profile", {})
-            chat_id = c.get("chatId", "unknown")
-            name = profile.get("name", chat_id)
-            lines.append(f"  {name} : {chat_id}")
-        return f"ChatTypeIds({self._type}, {len(self._ids)} chats)\n" + "\n".join(lines)
+        for c in self:
+            lines.append(f"  {c.name or c.chat_id} : {c.chat_id}")
+        return f"ChatTypeIds({self._type}, {len(self)} chats)\n" + "\n".join(lines)
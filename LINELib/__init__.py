@@ -6,6 +6,11 @@ from .util import merge_dicts
 from .LINELib import LINELib
 from .config import ListenConfig, RateLimitConfig
 from .sse import SSEEvent, SSEParser
+from .models import BotRecord, ChatRecord
+from .checkpoint import CheckpointStore, FileCheckpointStore, SQLiteCheckpointStore
+from .metrics import MetricsRegistry
+from .hooks import Hooks
+from .jsoncodec import get_codec, set_codec
 from typing import Any
 
 __all__ = [
@@ -19,7 +24,37 @@ __all__ = [
     "RateLimitConfig",
     "SSEEvent",
     "SSEParser",
+    "BotRecord",
+    "ChatRecord",
+    "MessageArchive",
+    "CheckpointStore",
+    "FileCheckpointStore",
+    "SQLiteCheckpointStore",
+    "MetricsRegistry",
+    "Hooks",
+    "get_codec",
+    "set_codec",
+    "TracingHooks",
+    "RecordingTracer",
 ]
+# optional features, imported on first access so `import LINELib` stays light
+_LAZY = {
+    "MessageArchive": ".archive",
+    "TracingHooks": ".tracing",
+    "RecordingTracer": ".tracing",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
 __author__ = "madoa5561"
 __version__ = "7.6.7"
 
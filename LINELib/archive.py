@@ -0,0 +1,359 @@
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from . import jsoncodec
+from .exceptions import LINEOAError
+from .logger import lineoa_logger
+from .sse import normalize_message
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    bot_id TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    timestamp INTEGER,
+    type TEXT,
+    text TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (bot_id, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_messages_chat_time ON messages (bot_id, chat_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_messages_message_id ON messages (message_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    bot_id TEXT NOT NULL,
+    chat_id TEXT NOT NULL,
+    last_message_id TEXT,
+    last_timestamp INTEGER,
+    PRIMARY KEY (bot_id, chat_id)
+);
+"""
+
+
+def _event_message(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    payload = event.get("payload")
+    if not isinstance(payload, dict):
+        return None
+    inner = payload.get("payload") if isinstance(payload.get("payload"), dict) else payload
+    message = inner.get("message")
+    if not isinstance(message, dict) or not message.get("id"):
+        return None
+    if message.get("timestamp") is None and inner.get("timestamp") is not None:
+        message = dict(message, timestamp=inner.get("timestamp"))
+    return message
+
+
+def _search_fields(bot_id: str, chat_id: str, message: Dict[str, Any]) -> Tuple[str, str, str]:
+    normalized = normalize_message({"botId": bot_id, "chatId": chat_id, "payload": {"message": message}}) or {}
+    return (
+        normalized.get("text") or "",
+        normalized.get("title") or "",
+        normalized.get("file_name") or "",
+    )
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MessageArchive:
+    """
+    Local SQLite store for chat messages.
+    Messages come from the SSE stream (attach) and from history backfill (sync);
+    reads are plain local queries. With fts=True new messages are also added to
+    an FTS5 index used by search(); rows stored while opened with fts=False are
+    indexed the next time the archive is opened with fts=True.
+    """
+
+    def __init__(self, path: str = "lineoa-archive.sqlite3", lib: Optional[Any] = None, fts: bool = True):
+        self.path = path
+        self.lib = lib
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self.fts = fts and self._create_fts()
+
+    def _create_fts(self) -> bool:
+        exists = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+        if exists:
+            self._backfill_index()
+            return True
+        for tokenize in ("trigram", "unicode61"):
+            try:
+                self._conn.execute(f"CREATE VIRTUAL TABLE messages_fts USING fts5(text, title, file_name, tokenize='{tokenize}')")
+                break
+            except sqlite3.OperationalError:
+                continue
+        else:
+            lineoa_logger.error("SQLite FTS5 is not available; archive search is disabled")
+            return False
+        self.rebuild_index()
+        return True
+
+    def rebuild_index(self) -> None:
+        """Re-create the full-text index from the stored messages."""
+        with self._lock:
+            self._conn.execute("DELETE FROM messages_fts")
+            rows = self._conn.execute("SELECT rowid, bot_id, chat_id, data FROM messages").fetchall()
+            self._conn.executemany(
+                "INSERT INTO messages_fts (rowid, text, title, file_name) VALUES (?, ?, ?, ?)",
+                [(rowid,) + _search_fields(bot_id, chat_id, jsoncodec.loads(data)) for rowid, bot_id, chat_id, data in rows],
+            )
+            self._conn.commit()
+
+    def _backfill_index(self) -> None:
+        """Index rows stored while the archive was opened with fts=False."""
+        with self._lock:
+            indexed = self._conn.execute("SELECT count(*) FROM messages_fts").fetchone()[0]
+            total = self._conn.execute("SELECT count(*) FROM messages").fetchone()[0]
+            if indexed == total:
+                return
+            rows = self._conn.execute(
+                "SELECT rowid, bot_id, chat_id, data FROM messages WHERE rowid NOT IN (SELECT rowid FROM messages_fts)"
+            ).fetchall()
+            self._conn.executemany(
+                "INSERT INTO messages_fts (rowid, text, title, file_name) VALUES (?, ?, ?, ?)",
+                [(rowid,) + _search_fields(bot_id, chat_id, jsoncodec.loads(data)) for rowid, bot_id, chat_id, data in rows],
+            )
+            self._conn.commit()
+        lineoa_logger.info("archive: indexed %s messages missing from the full-text index", len(rows))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "MessageArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _insert(self, bot_id: str, chat_id: str, messages: Iterable[Dict[str, Any]]) -> int:
+        messages = [m for m in messages if m.get("id") is not None]
+        rows = []
+        for message in messages:
+            message_id = message.get("id")
+            rows.append((
+                bot_id,
+                chat_id,
+                str(message_id),
+                _to_int(message.get("timestamp")),
+                message.get("type"),
+                message.get("text"),
+                jsoncodec.dumps(message),
+            ))
+        if not rows:
+            return 0
+        if not self.fts:
+            with self._lock:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO messages (bot_id, chat_id, message_id, timestamp, type, text, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+                return self._conn.total_changes - before
+        stored = 0
+        with self._lock:
+            for row, message in zip(rows, messages):
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO messages (bot_id, chat_id, message_id, timestamp, type, text, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                if cursor.rowcount == 1:
+                    stored += 1
+                    self._conn.execute(
+                        "INSERT INTO messages_fts (rowid, text, title, file_name) VALUES (?, ?, ?, ?)",
+                        (cursor.lastrowid,) + _search_fields(bot_id, chat_id, message),
+                    )
+            self._conn.commit()
+        return stored
+
+    def store_messages(self, bot_id: str, chat_id: str, messages: Iterable[Dict[str, Any]]) -> int:
+        """Store history messages; returns the number of new rows."""
+        return self._insert(bot_id, chat_id, messages)
+
+    def store_event(self, event: Dict[str, Any]) -> bool:
+        """Store the message carried by an SSE event dict, if any."""
+        payload = event.get("payload")
+        message = _event_message(event)
+        if message is None:
+            return False
+        bot_id = payload.get("botId")
+        chat_id = payload.get("chatId")
+        if not bot_id or not chat_id:
+            return False
+        return self._insert(bot_id, chat_id, [message]) > 0
+
+    def attach(self, bot: Any) -> None:
+        """Archive every message event received by a LineBot."""
+        def archive_event(event):
+            self.store_event(event)
+        bot.listener(archive_event)
+
+    def last_message_id(self, bot_id: str, chat_id: str) -> Optional[str]:
+        """Return the high-water mark recorded by the last sync for a chat."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_message_id FROM sync_state WHERE bot_id = ? AND chat_id = ?",
+                (bot_id, chat_id),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set_sync_state(self, bot_id: str, chat_id: str, message_id: str, timestamp: Optional[int]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sync_state (bot_id, chat_id, last_message_id, last_timestamp) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (bot_id, chat_id) DO UPDATE SET last_message_id = excluded.last_message_id, last_timestamp = excluded.last_timestamp "
+                "WHERE sync_state.last_timestamp IS NULL OR excluded.last_timestamp >= sync_state.last_timestamp",
+                (bot_id, chat_id, message_id, timestamp),
+            )
+            self._conn.commit()
+
+    def get_messages(self, bot_id: str, chat_id: str, since: Optional[int] = None, until: Optional[int] = None, limit: Optional[int] = None, newest_first: bool = False) -> List[Dict[str, Any]]:
+        """
+        Read archived messages of a chat.
+        Args:
+            bot_id: Bot ID
+            chat_id: Chat ID
+            since: Oldest timestamp to include (milliseconds)
+            until: Newest timestamp to include (milliseconds)
+            limit: Max number of messages
+            newest_first: Sort order
+        Returns:
+            list: Message dicts as returned by the API
+        """
+        query = "SELECT data FROM messages WHERE bot_id = ? AND chat_id = ?"
+        params: List[Any] = [bot_id, chat_id]
+        if since is not None:
+            query += " AND timestamp >= ?"
+            params.append(int(since))
+        if until is not None:
+            query += " AND timestamp <= ?"
+            params.append(int(until))
+        query += " ORDER BY timestamp DESC" if newest_first else " ORDER BY timestamp ASC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [jsoncodec.loads(row[0]) for row in rows]
+
+    def get_message(self, bot_id: str, message_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM messages WHERE bot_id = ? AND message_id = ?",
+                (bot_id, str(message_id)),
+            ).fetchone()
+        return jsoncodec.loads(row[0]) if row else None
+
+    def search(self, query: str, bot_id: Optional[str] = None, chat_ids: Optional[Iterable[str]] = None, since: Optional[int] = None, until: Optional[int] = None, limit: int = 50, raw: bool = False) -> List[Dict[str, Any]]:
+        """
+        Full-text search over message text, link titles and file names.
+        Args:
+            query: Text to look for (matched as a phrase unless raw=True)
+            bot_id: Restrict to a bot
+            chat_ids: Restrict to these chats
+            since: Oldest timestamp to include (milliseconds)
+            until: Newest timestamp to include (milliseconds)
+            limit: Max number of hits
+            raw: Pass `query` to FTS5 as-is (MATCH syntax)
+        Returns:
+            list: Hits with bot_id, chat_id, message_id, timestamp and message, best match first
+        """
+        if not self.fts:
+            raise LINEOAError("archive search is disabled (SQLite FTS5 is not available)")
+        match = query if raw else '"' + query.replace('"', '""') + '"'
+        sql = (
+            "SELECT m.bot_id, m.chat_id, m.message_id, m.timestamp, m.data FROM messages_fts f "
+            "JOIN messages m ON m.rowid = f.rowid WHERE messages_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        if bot_id is not None:
+            sql += " AND m.bot_id = ?"
+            params.append(bot_id)
+        if chat_ids is not None:
+            chat_ids = list(chat_ids)
+            if not chat_ids:
+                return []
+            sql += f" AND m.chat_id IN ({','.join('?' * len(chat_ids))})"
+            params.extend(chat_ids)
+        if since is not None:
+            sql += " AND m.timestamp >= ?"
+            params.append(int(since))
+        if until is not None:
+            sql += " AND m.timestamp <= ?"
+            params.append(int(until))
+        sql += " ORDER BY f.rank LIMIT ?"
+        params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [
+            {"bot_id": b, "chat_id": c, "message_id": m, "timestamp": t, "message": jsoncodec.loads(data)}
+            for b, c, m, t, data in rows
+        ]
+
+    def chat_ids(self, bot_id: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT chat_id FROM messages WHERE bot_id = ?", (bot_id,)).fetchall()
+        return [row[0] for row in rows]
+
+    def _sync_chat(self, bot_id: str, chat_id: str, since: Optional[int], page_size: int) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last_message_id, last_timestamp FROM sync_state WHERE bot_id = ? AND chat_id = ?",
+                (bot_id, chat_id),
+            ).fetchone()
+        last_id, last_timestamp = row if row else (None, None)
+        lower = last_timestamp if last_timestamp is not None else since
+        newest = None
+        stored = 0
+        batch = []
+        for message in self.lib.iter_chat_messages(bot_id, chat_id, since=lower, page_size=page_size):
+            if last_id is not None and str(message.get("id")) == str(last_id):
+                continue
+            if newest is None:
+                newest = message
+            batch.append(message)
+            if len(batch) >= page_size:
+                stored += self._insert(bot_id, chat_id, batch)
+                batch = []
+        stored += self._insert(bot_id, chat_id, batch)
+        if newest is not None:
+            self._set_sync_state(bot_id, chat_id, str(newest.get("id")), _to_int(newest.get("timestamp")))
+        return stored
+
+    def sync(self, bot_id: str, chat_ids: Optional[Iterable[str]] = None, since: Optional[int] = None, page_size: int = 100, max_workers: int = 4) -> int:
+        """
+        Incrementally fetch history into the archive.
+        Only messages newer than the last synced message of each chat are requested;
+        chats never synced before are backfilled (down to `since` if given).
+        Args:
+            bot_id: Bot ID
+            chat_ids: Chats to sync (defaults to every chat of the bot)
+            since: Oldest timestamp for the first backfill (milliseconds)
+            page_size: Messages per request
+            max_workers: Number of chats synced concurrently
+        Returns:
+            int: Number of newly stored messages
+        """
+        if self.lib is None:
+            raise LINEOAError("MessageArchive.sync requires a LINELib instance")
+        if chat_ids is None:
+            chat_ids = [chat.chat_id for chat in self.lib.iter_chats(bot_id)]
+        total = 0
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(self._sync_chat, bot_id, chat_id, since, page_size): chat_id for chat_id in chat_ids}
+            for future, chat_id in futures.items():
+                try:
+                    total += future.result()
+                except Exception as e:
+                    lineoa_logger.error(f"archive sync failed (chat_id={chat_id}): {e}")
+        return total
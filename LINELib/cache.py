@@ -0,0 +1,287 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .logger import lineoa_logger
+from .singleflight import SingleFlight
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU mapping whose entries expire after a per-entry TTL.
+    get() / get_or_load() hand out deep copies, so callers may mutate what they
+    get back without changing the cached value.
+    """
+
+    def __init__(self, ttl: float = 300, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self.peek(key, _MISSING)
+        return default if value is _MISSING else copy.deepcopy(value)
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """The cached value itself, not a copy; for read-only checks."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def pop_matching(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Cached value, or the loader's result; concurrent misses for one key share a single load."""
+        value = self.peek(key, _MISSING)
+        if value is not _MISSING:
+            return copy.deepcopy(value)
+
+        def load() -> Any:
+            value = self.peek(key, _MISSING)
+            if value is _MISSING:
+                value = loader()
+                self.set(key, value, ttl=ttl)
+            return value
+        # every caller sharing the flight gets its own copy
+        return copy.deepcopy(self._flights.do(key, load, label=f"cache:{key[0] if isinstance(key, tuple) and key else key}"))
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.peek(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class MetadataCache:
+    """
+    Cache for bots, chats, profiles and members with per-kind TTLs.
+
+    The chat stream only emits `init`, `ping` and chat message events, so handle_event
+    can drop entries in two cases: every chat entry on `init` (a (re)connect, after which
+    changes made while disconnected were never seen), and a bot's chat list when a message
+    arrives from a chat that list does not contain. Profile, member and bot account changes
+    have no event and are refreshed by their TTL only.
+    """
+
+    DEFAULT_TTLS = {
+        "bots": 3600.0,
+        "chats": 300.0,
+        "chat": 300.0,
+        "members": 300.0,
+    }
+
+    # SSE event type -> kinds dropped for every bot and chat
+    INVALIDATING_EVENTS = {
+        "init": ("chats", "chat", "members"),
+    }
+
+    def __init__(self, lib: Any, ttl: Optional[Dict[str, float]] = None, maxsize: int = 10000):
+        self._lib = lib
+        self.ttl = dict(self.DEFAULT_TTLS)
+        if ttl:
+            self.ttl.update(ttl)
+        self._cache = TTLCache(ttl=self.ttl["chat"], maxsize=maxsize)
+
+    def bots(self) -> Any:
+        return self._cache.get_or_load(("bots",), self._lib._fetch_bots, ttl=self.ttl["bots"])
+
+    def chats(self, bot_id: str) -> Any:
+        return self._cache.get_or_load(("chats", bot_id), lambda: self._lib._fetch_chats(bot_id), ttl=self.ttl["chats"])
+
+    def chat(self, bot_id: str, chat_id: str) -> Dict[str, Any]:
+        return self._cache.get_or_load(("chat", bot_id, chat_id), lambda: self._lib._fetch_chat(bot_id, chat_id), ttl=self.ttl["chat"])
+
+    def members(self, bot_id: str, chat_id: str, limit: int = 100) -> Dict[str, Any]:
+        return self._cache.get_or_load(("members", bot_id, chat_id, limit), lambda: self._lib._fetch_chat_members(bot_id, chat_id, limit), ttl=self.ttl["members"])
+
+    def profile(self, bot_id: str, chat_id: str) -> Dict[str, Any]:
+        profile = self.chat(bot_id, chat_id).get("profile")
+        return profile if isinstance(profile, dict) else {}
+
+    def chat_name(self, bot_id: str, chat_id: str) -> Optional[str]:
+        return self.profile(bot_id, chat_id).get("name")
+
+    def chat_type(self, bot_id: str, chat_id: str) -> Optional[str]:
+        return self.chat(bot_id, chat_id).get("chatType")
+
+    def invalidate(self, kind: Optional[str] = None, bot_id: Optional[str] = None, chat_id: Optional[str] = None) -> int:
+        """Drop cached entries; every argument left as None matches anything."""
+        def match(key):
+            if kind is not None and key[0] != kind:
+                return False
+            if bot_id is not None and len(key) > 1 and key[1] != bot_id:
+                return False
+            if chat_id is not None and len(key) > 2 and key[2] != chat_id:
+                return False
+            return True
+        return self._cache.pop_matching(match)
+
+    def handle_event(self, event: Dict[str, Any]) -> None:
+        """LineBot listener: invalidate entries an SSE event shows to be stale."""
+        for kind in self.INVALIDATING_EVENTS.get(event.get("type"), ()):
+            if self.invalidate(kind):
+                lineoa_logger.logger.debug("metadata cache invalidated: %s (%s)", kind, event.get("type"), extra={"tag": "CACHE"})
+        payload = event.get("payload")
+        if not isinstance(payload, dict) or payload.get("subEvent") != "message":
+            return
+        bot_id = payload.get("botId")
+        chat_id = payload.get("chatId")
+        chats = self._cache.peek(("chats", bot_id))
+        # a message from a chat the cached list does not know means the list is out of date
+        if chats is not None and chat_id and chat_id not in chats:
+            self.invalidate("chats", bot_id=bot_id)
+            lineoa_logger.logger.debug("metadata cache invalidated: chats (%s, new chat %s)", bot_id, chat_id, extra={"tag": "CACHE"})
+
+
+class CachedResponse:
+    __slots__ = ("_value", "etag", "last_modified", "expires_at", "size")
+
+    def __init__(self, value: Any, etag: Optional[str], last_modified: Optional[str], expires_at: float, size: int):
+        self._value = value
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        self.size = size
+
+    @property
+    def value(self) -> Any:
+        """A deep copy of the cached body, so callers cannot change the entry."""
+        return copy.deepcopy(self._value)
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at > time.monotonic()
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    Cache for slowly changing GET endpoints, keyed by kind and request.
+    Each kind has its own TTL (0 disables it). Expired entries are kept for
+    revalidation: when the server sent an ETag / Last-Modified, the next request
+    is conditional and a 304 renews the entry without a body. Bounded by entry
+    count and by total response bytes (least recently used first out).
+    """
+
+    DEFAULT_TTLS = {
+        "whitelist_domains": 86400.0,
+        "me": 3600.0,
+        "me_settings": 600.0,
+        "available_features": 3600.0,
+        "plugins": 3600.0,
+        "holiday": 86400.0,
+        "banner_web": 3600.0,
+        "chat_mode": 60.0,
+        "flex_json": 86400.0,
+        "providers": 3600.0,
+    }
+
+    def __init__(self, ttl: Optional[Dict[str, float]] = None, maxsize: int = 512, max_bytes: int = 8 * 1024 * 1024):
+        self.ttl = dict(self.DEFAULT_TTLS)
+        if ttl:
+            self.ttl.update(ttl)
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Tuple[str, Hashable], CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def enabled(self, kind: Optional[str]) -> bool:
+        return kind is not None and self.ttl.get(kind, 0) > 0
+
+    def lookup(self, kind: str, key: Hashable) -> Optional[CachedResponse]:
+        """The entry for a request, fresh or not (check `.fresh`)."""
+        with self._lock:
+            entry = self._data.get((kind, key))
+            if entry is not None:
+                self._data.move_to_end((kind, key))
+            return entry
+
+    def store(self, kind: str, key: Hashable, value: Any, etag: Optional[str] = None, last_modified: Optional[str] = None, size: int = 0) -> None:
+        entry = CachedResponse(value, etag, last_modified, time.monotonic() + self.ttl.get(kind, 0), size)
+        with self._lock:
+            old = self._data.pop((kind, key), None)
+            if old is not None:
+                self._bytes -= old.size
+            if size > self.max_bytes:
+                return
+            self._data[(kind, key)] = entry
+            self._bytes += size
+            while self._data and (len(self._data) > self.maxsize or self._bytes > self.max_bytes):
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= evicted.size
+
+    def renew(self, kind: str, key: Hashable) -> Optional[CachedResponse]:
+        """Extend an entry after a 304 Not Modified."""
+        with self._lock:
+            entry = self._data.get((kind, key))
+            if entry is not None:
+                entry.expires_at = time.monotonic() + self.ttl.get(kind, 0)
+            return entry
+
+    def invalidate(self, kind: Optional[str] = None, url_contains: Optional[str] = None) -> int:
+        """Drop entries of one kind (all when None), optionally only those whose URL contains `url_contains`."""
+        with self._lock:
+            keys = [
+                k for k in self._data
+                if (kind is None or k[0] == kind) and (url_contains is None or url_contains in str(k[1][0]))
+            ]
+            for k in keys:
+                self._bytes -= self._data.pop(k).size
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._data)
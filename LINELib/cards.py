@@ -0,0 +1,272 @@
+import atexit
+import hashlib
+import heapq
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import jsoncodec
+from .logger import lineoa_logger
+from .singleflight import SingleFlight
+from .storage import atomic_write_json
+
+
+CreateFunc = Callable[[str, Dict[str, Any]], int]
+DeleteFunc = Callable[[str, int], None]
+
+
+def card_hash(at_id: str, spec: Dict[str, Any]) -> str:
+    """Content hash of a card: the bot plus every field that changes what the card shows."""
+    data = json.dumps({"at_id": at_id.lstrip("@"), "card": spec}, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+
+
+class CardPool:
+    """
+    Pool of manager.line.biz card type messages keyed by card content.
+
+    acquire() returns the cardTypeMessageId of an identical live card, creating it only
+    on a miss, so sending the same card to many chats costs one request per chat.
+    Cards are retired `ttl` seconds after creation or when the pool holds more than
+    `maxsize`; a background thread deletes retired cards once they have been unused
+    for `grace` seconds (so an in-progress send is never left pointing at a deleted card).
+    The index is saved to `path` and reloaded on start, so live cards are reused and
+    pending deletions finish after a restart. Pools in several processes can share
+    one index: each save first merges in what the others wrote, and when two of them
+    created a card for the same content the older card is kept and the other retired.
+    """
+
+    def __init__(self, create: CreateFunc, delete: DeleteFunc, path: Optional[str] = None, ttl: float = 86400, maxsize: int = 200, grace: float = 60, retries: int = 3):
+        if ttl <= 0 or maxsize < 1:
+            raise ValueError("ttl must be > 0 and maxsize >= 1")
+        self._create = create
+        self._delete = delete
+        self.path = path
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.grace = grace
+        self.retries = retries
+        # hash -> {"at_id", "card_id", "created_at", "last_used"} (epoch seconds), least recently used first
+        self._cards: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # heap of (due_at, at_id, card_id, attempts)
+        self._retired: List[Tuple[float, str, int, int]] = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flights = SingleFlight()
+        self._thread: Optional[threading.Thread] = None
+        # card ids this pool retired or deleted, so a stale copy of the index saved by another process does not revive them
+        self._gone: "OrderedDict[int, None]" = OrderedDict()
+        self._mtime: Optional[int] = None
+        self._load()
+        self._sweep()
+
+    def _file_mtime(self) -> Optional[int]:
+        if not self.path:
+            return None
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self) -> Optional[Dict[str, Any]]:
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                return jsoncodec.loads(f.read())
+        except Exception as e:
+            lineoa_logger.error(f"card pool index load failed ({self.path}): {e}")
+            return None
+
+    def _load(self) -> None:
+        self._mtime = self._file_mtime()
+        data = self._read()
+        if data is None:
+            return
+        cards = sorted((data.get("cards") or {}).items(), key=lambda item: item[1].get("last_used", 0))
+        self._cards = OrderedDict(cards)
+        self._retired = [tuple(entry) for entry in data.get("retired") or []]
+        heapq.heapify(self._retired)
+
+    def _merge(self, data: Dict[str, Any]) -> None:
+        """Fold in an index saved by another process; caller holds the lock."""
+        retired = [tuple(entry) for entry in data.get("retired") or []]
+        retired_ids = {entry[2] for entry in retired}
+        for key, entry in sorted((data.get("cards") or {}).items(), key=lambda item: item[1].get("last_used", 0)):
+            card_id = entry.get("card_id")
+            if card_id in self._gone or card_id in retired_ids:
+                continue
+            mine = self._cards.get(key)
+            if mine is None:
+                self._cards[key] = entry
+            elif mine["card_id"] != card_id:
+                # both pools created this card: keep the older one so they converge on the same id
+                if (entry["created_at"], card_id) < (mine["created_at"], mine["card_id"]):
+                    self._cards[key] = entry
+                    self._retire(mine)
+                else:
+                    self._retire(entry)
+        known = {entry[2] for entry in self._retired}
+        for key in [key for key, entry in self._cards.items() if entry["card_id"] in retired_ids]:
+            # retired by the other process; it will delete the card, so stop handing it out
+            del self._cards[key]
+        for entry in retired:
+            if entry[2] not in known and entry[2] not in self._gone:
+                heapq.heappush(self._retired, entry)
+                known.add(entry[2])
+        while len(self._cards) > self.maxsize:
+            _, evicted = self._cards.popitem(last=False)
+            self._retire(evicted)
+
+    def _refresh(self) -> None:
+        # caller holds the lock
+        if self._file_mtime() != self._mtime:
+            data = self._read()
+            if data is not None:
+                self._merge(data)
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            self._refresh()
+            data = {"cards": dict(self._cards), "retired": [list(entry) for entry in self._retired]}
+            try:
+                atomic_write_json(self.path, data)
+            except Exception as e:
+                lineoa_logger.error(f"card pool index save failed ({self.path}): {e}")
+                return
+            self._mtime = self._file_mtime()
+
+    def acquire(self, at_id: str, spec: Dict[str, Any], create: Optional[Callable[[], int]] = None) -> int:
+        """cardTypeMessageId of a live card with this content; `create` (default: the pool's create) runs on a miss."""
+        at_id = at_id.lstrip("@")
+        key = card_hash(at_id, spec)
+        card_id = self._live(key)
+        if card_id is not None:
+            return card_id
+        return self._flights.do(key, lambda: self._add(key, at_id, spec, create), label="cards")
+
+    def _live(self, key: str) -> Optional[int]:
+        now = time.time()
+        with self._lock:
+            entry = self._cards.get(key)
+            if entry is None or now - entry["created_at"] >= self.ttl:
+                return None
+            entry["last_used"] = now
+            self._cards.move_to_end(key)
+            return entry["card_id"]
+
+    def _add(self, key: str, at_id: str, spec: Dict[str, Any], create: Optional[Callable[[], int]]) -> int:
+        card_id = self._live(key)
+        if card_id is not None:
+            return card_id
+        card_id = int(create() if create is not None else self._create(at_id, spec))
+        now = time.time()
+        with self._lock:
+            old = self._cards.pop(key, None)
+            if old is not None:
+                self._retire(old)
+            self._cards[key] = {"at_id": at_id, "card_id": card_id, "created_at": now, "last_used": now}
+            while len(self._cards) > self.maxsize:
+                _, evicted = self._cards.popitem(last=False)
+                self._retire(evicted)
+        self._save()
+        self._start()
+        return card_id
+
+    def _retire(self, entry: Dict[str, Any], attempts: int = 0) -> None:
+        # caller holds the lock
+        heapq.heappush(self._retired, (entry["last_used"] + self.grace, entry["at_id"], entry["card_id"], attempts))
+        self._forget(entry["card_id"])
+        self._wake.set()
+
+    def _forget(self, card_id: int) -> None:
+        self._gone[card_id] = None
+        while len(self._gone) > 4096:
+            self._gone.popitem(last=False)
+
+    def _sweep(self) -> bool:
+        """Retire expired cards; returns True if the index changed."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._cards.items() if now - entry["created_at"] >= self.ttl]
+            for key in expired:
+                self._retire(self._cards.pop(key))
+            pending = bool(self._retired)
+        if pending:
+            self._start()
+        return bool(expired)
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="card-pool", daemon=True)
+            self._thread.start()
+        atexit.register(self._save)
+
+    def _next_wakeup(self) -> float:
+        with self._lock:
+            times = [self._retired[0][0]] if self._retired else []
+            times.extend(entry["created_at"] + self.ttl for entry in self._cards.values())
+        return min(times) - time.time() if times else 3600.0
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(max(0.0, min(self._next_wakeup(), 3600.0)))
+            self._wake.clear()
+            changed = self._sweep()
+            now = time.time()
+            due = []
+            with self._lock:
+                while self._retired and self._retired[0][0] <= now:
+                    due.append(heapq.heappop(self._retired))
+            for _, at_id, card_id, attempts in due:
+                try:
+                    self._delete(at_id, card_id)
+                    lineoa_logger.info("card pool: deleted card id=%s", card_id)
+                except Exception as e:
+                    if getattr(e, "code", None) == 404:
+                        # already gone (deleted by hand or by another process sharing the index)
+                        continue
+                    lineoa_logger.error("card pool: delete failed (card_id=%s): %s", card_id, e)
+                    if attempts + 1 < self.retries:
+                        with self._lock:
+                            heapq.heappush(self._retired, (time.time() + self.grace * (attempts + 1), at_id, card_id, attempts + 1))
+            if changed or due:
+                self._save()
+
+    def discard(self, at_id: str, spec: Dict[str, Any], card_id: int) -> bool:
+        """Retire the card for this content if it is still `card_id`, e.g. because sending it failed; the next acquire() creates a new one."""
+        key = card_hash(at_id.lstrip("@"), spec)
+        with self._lock:
+            entry = self._cards.get(key)
+            if entry is None or entry["card_id"] != card_id:
+                return False
+            self._retire(self._cards.pop(key))
+        self._save()
+        self._start()
+        return True
+
+    def invalidate(self, at_id: Optional[str] = None) -> int:
+        """Retire every live card (of one bot when given); they are deleted after the grace period."""
+        with self._lock:
+            self._refresh()
+            keys = [key for key, entry in self._cards.items() if at_id is None or entry["at_id"] == at_id.lstrip("@")]
+            for key in keys:
+                self._retire(self._cards.pop(key))
+        if keys:
+            self._save()
+            self._start()
+        return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    @property
+    def pending_deletes(self) -> int:
+        return len(self._retired)
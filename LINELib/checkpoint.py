@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from . import jsoncodec
+from .logger import lineoa_logger
+from .storage import atomic_write_json
+
+
+STREAM = "__stream__"
+
+
+class CheckpointStore(ABC):
+    """
+    Records, per handler, the last acknowledged SSE event id and a window of
+    recently acknowledged ids used to drop replays after a reconnect or restart.
+
+    Acks are kept in memory and written out in batches (every `flush_every` acks
+    or `flush_interval` seconds); use flush_every=1 to persist every ack.
+    Events acked after the last flush may be delivered again after a crash.
+
+    Only events a handler finished without raising are acked for it. A failed
+    event is recorded with `fail()` and holds that handler's last_event_id at the
+    position before it, so resuming from it replays the failed event; later events
+    acked meanwhile stay in the window and are dropped on the replay. Once the
+    failed event is acked the position jumps to the newest acked id.
+
+    Together this gives each handler effectively-once delivery: an event is run
+    until it succeeds and is not run again after its ack is flushed.
+    """
+
+    def __init__(self, window: int = 1024, flush_every: int = 100, flush_interval: float = 1.0):
+        self.window = window
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self._last: Dict[str, str] = {}
+        self._recent: Dict[str, "OrderedDict[str, None]"] = {}
+        self._dirty: Set[str] = set()
+        self._failed: Dict[str, Set[str]] = {}
+        self._held: Dict[str, str] = {}
+        self._pending = 0
+        self._closed = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def _start_flusher(self) -> None:
+        if self.flush_interval and self.flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                lineoa_logger.error(f"checkpoint flush failed: {e}")
+
+    def _restore(self, handler: str, last_event_id: Optional[str], recent) -> None:
+        if last_event_id:
+            self._last[handler] = last_event_id
+        window = self._recent.setdefault(handler, OrderedDict())
+        for event_id in recent or ():
+            window[event_id] = None
+
+    def last_event_id(self, handler: str = STREAM) -> Optional[str]:
+        with self._lock:
+            return self._last.get(handler)
+
+    def seen(self, handler: str, event_id: Optional[str]) -> bool:
+        if not event_id:
+            return False
+        with self._lock:
+            window = self._recent.get(handler)
+            return window is not None and event_id in window
+
+    def failed(self, handler: str = STREAM) -> Set[str]:
+        with self._lock:
+            return set(self._failed.get(handler, ()))
+
+    def fail(self, handler: str, event_id: Optional[str]) -> None:
+        """Record that `event_id` was not handled; the position stays before it until it is acked."""
+        if not event_id:
+            return
+        with self._lock:
+            self._failed.setdefault(handler, set()).add(event_id)
+
+    def ack(self, handler: str, event_id: Optional[str]) -> None:
+        if not event_id:
+            return
+        with self._lock:
+            failed = self._failed.get(handler)
+            retried = failed is not None and event_id in failed
+            if retried:
+                failed.discard(event_id)
+            if failed:
+                if not retried:
+                    self._held[handler] = event_id
+            elif retried:
+                self._last[handler] = self._held.pop(handler, event_id)
+            else:
+                self._held.pop(handler, None)
+                self._last[handler] = event_id
+            window = self._recent.setdefault(handler, OrderedDict())
+            window[event_id] = None
+            while len(window) > self.window:
+                window.popitem(last=False)
+            self._dirty.add(handler)
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            dirty = {handler: (self._last.get(handler), list(self._recent.get(handler, ()))) for handler in self._dirty}
+            self._write(dirty)
+            self._dirty.clear()
+            self._pending = 0
+
+    def close(self) -> None:
+        self._closed.set()
+        self.flush()
+
+    @abstractmethod
+    def _write(self, dirty) -> None:
+        """Persist {handler: (last_event_id, recent_ids)} for the handlers acked since the last flush."""
+
+
+class FileCheckpointStore(CheckpointStore):
+    """Checkpoints kept in a compact JSON file, replaced atomically and fsynced on each flush."""
+
+    def __init__(self, path: str = "lineoa-checkpoint.json", window: int = 1024, flush_every: int = 100, flush_interval: float = 1.0):
+        super().__init__(window=window, flush_every=flush_every, flush_interval=flush_interval)
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            try:
+                with open(path, "rb") as f:
+                    data = jsoncodec.loads(f.read())
+                for handler, entry in (data.get("handlers") or {}).items():
+                    self._restore(handler, entry.get("last"), entry.get("recent"))
+            except Exception as e:
+                lineoa_logger.error(f"checkpoint load failed ({path}): {e}")
+        self._start_flusher()
+
+    def _write(self, dirty) -> None:
+        handlers = {
+            handler: {"last": self._last.get(handler), "recent": list(self._recent.get(handler, ()))}
+            for handler in self._last
+        }
+        atomic_write_json(self.path, {"version": 1, "saved_at": time.time(), "handlers": handlers})
+
+
+class SQLiteCheckpointStore(CheckpointStore):
+    """Checkpoints kept in SQLite; each flush upserts only the handlers acked since the last one."""
+
+    def __init__(self, path: str = "lineoa-checkpoint.sqlite3", window: int = 1024, flush_every: int = 100, flush_interval: float = 1.0):
+        super().__init__(window=window, flush_every=flush_every, flush_interval=flush_interval)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints (handler TEXT PRIMARY KEY, last_event_id TEXT, recent TEXT NOT NULL)"
+        )
+        for handler, last_event_id, recent in self._conn.execute("SELECT handler, last_event_id, recent FROM checkpoints"):
+            self._restore(handler, last_event_id, jsoncodec.loads(recent))
+        self._start_flusher()
+
+    def _write(self, dirty) -> None:
+        self._conn.executemany(
+            "INSERT INTO checkpoints (handler, last_event_id, recent) VALUES (?, ?, ?) "
+            "ON CONFLICT (handler) DO UPDATE SET last_event_id = excluded.last_event_id, recent = excluded.recent",
+            [(handler, last, jsoncodec.dumps(recent)) for handler, (last, recent) in dirty.items()],
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        super().close()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,93 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .logger import lineoa_logger
+
+
+_TIME_KEYS = ("now", "currentTime", "serverTime", "timestamp", "time", "epochMillis")
+
+
+def _server_millis(response: Any) -> Optional[float]:
+    """Pull the server time (epoch ms) out of a clock/now response."""
+    value = response
+    if isinstance(response, dict):
+        value = next((response[key] for key in _TIME_KEYS if key in response), None)
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            return None
+    if not isinstance(value, (int, float)) or isinstance(value, bool):
+        return None
+    # seconds -> ms
+    return float(value) * 1000.0 if value < 1e11 else float(value)
+
+
+class ClockSync:
+    """
+    Maps the local monotonic clock onto the server clock.
+
+    `offset` is server epoch seconds minus time.monotonic(), estimated from
+    get_clock_now round trips (midpoint of the request, best of `samples`
+    by round-trip time). Until the first sync it falls back to the local wall
+    clock, so lags are still meaningful, just not skew-corrected.
+    """
+
+    def __init__(self, fetch: Callable[[], Dict[str, Any]], samples: int = 3, refresh_interval: float = 3600):
+        self._fetch = fetch
+        self.samples = max(1, int(samples))
+        self.refresh_interval = refresh_interval
+        self.offset = time.time() - time.monotonic()
+        self.rtt: Optional[float] = None
+        self.synced_at: Optional[float] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def synced(self) -> bool:
+        return self.synced_at is not None
+
+    @property
+    def skew(self) -> float:
+        """Seconds the server clock is ahead of the local wall clock."""
+        return self.offset - (time.time() - time.monotonic())
+
+    def sync(self) -> float:
+        """Measure the offset now and return it."""
+        best = None
+        for _ in range(self.samples):
+            sent_at = time.monotonic()
+            millis = _server_millis(self._fetch())
+            received_at = time.monotonic()
+            if millis is None:
+                continue
+            rtt = received_at - sent_at
+            if best is None or rtt < best[0]:
+                best = (rtt, millis / 1000.0 - (sent_at + rtt / 2))
+        if best is None:
+            raise ValueError("clock/now response has no usable time")
+        with self._lock:
+            self.rtt, self.offset = best
+            self.synced_at = time.monotonic()
+        lineoa_logger.logger.debug("clock synced: skew=%.3fs rtt=%.3fs", self.skew, self.rtt, extra={"tag": "CLOCK"})
+        return self.offset
+
+    def maybe_sync(self) -> None:
+        """Sync when never synced or older than refresh_interval; failures keep the previous offset."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.refresh_interval:
+            return
+        self._checked_at = now
+        try:
+            self.sync()
+        except Exception as e:
+            lineoa_logger.error(f"clock sync failed: {e}")
+
+    def server_time(self, monotonic: Optional[float] = None) -> float:
+        """Server epoch seconds at a monotonic instant (now by default)."""
+        return (time.monotonic() if monotonic is None else monotonic) + self.offset
+
+    def lag(self, server_timestamp_ms: float, monotonic: Optional[float] = None) -> float:
+        """Seconds from a server-side timestamp (epoch ms) to a local monotonic instant."""
+        return self.server_time(monotonic) - server_timestamp_ms / 1000.0
@@ -22,6 +22,11 @@ class ListenConfig:
     reconnect_interval: float = 5
     max_reconnects: Optional[int] = None
     max_stream_seconds: float = 82800
+    backoff_max: float = 300
+    backoff_multiplier: float = 2
+    backoff_jitter: float = 0.5
+    auth_failure_cooldown: float = 600
+    stall_factor: Optional[float] = 1.25
 
     def __post_init__(self):
         if int(self.ping_secs) < 1:
@@ -32,3 +37,13 @@ class ListenConfig:
             raise ValueError("max_reconnects must be greater than or equal to 0")
         if float(self.max_stream_seconds) <= 0:
             raise ValueError("max_stream_seconds must be greater than 0")
+        if float(self.backoff_max) < float(self.reconnect_interval):
+            raise ValueError("backoff_max must be greater than or equal to reconnect_interval")
+        if float(self.backoff_multiplier) < 1:
+            raise ValueError("backoff_multiplier must be greater than or equal to 1")
+        if not 0 <= float(self.backoff_jitter) <= 1:
+            raise ValueError("backoff_jitter must be between 0 and 1")
+        if float(self.auth_failure_cooldown) < 0:
+            raise ValueError("auth_failure_cooldown must be greater than or equal to 0")
+        if self.stall_factor is not None and float(self.stall_factor) <= 1:
+            raise ValueError("stall_factor must be greater than 1")
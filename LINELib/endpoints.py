@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import copy
+import inspect
+import random
+import string
+import time
+import urllib.parse
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Dict, Mapping, Optional, Tuple
+
+import requests
+
+from . import jsoncodec
+from .exceptions import LINEOAError
+from .metrics import RESPONSE_CACHE
+from .singleflight import freeze
+
+if TYPE_CHECKING:
+    import aiohttp
+    from .ChatService import ChatService
+
+
+CHAT_API = "https://chat.line.biz/api"
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({"GET", "PUT", "DELETE"})
+_COOKIE_DOMAINS = ("chat.line.biz", ".chat.line.biz", "manager.line.biz", ".line.biz")
+
+# what the chat.line.biz web client sends (Edge 144 on Windows); every call, generated or hand-written, starts from this
+BROWSER_HEADERS = {
+    "accept": "application/json, text/plain, */*",
+    "accept-encoding": "gzip, deflate, br, zstd",
+    "accept-language": "ja,en;q=0.9,en-GB;q=0.8,en-US;q=0.7",
+    "priority": "u=1, i",
+    "sec-ch-ua": '"Not(A:Brand";v="8", "Chromium";v="144", "Microsoft Edge";v="144"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"Windows"',
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-origin",
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36 Edg/144.0.0.0",
+}
+
+
+def _query_value(value: Any) -> Any:
+    if isinstance(value, bool):
+        return str(value).lower()
+    return value
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """
+    One API call described as data. EndpointClient and AsyncEndpointClient turn every
+    registered Endpoint into a method of the same name.
+
+    `path` is a str.format template whose fields become positional arguments; `query`
+    maps keyword arguments to query parameter names; `body` builds the JSON body from
+    its own keyword arguments (which may reuse path fields). Query parameters named in
+    `volatile` are sent but left out of the cache and single-flight key.
+    """
+
+    name: str
+    method: str
+    path: str
+    query: Mapping[str, str] = field(default_factory=dict)
+    defaults: Mapping[str, Any] = field(default_factory=dict)
+    body: Optional[Callable[..., Any]] = None
+    referer: Optional[str] = None
+    cache: Optional[str] = None
+    empty_response: bool = False
+    volatile: Tuple[str, ...] = ()
+    base: str = CHAT_API
+    doc: str = ""
+
+    def __post_init__(self):
+        if self.method not in ("GET", "POST", "PUT", "DELETE"):
+            raise ValueError(f"{self.name}: unsupported method {self.method}")
+        if not self.path.startswith("/"):
+            raise ValueError(f"{self.name}: path must start with '/'")
+        if self.body is not None and self.method == "GET":
+            raise ValueError(f"{self.name}: GET endpoints cannot have a body")
+
+    @cached_property
+    def path_params(self) -> Tuple[str, ...]:
+        return tuple(name for _, name, _, _ in string.Formatter().parse(self.path) if name)
+
+    @cached_property
+    def body_params(self) -> Tuple[str, ...]:
+        return tuple(inspect.signature(self.body).parameters) if self.body is not None else ()
+
+    @cached_property
+    def signature(self) -> inspect.Signature:
+        params = [inspect.Parameter(name, inspect.Parameter.POSITIONAL_OR_KEYWORD) for name in self.path_params]
+        seen = set(self.path_params)
+        for name in self.query:
+            if name not in seen:
+                seen.add(name)
+                params.append(inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=self.defaults.get(name)))
+        if self.body is not None:
+            for name, param in inspect.signature(self.body).parameters.items():
+                if name not in seen:
+                    seen.add(name)
+                    default = self.defaults.get(name, param.default)
+                    params.append(inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=default))
+        return inspect.Signature(params)
+
+    def build(self, args: tuple, kwargs: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]], Any, Optional[str]]:
+        """(url, query params, JSON body, referer) for one call."""
+        bound = self.signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        values = bound.arguments
+        url = self.base + self.path.format(**{name: urllib.parse.quote(str(values[name]), safe="@") for name in self.path_params})
+        params = {wire: _query_value(values[name]) for name, wire in self.query.items() if values.get(name) is not None}
+        payload = self.body(**{name: values[name] for name in self.body_params}) if self.body is not None else None
+        referer = self.referer.format(**values) if self.referer else None
+        return url, params or None, payload, referer
+
+    def cache_key(self, params: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Query params that identify the response, or None when all of them do."""
+        if not self.volatile or not params:
+            return None
+        return {name: value for name, value in params.items() if name not in self.volatile}
+
+
+ENDPOINTS: Dict[str, Endpoint] = {}
+
+
+def register(endpoint: Endpoint) -> Endpoint:
+    """Add an endpoint and generate its sync and async client methods."""
+    for cls in (EndpointClient, AsyncEndpointClient):
+        existing = getattr(cls, endpoint.name, None)
+        if existing is not None and not getattr(existing, "_endpoint", None):
+            raise ValueError(f"{endpoint.name} clashes with {cls.__name__}.{endpoint.name}")
+        setattr(cls, endpoint.name, _make_method(endpoint, asyncio_method=cls is AsyncEndpointClient))
+    ENDPOINTS[endpoint.name] = endpoint
+    return endpoint
+
+
+def _make_method(endpoint: Endpoint, asyncio_method: bool) -> Callable[..., Any]:
+    if asyncio_method:
+        async def method(self, *args: Any, **kwargs: Any) -> Any:
+            return await self.call(endpoint.name, *args, **kwargs)
+    else:
+        def method(self, *args: Any, **kwargs: Any) -> Any:
+            return self.call(endpoint.name, *args, **kwargs)
+    method.__name__ = method.__qualname__ = endpoint.name
+    method.__doc__ = endpoint.doc or f"{endpoint.method} {endpoint.path}"
+    method.__signature__ = endpoint.signature.replace(
+        parameters=[inspect.Parameter("self", inspect.Parameter.POSITIONAL_OR_KEYWORD), *endpoint.signature.parameters.values()]
+    )
+    method._endpoint = endpoint
+    return method
+
+
+class _BaseClient:
+    """Header caching and retry policy shared by the sync and async clients."""
+
+    def __init__(self, service: "ChatService", xsrf_token: Optional[str] = None, retries: int = 2, backoff: float = 0.5):
+        self.service = service
+        self.xsrf_token = xsrf_token
+        self.retries = retries
+        self.backoff = backoff
+        self._header_cache: Dict[Any, Dict[str, str]] = {}
+
+    def _cookie_pairs(self) -> Tuple[Tuple[str, str], ...]:
+        raise NotImplementedError
+
+    def _headers(self, endpoint: Endpoint, referer: Optional[str], cookies: Tuple[Tuple[str, str], ...]) -> Dict[str, str]:
+        return self._browser_headers(referer, cookies, endpoint.method, endpoint.body is not None)
+
+    def _browser_headers(self, referer: Optional[str], cookies: Tuple[Tuple[str, str], ...], method: str, json: bool) -> Dict[str, str]:
+        key = (cookies, self.xsrf_token, referer, method, json)
+        headers = self._header_cache.get(key)
+        if headers is None:
+            headers = dict(BROWSER_HEADERS)
+            if referer:
+                headers["referer"] = referer
+            # browsers only send Origin on same-origin requests that are not GET
+            if method != "GET":
+                headers["origin"] = "https://chat.line.biz"
+            headers["x-oa-chat-client-version"] = self.service.chat_client_version
+            # like the web client, fall back to the XSRF-TOKEN cookie when no token was given
+            xsrf_token = self.xsrf_token or dict(cookies).get("XSRF-TOKEN")
+            if xsrf_token:
+                headers["x-xsrf-token"] = xsrf_token
+            if json:
+                headers["content-type"] = "application/json"
+            if cookies:
+                headers["cookie"] = "; ".join(f"{k}={v}" for k, v in cookies)
+            if len(self._header_cache) >= 256:
+                self._header_cache.clear()
+            self._header_cache[key] = headers
+        return headers
+
+    def request_headers(self, referer: Optional[str] = None, method: str = "GET", json: bool = False) -> Dict[str, str]:
+        """Headers for a hand-written chat.line.biz call (sends, uploads) on this client's credentials."""
+        return dict(self._browser_headers(referer, self._cookie_pairs(), method, json))
+
+    def _retryable(self, endpoint: Endpoint, attempt: int, error: BaseException) -> bool:
+        if attempt >= self.retries or endpoint.method not in IDEMPOTENT_METHODS:
+            return False
+        return getattr(error, "code", None) in RETRY_STATUSES or not isinstance(error, LINEOAError)
+
+    def _delay(self, attempt: int) -> float:
+        return self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    @staticmethod
+    def _result(endpoint: Endpoint, status: int, text: str, parse: Callable[[], Any]) -> Any:
+        if status >= 400:
+            raise LINEOAError(f"{endpoint.name} failed: HTTP {status}: {text}", code=status)
+        if endpoint.empty_response or not text:
+            return {}
+        return parse()
+
+
+class EndpointClient(_BaseClient):
+    """
+    requests-based client with one method per registered Endpoint, e.g.
+    `client.get_chat(bot_id, chat_id)`. Calls go through ChatService so hooks,
+    metrics, single-flight and the response cache apply.
+    """
+
+    def __init__(self, service: "ChatService", session: Optional[requests.Session] = None, xsrf_token: Optional[str] = None, retries: int = 2, backoff: float = 0.5):
+        super().__init__(service, xsrf_token=xsrf_token, retries=retries, backoff=backoff)
+        self.session = session
+
+    def _cookie_pairs(self) -> Tuple[Tuple[str, str], ...]:
+        if not isinstance(self.session, requests.Session):
+            return ()
+        cookies: Dict[str, str] = {}
+        for domain in _COOKIE_DOMAINS:
+            cookies.update(self.session.cookies.get_dict(domain=domain))
+        return tuple(cookies.items())
+
+    def call(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        endpoint = ENDPOINTS[name]
+        url, params, payload, referer = endpoint.build(args, kwargs)
+        cookies = self._cookie_pairs()
+        headers = self._headers(endpoint, referer, cookies)
+        req = self.session if self.session is not None else requests
+        attempt = 0
+        while True:
+            try:
+                if endpoint.method == "GET":
+                    return self.service._fetch_json(req, url, headers, params=params, auth=(self.xsrf_token, cookies), cache_kind=endpoint.cache, cache_key=endpoint.cache_key(params), name=endpoint.name)
+                resp = self.service._request(req, endpoint.method, url, retries=attempt, headers=headers, params=params, json=payload)
+                return self._result(endpoint, resp.status_code, resp.text, lambda: jsoncodec.loads(resp.content))
+            except (LINEOAError, requests.ConnectionError, requests.Timeout) as e:
+                if not self._retryable(endpoint, attempt, e):
+                    raise
+            time.sleep(self._delay(attempt))
+            attempt += 1
+
+
+class AsyncEndpointClient(_BaseClient):
+    """
+    aiohttp counterpart of EndpointClient; every endpoint method is a coroutine.
+    Use as `async with` to share one ClientSession, otherwise each call opens its own.
+    """
+
+    def __init__(self, service: "ChatService", session: Optional["aiohttp.ClientSession"] = None, cookies: Optional[Dict[str, str]] = None, xsrf_token: Optional[str] = None, retries: int = 2, backoff: float = 0.5):
+        super().__init__(service, xsrf_token=xsrf_token, retries=retries, backoff=backoff)
+        self.session = session
+        self._own_session = False
+        self._cookies = tuple(sorted((cookies or {}).items()))
+
+    def _cookie_pairs(self) -> Tuple[Tuple[str, str], ...]:
+        return self._cookies
+
+    async def __aenter__(self) -> "AsyncEndpointClient":
+        if self.session is None:
+            from .ChatService import _aiohttp
+            self.session = _aiohttp().ClientSession()
+            self._own_session = True
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        if self._own_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+            self._own_session = False
+
+    async def call(self, name: str, *args: Any, **kwargs: Any) -> Any:
+        import asyncio
+        from .ChatService import _aiohttp
+        aiohttp = _aiohttp()
+        endpoint = ENDPOINTS[name]
+        url, params, payload, referer = endpoint.build(args, kwargs)
+        headers = self._headers(endpoint, referer, self._cookies)
+        attempt = 0
+        while True:
+            try:
+                if endpoint.method == "GET":
+                    return await self._get(endpoint, url, params, headers)
+                return await self._send(endpoint, url, params, payload, headers, attempt)
+            except (LINEOAError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if not self._retryable(endpoint, attempt, e):
+                    raise
+            await asyncio.sleep(self._delay(attempt))
+            attempt += 1
+
+    async def _request(self, method: str, url: str, attempt: int = 0, **kwargs: Any) -> Tuple[int, str, Mapping[str, str], int]:
+        from .ChatService import _aiohttp
+        session = self.session if self.session is not None else _aiohttp().ClientSession()
+        try:
+            async with self.service._arequest(session, method, url, retries=attempt, **kwargs) as resp:
+                body = await resp.read()
+                return resp.status, body.decode(resp.charset or "utf-8", errors="replace"), resp.headers, len(body)
+        finally:
+            if session is not self.session:
+                await session.close()
+
+    async def _send(self, endpoint: Endpoint, url: str, params: Any, payload: Any, headers: Dict[str, str], attempt: int) -> Any:
+        status, text, _, _ = await self._request(endpoint.method, url, attempt, headers=headers, params=params, json=payload)
+        return self._result(endpoint, status, text, lambda: jsoncodec.loads(text))
+
+    async def _get(self, endpoint: Endpoint, url: str, params: Any, headers: Dict[str, str]) -> Any:
+        cache = self.service.response_cache if self.service.response_cache is not None and self.service.response_cache.enabled(endpoint.cache) else None
+        shared_params = endpoint.cache_key(params) or params
+        key = (url, freeze(shared_params), freeze((self.xsrf_token, self._cookies)))
+        if cache is not None:
+            entry = cache.lookup(endpoint.cache, key)
+            if entry is not None and entry.fresh:
+                RESPONSE_CACHE.inc(kind=endpoint.cache, result="hit")
+                return entry.value
+
+        async def load() -> Any:
+            entry = cache.lookup(endpoint.cache, key) if cache is not None else None
+            send_headers = dict(headers, **entry.conditional_headers()) if entry is not None else headers
+            status, text, resp_headers, size = await self._request("GET", url, headers=send_headers, params=params)
+            if status == 304 and entry is not None:
+                cache.renew(endpoint.cache, key)
+                RESPONSE_CACHE.inc(kind=endpoint.cache, result="revalidated")
+                return entry.value
+            value = self._result(endpoint, status, text, lambda: jsoncodec.loads(text))
+            if cache is not None:
+                cache.store(endpoint.cache, key, value, etag=resp_headers.get("ETag"), last_modified=resp_headers.get("Last-Modified"), size=size)
+                RESPONSE_CACHE.inc(kind=endpoint.cache, result="miss")
+            return value
+        value = await self.service._async_shared_get(url, load, params=shared_params, auth=(self.xsrf_token, self._cookies, id(self.session)))
+        return copy.deepcopy(value) if cache is not None else value
+
+
+def _mark_as_read_body(message_id: str, timestamp: Optional[int] = None) -> Dict[str, Any]:
+    return {"lastMessage": {"messageId": message_id, "timestamp": timestamp if timestamp is not None else int(time.time() * 1000)}}
+
+
+def _streaming_state_body(state: Dict[str, Any]) -> Dict[str, Any]:
+    if not state or "connectionId" not in state or "idle" not in state:
+        raise LINEOAError("require state 'connectionId' and 'idle' fields")
+    return dict(state)
+
+
+_CHAT_REFERER = "https://chat.line.biz/{bot_id}/chat/{chat_id}"
+
+for _endpoint in (
+    # account / global
+    Endpoint("get_me", "GET", "/v1/me", cache="me", doc="Own account info."),
+    Endpoint("get_csrf_token", "GET", "/v1/csrfToken"),
+    Endpoint("get_me_settings_pc", "GET", "/v1/me/settings/pc", cache="me_settings"),
+    Endpoint("get_whitelist_domains", "GET", "/v1/whitelistDomains", cache="whitelist_domains"),
+    Endpoint("get_providers", "GET", "/v1/providers", cache="providers"),
+    Endpoint("get_clock_now", "GET", "/v1/clock/now"),
+    Endpoint("get_holiday", "GET", "/v1/holiday/{country}", cache="holiday"),
+    # bots
+    Endpoint("get_bot_accounts", "GET", "/v1/bots", query={"limit": "limit", "no_filter": "noFilter"}, defaults={"limit": 1000, "no_filter": True}),
+    Endpoint("get_bot_account", "GET", "/v1/bots/{bot_id}", query={"no_filter": "noFilter"}, defaults={"no_filter": True}),
+    Endpoint("get_chat_mode", "GET", "/v4/bots/{bot_id}/settings/chatMode", cache="chat_mode"),
+    Endpoint("get_chat_mode_schedules", "GET", "/v1/bots/{bot_id}/settings/chatModeSchedules"),
+    Endpoint("get_available_features", "GET", "/v2/bots/{bot_id}/availableFeatures", cache="available_features"),
+    Endpoint("get_banner_web", "GET", "/v2/bots/{bot_id}/banner/web", cache="banner_web"),
+    Endpoint("get_plugins", "GET", "/v1/bots/{bot_id}/plugins", cache="plugins"),
+    Endpoint("get_call_session", "GET", "/v1/bots/{bot_id}/callSession"),
+    Endpoint("get_authorized_users", "GET", "/v1/bots/{bot_id}/authorizedUsers", query={"biz_ids": "bizIds"}, defaults={"biz_ids": "__AUTO_RESPONSE"}),
+    Endpoint("get_recent_stickers", "GET", "/v1/bots/{bot_id}/stickers/recently"),
+    Endpoint("get_recent_emojis", "GET", "/v1/bots/{bot_id}/emojis/recently"),
+    Endpoint(
+        "get_saved_replies", "GET", "/v2/bots/{bot_id}/savedReplies",
+        query={"query": "query", "exclude_username_placeholder": "excludeUsernamePlaceholder", "sort_key": "sortKey", "page_size": "pageSize", "page": "page"},
+        defaults={"query": "", "exclude_username_placeholder": False, "sort_key": "CREATED_AT", "page_size": 25, "page": 1},
+    ),
+    # chats
+    Endpoint(
+        "get_chats", "GET", "/v2/bots/{bot_id}/chats",
+        query={"folder_type": "folderType", "tag_ids": "tagIds", "auto_tag_ids": "autoTagIds", "limit": "limit", "prioritize_pinned_chat": "prioritizePinnedChat", "next_cursor": "next"},
+        defaults={"folder_type": "ALL", "tag_ids": "", "auto_tag_ids": "", "limit": 25, "prioritize_pinned_chat": True},
+        referer="https://chat.line.biz/{bot_id}",
+        doc="One page of the chat list; pass the previous page's `next` as next_cursor.",
+    ),
+    Endpoint("get_chat", "GET", "/v1/bots/{bot_id}/chats/{chat_id}", referer=_CHAT_REFERER),
+    Endpoint("get_chat_members", "GET", "/v1/bots/{bot_id}/chats/{chat_id}/members", query={"limit": "limit"}, defaults={"limit": 100}, referer=_CHAT_REFERER),
+    Endpoint("get_chat_messages", "GET", "/v3/bots/{bot_id}/chats/{chat_id}/messages", query={"limit": "limit", "before": "before", "after": "after"}, defaults={"limit": 50}, referer=_CHAT_REFERER),
+    Endpoint("get_pinned_messages", "GET", "/v2/bots/{bot_id}/chats/{chat_id}/messages/pin", referer=_CHAT_REFERER),
+    Endpoint("get_activities", "GET", "/v1/bots/{bot_id}/chats/{chat_id}/activities", query={"limit": "limit"}, defaults={"limit": 1}, referer=_CHAT_REFERER),
+    Endpoint("get_notes", "GET", "/v1/bots/{bot_id}/chats/{chat_id}/notes", query={"limit": "limit", "with_total": "withTotal"}, defaults={"limit": 20, "with_total": True}, referer=_CHAT_REFERER),
+    Endpoint("get_use_manual_chat", "GET", "/v2/bots/{bot_id}/chats/{chat_id}/useManualChat", referer=_CHAT_REFERER),
+    Endpoint(
+        "get_flex_json", "GET", "/v1/bots/{bot_id}/chats/{chat_id}/messages/flexJson",
+        query={"message_id": "messageId", "timestamp": "timestamp"}, referer=_CHAT_REFERER, cache="flex_json", volatile=("timestamp",),
+        doc="Flex JSON of a sent cardType message; it never changes, so the timestamp is not part of the cache key.",
+    ),
+    # writes (message sends stay in ChatService / LINELib, behind the rate limiter)
+    Endpoint("mark_as_read", "PUT", "/v2/bots/{bot_id}/chats/{chat_id}/markAsRead", body=_mark_as_read_body, referer=_CHAT_REFERER, empty_response=True),
+    Endpoint("set_typing", "PUT", "/v1/bots/{bot_id}/chats/{chat_id}/typing", referer=_CHAT_REFERER, empty_response=True),
+    Endpoint("streaming_state", "PUT", "/v1/bots/{bot_id}/streaming/state", body=_streaming_state_body, empty_response=True),
+):
+    register(_endpoint)
+del _endpoint
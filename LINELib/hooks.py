@@ -0,0 +1,49 @@
+from typing import Any, Callable, Dict, List
+
+from .logger import lineoa_logger
+
+
+Hook = Callable[[Dict[str, Any]], None]
+
+
+class Hooks:
+    """
+    Before/after callbacks around one unit of work (an HTTP call, an event dispatch).
+    Both phases receive the same info dict, so a before hook can stash state
+    (a span, a start time) that the matching after hook picks up.
+    Hook errors are logged and never interrupt the work itself.
+    """
+
+    def __init__(self, name: str = "hooks"):
+        self.name = name
+        self.before: List[Hook] = []
+        self.after: List[Hook] = []
+
+    def on_before(self, func: Hook) -> Hook:
+        self.before.append(func)
+        return func
+
+    def on_after(self, func: Hook) -> Hook:
+        self.after.append(func)
+        return func
+
+    def remove(self, func: Hook) -> None:
+        for hooks in (self.before, self.after):
+            while func in hooks:
+                hooks.remove(func)
+
+    def emit_before(self, info: Dict[str, Any]) -> None:
+        self._emit(self.before, info)
+
+    def emit_after(self, info: Dict[str, Any]) -> None:
+        self._emit(self.after, info)
+
+    def _emit(self, hooks: List[Hook], info: Dict[str, Any]) -> None:
+        for hook in hooks:
+            try:
+                hook(info)
+            except Exception as e:
+                lineoa_logger.error("%s hook error (%s): %s", self.name, getattr(hook, "__name__", hook), e)
+
+    def __bool__(self) -> bool:
+        return bool(self.before or self.after)
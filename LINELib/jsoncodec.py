@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+from typing import Any, Optional, Union
+
+
+class JSONCodec:
+    """stdlib json; the fallback every other codec must match in output (UTF-8, compact separators)."""
+
+    name = "json"
+
+    def loads(self, data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    def dumps(self, obj: Any, indent: Optional[int] = None, sort_keys: bool = False) -> str:
+        separators = None if indent else (",", ":")
+        return json.dumps(obj, ensure_ascii=False, indent=indent, sort_keys=sort_keys, separators=separators)
+
+    def dumpb(self, obj: Any) -> bytes:
+        return self.dumps(obj).encode("utf-8")
+
+
+class OrjsonCodec(JSONCodec):
+    """orjson, falling back to stdlib json for what orjson refuses (indent other than 2, non-str keys, huge ints)."""
+
+    name = "orjson"
+
+    def __init__(self) -> None:
+        import orjson
+        self._orjson = orjson
+
+    def loads(self, data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        return self._orjson.loads(data)
+
+    def _dumpb(self, obj: Any, indent: Optional[int], sort_keys: bool) -> Optional[bytes]:
+        if indent not in (None, 2):
+            return None
+        option = 0
+        if indent:
+            option |= self._orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= self._orjson.OPT_SORT_KEYS
+        try:
+            return self._orjson.dumps(obj, option=option)
+        except TypeError:
+            return None
+
+    def dumps(self, obj: Any, indent: Optional[int] = None, sort_keys: bool = False) -> str:
+        data = self._dumpb(obj, indent, sort_keys)
+        return data.decode("utf-8") if data is not None else super().dumps(obj, indent=indent, sort_keys=sort_keys)
+
+    def dumpb(self, obj: Any) -> bytes:
+        data = self._dumpb(obj, None, False)
+        return data if data is not None else super().dumpb(obj)
+
+
+CODECS = {"json": JSONCodec, "orjson": OrjsonCodec}
+
+_codec: Optional[JSONCodec] = None
+_lock = threading.Lock()
+
+
+def _detect() -> JSONCodec:
+    preferred = os.environ.get("LINEOA_JSON_CODEC", "").strip().lower()
+    names = [preferred] if preferred else ["orjson", "json"]
+    for name in names:
+        factory = CODECS.get(name)
+        if factory is None:
+            continue
+        try:
+            return factory()
+        except ImportError:
+            continue
+    return JSONCodec()
+
+
+def get_codec() -> JSONCodec:
+    """The active codec: orjson when installed (or whatever LINEOA_JSON_CODEC names), else stdlib json."""
+    global _codec
+    if _codec is None:
+        with _lock:
+            if _codec is None:
+                _codec = _detect()
+    return _codec
+
+
+def set_codec(codec: Union[str, JSONCodec, None]) -> JSONCodec:
+    """Switch codec by name ("json" / "orjson"), by instance, or back to auto-detection with None."""
+    global _codec
+    if isinstance(codec, str):
+        if codec not in CODECS:
+            raise ValueError(f"unknown JSON codec: {codec} (choose from {', '.join(CODECS)})")
+        codec = CODECS[codec]()
+    with _lock:
+        _codec = codec
+    return get_codec()
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    return get_codec().loads(data)
+
+
+def dumps(obj: Any, indent: Optional[int] = None, sort_keys: bool = False) -> str:
+    return get_codec().dumps(obj, indent=indent, sort_keys=sort_keys)
+
+
+def dumpb(obj: Any) -> bytes:
+    return get_codec().dumpb(obj)
@@ -1,8 +1,16 @@
 import threading
+import time
+from typing import Optional
 
 from LINELib.LINELib import LINELib
 from LINELib.config import ListenConfig
 from LINELib.logger import lineoa_logger
+from LINELib.sse import event_timestamp
+from LINELib.reconnect import ReconnectPolicy
+from LINELib.checkpoint import STREAM, CheckpointStore, FileCheckpointStore
+from LINELib.watchdog import StreamWatchdog
+from LINELib.hooks import Hooks
+from LINELib.metrics import DISPATCH_QUEUE_DEPTH, EVENT_DELIVERY, EVENT_DISPATCH_DELAY, EVENT_END_TO_END, HANDLER_DURATION, RECONNECTS, start_http_server
 
 
 class LineBot:
@@ -20,6 +28,17 @@ class LineBot:
         reconnect_interval=5,
         max_reconnects=None,
         max_stream_seconds=82800,
+        backoff_max=300,
+        backoff_multiplier=2,
+        backoff_jitter=0.5,
+        auth_failure_cooldown=600,
+        stall_factor=1.25,
+        metadata_ttl=None,
+        checkpoint=None,
+        metrics_port=None,
+        clock_sync=True,
+        state_path=None,
+        response_ttl=None,
     ):
         self.cookie_path = cookie_path
         self.listen_config = ListenConfig(
@@ -29,17 +48,33 @@ class LineBot:
             reconnect_interval=reconnect_interval,
             max_reconnects=max_reconnects,
             max_stream_seconds=max_stream_seconds,
+            backoff_max=backoff_max,
+            backoff_multiplier=backoff_multiplier,
+            backoff_jitter=backoff_jitter,
+            auth_failure_cooldown=auth_failure_cooldown,
+            stall_factor=stall_factor,
         )
         self.ping_secs = self.listen_config.ping_secs
         self.device_type = self.listen_config.device_type
         self.client_type = self.listen_config.client_type
         self.handlers = {}
+        self.listeners = []
+        self.event_hooks = Hooks("event")
         self.running = False
         self.reconnect_interval = self.listen_config.reconnect_interval
         self.max_reconnects = self.listen_config.max_reconnects
         self._stop_event = threading.Event()
         self._listen_thread = None
+        self.reconnect_policy = ReconnectPolicy(self.listen_config)
+        self.watchdog = None
+        if self.listen_config.stall_factor is not None:
+            self.watchdog = StreamWatchdog(self.ping_secs * self.listen_config.stall_factor, self.listen_config.max_stream_seconds)
         self._last_event_id = None
+        if isinstance(checkpoint, str):
+            checkpoint = FileCheckpointStore(checkpoint)
+        self.checkpoint: Optional[CheckpointStore] = checkpoint
+        self.metrics_server = start_http_server(metrics_port) if metrics_port is not None else None
+        self.clock_sync = clock_sync
         self._lib = LINELib(
             storage=self.cookie_path,
             email=email,
@@ -47,8 +82,13 @@ class LineBot:
             rate_limit=rate_limit,
             rate_limit_window=rate_limit_window,
             rate_limit_enabled=rate_limit_enabled,
+            metadata_ttl=metadata_ttl,
+            state_path=state_path,
+            response_ttl=response_ttl,
         )
         self._session = self._lib._session
+        self.listener(self._lib.metadata.handle_event)
+        self.listener(self._lib.id_map.observe_event)
         self._xsrf_token = self._lib._xsrf_token
         self._bot_ids = None
         try:
@@ -66,6 +106,10 @@ class LineBot:
         """Send a file to the given chat."""
         return self._lib.sendFile(chat_id=str(chat_id), file_path=str(file_path), bot_id=bot_id)
 
+    def sendCard(self, bot_id=None, chat_id=None, title=None, image_url=None, **card):
+        """Send a card message; identical cards are reused from the card pool."""
+        return self._lib.send_card(chat_id=str(chat_id), title=str(title), image_url=str(image_url or ""), bot_id=bot_id, **card)
+
     def getRateLimitStatus(self):
         """Return local send rate-limit status."""
         return self._lib.check_rate_limit()
@@ -78,10 +122,22 @@ class LineBot:
         """Get messages for a chat."""
         return self._lib.getMessages(bot_id=str(bot_id), chat_id=str(chat_id), limit=limit, before=before, after=after)
 
+    def iterChatMessages(self, bot_id=None, chat_id=None, since=None, until=None, page_size=50):
+        """Iterate over the whole history of a chat, newest first."""
+        return self._lib.iter_chat_messages(bot_id=str(bot_id), chat_id=str(chat_id), since=since, until=until, page_size=page_size)
+
     def getMembers(self, bot_id=None, chat_id=None, limit=100):
         """Get members for a chat."""
         return self._lib.getMembers(bot_id=str(bot_id), chat_id=str(chat_id), limit=limit)
 
+    def getChat(self, bot_id=None, chat_id=None):
+        """Get chat info (served from the metadata cache)."""
+        return self._lib.get_chat(bot_id=str(bot_id), chat_id=str(chat_id))
+
+    def getProfile(self, bot_id=None, chat_id=None):
+        """Get the profile of a chat (served from the metadata cache)."""
+        return self._lib.get_profile(bot_id=str(bot_id), chat_id=str(chat_id))
+
     def getBots(self):
         """Get available bot accounts."""
         return self._lib.get_bots()
@@ -90,11 +146,86 @@ class LineBot:
         """Get chats for a bot."""
         return self._lib.getChats(bot_id=str(bot_id), limit=limit)
 
+    def iterChats(self, bot_id=None, folder_types=("ALL",), tag_ids=("",), page_size=100):
+        """Enumerate every chat of a bot as compact records."""
+        return self._lib.iter_chats(bot_id=bot_id, folder_types=folder_types, tag_ids=tag_ids, page_size=page_size)
+
+    def markAsRead(self, bot_id=None, chat_id=None, message_id=None, timestamp=None):
+        """Queue a read receipt; only the newest message per chat is sent, after a short debounce."""
+        return self._lib.mark_as_read_later(bot_id=str(bot_id), chat_id=str(chat_id), message_id=str(message_id), timestamp=timestamp)
+
+    def setTyping(self, bot_id=None, chat_id=None):
+        """Show the typing indicator (throttled per chat); returns True if a request was sent."""
+        return self._lib.typing.ping(str(bot_id), str(chat_id))
+
+    def typing(self, bot_id=None, chat_id=None):
+        """Context manager that keeps the typing indicator alive until the block exits or a reply is sent."""
+        return self._lib.typing.typing(str(bot_id), str(chat_id))
+
     def event(self, func):
         self.handlers[func.__name__] = func
         return func
 
-    def dispatch(self, event_type, event):
+    def listener(self, func):
+        """Register a callback that receives every event before handler dispatch."""
+        self.listeners.append(func)
+        return func
+
+    @property
+    def request_hooks(self):
+        """Hooks run around every ChatService HTTP call."""
+        return self._lib._chat_service.request_hooks
+
+    def dispatch(self, event_type, event, received_at=None):
+        if received_at is None:
+            received_at = event.get("received_at")
+        info = None
+        if self.event_hooks:
+            now = time.monotonic()
+            info = {
+                "event_id": event.get("id"),
+                "type": event_type,
+                "received_at": received_at if received_at is not None else now,
+                "dispatched_at": now,
+                "handler": None,
+                "skipped": False,
+            }
+            self.event_hooks.emit_before(info)
+        DISPATCH_QUEUE_DEPTH.inc()
+        try:
+            self._dispatch(event_type, event, info, received_at)
+        finally:
+            DISPATCH_QUEUE_DEPTH.dec()
+            if info is not None:
+                finished_at = time.monotonic()
+                info["finished_at"] = finished_at
+                info["duration"] = finished_at - info["received_at"]
+                self.event_hooks.emit_after(info)
+
+    def _dispatch(self, event_type, event, info=None, received_at=None):
+        event_id = event.get("id")
+        checkpoint = self.checkpoint
+        if checkpoint is not None and checkpoint.seen(STREAM, event_id):
+            if info is not None:
+                info["skipped"] = True
+            return
+        clock = self._lib.clock
+        label = event_type or "message"
+        server_timestamp = event_timestamp(event.get("payload"))
+        if server_timestamp is not None and received_at is not None:
+            delivery_lag = clock.lag(server_timestamp, received_at)
+            EVENT_DELIVERY.observe(max(0.0, delivery_lag), type=label)
+            if info is not None:
+                info["server_timestamp"] = server_timestamp
+                info["delivery_lag"] = delivery_lag
+        listeners_started = time.perf_counter()
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                lineoa_logger.error("listener error (%s): %s", getattr(listener, "__name__", listener), e, event_id=event_id)
+        if info is not None:
+            info["listeners_duration"] = time.perf_counter() - listeners_started
         payload = event.get("payload")
         if not isinstance(payload, dict):
             payload = {}
@@ -136,11 +267,35 @@ class LineBot:
             handler = self.handlers.get("on_message")
         if not handler:
             handler = self.handlers.get("on_unknown")
-        if handler:
+        if handler and info is not None:
+            info["handler"] = handler.__name__
+        if handler and (checkpoint is None or not checkpoint.seen(handler.__name__, event_id)):
+            handler_started = time.perf_counter()
+            if received_at is not None:
+                EVENT_DISPATCH_DELAY.observe(max(0.0, time.monotonic() - received_at), type=label)
+            failed = False
             try:
                 handler(event)
             except Exception as e:
-                lineoa_logger.error(f"handler error ({handler.__name__}): {e}")
+                failed = True
+                lineoa_logger.error("handler error (%s): %s", handler.__name__, e, bot_id=payload.get("botId"), chat_id=payload.get("chatId"), event_id=event_id)
+                if info is not None:
+                    info["error"] = e
+            elapsed = time.perf_counter() - handler_started
+            HANDLER_DURATION.observe(elapsed, handler=handler.__name__)
+            if server_timestamp is not None:
+                EVENT_END_TO_END.observe(max(0.0, clock.lag(server_timestamp)), type=label)
+            if info is not None:
+                info["handler_duration"] = elapsed
+            if checkpoint is not None and failed:
+                # hold the stream position before this event so the next connection replays it
+                checkpoint.fail(handler.__name__, event_id)
+                checkpoint.fail(STREAM, event_id)
+                return
+            if checkpoint is not None:
+                checkpoint.ack(handler.__name__, event_id)
+        if checkpoint is not None:
+            checkpoint.ack(STREAM, event_id)
 
     def _resolve_bot_id(self, botid=None):
         if botid:
@@ -153,16 +308,49 @@ class LineBot:
             return self._bot_ids[0]
         raise RuntimeError("No bot_id found. Please check your cookie file.")
 
+    def _set_connection_state(self, state, **info):
+        """Report a listener state change to the optional on_connection_state handler."""
+        info = dict(self.reconnect_policy.snapshot(), **info)
+        info["state"] = state
+        handler = self.handlers.get("on_connection_state")
+        if handler:
+            try:
+                handler(info)
+            except Exception as e:
+                lineoa_logger.error("handler error (%s): %s", handler.__name__, e)
+
+    @property
+    def connection_state(self):
+        return self.reconnect_policy.snapshot()
+
+    @property
+    def stream_lag(self):
+        """Seconds since the last event or ping arrived on the current stream (0.0 before connecting or without a watchdog)."""
+        if self.watchdog is None or not self.running:
+            return 0.0
+        return self.watchdog.lag
+
     def _polling_loop(self, bot_id):
-        lineoa_logger.info(f"Polling start (botid={bot_id})")
+        lineoa_logger.info("Polling start (botid=%s)", bot_id, bot_id=bot_id)
+        policy = self.reconnect_policy
 
         def _on_event(event):
+            received_at = event.get("received_at") or time.monotonic()
+            if not policy.received:
+                policy.on_connected()
+                self._set_connection_state("streaming")
             event_type = event.get("type")
-            self.dispatch(event_type, event)
+            self.dispatch(event_type, event, received_at=received_at)
 
         reconnects = 0
         try:
             while not self._stop_event.is_set():
+                if self.clock_sync:
+                    self._lib.clock.maybe_sync()
+                policy.attempt()
+                if self.checkpoint is not None and self.checkpoint.failed(STREAM):
+                    self._last_event_id = self.checkpoint.last_event_id()
+                self._set_connection_state("connecting" if policy.state != policy.HALF_OPEN else policy.HALF_OPEN)
                 try:
                     self._last_event_id = self._lib.get_streaming_api_token_and_listen_stream_events(
                         bot_id=bot_id,
@@ -173,23 +361,42 @@ class LineBot:
                         on_event=_on_event,
                         stop_event=self._stop_event.is_set,
                         max_stream_seconds=self.listen_config.max_stream_seconds,
+                        watchdog=self.watchdog,
+                        retries=policy.failures + policy.auth_failures,
                     )
                     if self._stop_event.is_set():
                         break
-                    reconnects = 0
+                    reason = self.watchdog.reason if self.watchdog is not None and self.watchdog.reason else "closed"
+                    RECONNECTS.inc(reason=reason)
+                    if reason == StreamWatchdog.STALLED:
+                        self._set_connection_state("stalled", lag=self.watchdog.lag)
+                        delay = policy.on_stall()
+                    else:
+                        reconnects = 0
+                        delay = policy.on_clean()
                 except Exception as e:
                     reconnects += 1
-                    lineoa_logger.error(f"Polling connection error: {e}")
+                    lineoa_logger.error("Polling connection error: %s", e, bot_id=bot_id)
                     if self.max_reconnects is not None and reconnects > self.max_reconnects:
                         lineoa_logger.error("Polling stopped: max reconnects exceeded")
                         break
-                if not self._stop_event.wait(self.reconnect_interval):
+                    delay = policy.on_failure(e)
+                    RECONNECTS.inc(reason="auth" if policy.is_auth_error(e) else "error")
+                    if policy.state == policy.OPEN:
+                        lineoa_logger.error("Polling auth failure: circuit open for %.0fs", delay, bot_id=bot_id)
+                self._set_connection_state(policy.state, delay=delay)
+                if not self._stop_event.wait(delay):
                     lineoa_logger.info("Polling reconnecting")
         finally:
             self.running = False
+            self._set_connection_state("stopped")
+            if self.checkpoint is not None:
+                self.checkpoint.flush()
 
     def listen(self, botid=None, block=True):
         botid = self._resolve_bot_id(botid)
+        if self._last_event_id is None and self.checkpoint is not None:
+            self._last_event_id = self.checkpoint.last_event_id()
         self.running = True
         self._stop_event.clear()
         self._listen_thread = threading.Thread(target=self._polling_loop, args=(botid,), daemon=True)
@@ -208,3 +415,6 @@ class LineBot:
         self._stop_event.set()
         if self._listen_thread and self._listen_thread.is_alive():
             self._listen_thread.join(timeout=5)
+        if self.checkpoint is not None:
+            self.checkpoint.flush()
+        self._lib.receipts.close()
@@ -1,25 +1,146 @@
-from typing import Any
+from typing import Any, Optional, TextIO
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
 import sys
+import threading
+
+CONTEXT_FIELDS = ("bot_id", "chat_id", "event_id")
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self) -> None:
+        super().__init__('[%(asctime)s] [%(levelname)s] [%(tag)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not hasattr(record, "tag"):
+            record.tag = record.levelname
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; bot_id / chat_id / event_id are included when given."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": record.created,
+            "level": record.levelname,
+            "tag": getattr(record, "tag", record.levelname),
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in every `1 / rate` records per message template at INFO and below; warnings and errors always pass."""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        if not 0 < rate <= 1:
+            raise ValueError("sample rate must be in (0, 1]")
+        self.every = max(1, round(1 / rate))
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every == 1 or record.levelno > logging.INFO or getattr(record, "sample", True) is False:
+            return True
+        key = (record.levelno, record.msg if isinstance(record.msg, str) else type(record.msg))
+        with self._lock:
+            count = self._counts.get(key, 0)
+            self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks the caller: records are dropped (and counted) when the queue is full."""
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # formatting happens in the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
 
 class LineOALogger:
     def __init__(self, name: str = "LINEOALib", level: int = logging.INFO):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(level)
-        handler = logging.StreamHandler(sys.stdout)
-        formatter = logging.Formatter('[%(asctime)s] [%(levelname)s] [%(tag)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-        handler.setFormatter(formatter)
+        self._listener: Optional[logging.handlers.QueueListener] = None
+        self._queue_handler: Optional[DroppingQueueHandler] = None
+        self.configure()
+
+    def configure(self, json_lines: bool = False, use_queue: bool = False, sample_rate: float = 1.0, stream: Optional[TextIO] = None, queue_size: int = 10000, level: Optional[int] = None) -> "LineOALogger":
+        """
+        Rebuild the output handlers.
+        use_queue moves formatting and writing to a background thread so a slow stdout never blocks the caller;
+        json_lines switches to JSON Lines; sample_rate < 1 thins out INFO and lower records.
+        """
+        self.stop()
+        if level is not None:
+            self.logger.setLevel(level)
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(JsonFormatter() if json_lines else TextFormatter())
+        front: logging.Handler = handler
+        if use_queue:
+            self._queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+            self._listener = logging.handlers.QueueListener(self._queue_handler.queue, handler, respect_handler_level=True)
+            self._listener.start()
+            front = self._queue_handler
+        if sample_rate < 1:
+            front.addFilter(SamplingFilter(sample_rate))
         self.logger.handlers = []
-        self.logger.addHandler(handler)
+        self.logger.addHandler(front)
+        return self
+
+    @property
+    def dropped(self) -> int:
+        """Records discarded because the log queue was full."""
+        return self._queue_handler.dropped if self._queue_handler is not None else 0
+
+    def stop(self) -> None:
+        """Flush and stop the background writer, if any."""
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.stop()
+        self._queue_handler = None
+
+    def _log(self, level: int, tag: str, msg: Any, args: tuple, fields: dict) -> None:
+        if not self.logger.isEnabledFor(level):
+            return
+        extra = {"tag": tag}
+        extra.update(fields)
+        self.logger.log(level, msg, *args, extra=extra)
+
+    def login(self, msg: Any, *args: Any, **fields: Any) -> None:
+        self._log(logging.INFO, "LOGIN", msg, args, fields)
 
-    def login(self, msg: Any) -> None:
-        self.logger.info(msg, extra={"tag": "LOGIN"})
+    def debug(self, msg: Any, *args: Any, **fields: Any) -> None:
+        self._log(logging.DEBUG, "DEBUG", msg, args, fields)
 
-    def info(self, msg: Any) -> None:
-        self.logger.info(msg, extra={"tag": "INFO"})
+    def info(self, msg: Any, *args: Any, **fields: Any) -> None:
+        self._log(logging.INFO, "INFO", msg, args, fields)
 
-    def error(self, msg: Any) -> None:
-        self.logger.error(msg, extra={"tag": "ERROR"})
+    def error(self, msg: Any, *args: Any, **fields: Any) -> None:
+        self._log(logging.ERROR, "ERROR", msg, args, fields)
 
 logger = LineOALogger().logger
 lineoa_logger = LineOALogger()
+atexit.register(lineoa_logger.stop)
@@ -0,0 +1,272 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .logger import lineoa_logger
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Base class for labelled metrics; values are keyed by the tuple of label values."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional["MetricsRegistry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._registry = registry
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self._registry is None or self._registry.enabled
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple("" if labels[name] is None else str(labels[name]) for name in self.labelnames)
+
+    def value(self, **labels: Any) -> Any:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in items]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        if amount < 0:
+            raise ValueError("counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["MetricsRegistry"] = None):
+        super().__init__(name, documentation, labelnames, registry=registry)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def value(self, **labels: Any) -> Dict[str, Any]:
+        with self._lock:
+            entry = self._values.get(self._key(labels))
+            return self._entry_dict(entry)
+
+    def _entry_dict(self, entry) -> Dict[str, Any]:
+        if entry is None:
+            return {"count": 0, "sum": 0.0, "buckets": {b: 0 for b in self.buckets + (math.inf,)}}
+        counts, total, count = entry
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(self.buckets + (math.inf,), counts):
+            cumulative += n
+            buckets[bound] = cumulative
+        return {"count": count, "sum": total, "buckets": buckets}
+
+    def samples(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = [(key, ([*entry[0]], entry[1], entry[2])) for key, entry in self._values.items()]
+        return [dict(self._entry_dict(entry), labels=dict(zip(self.labelnames, key))) for key, entry in items]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for sample in sorted(self.samples(), key=lambda s: tuple(s["labels"].values())):
+            values = tuple(sample["labels"].values())
+            for bound, count in sample["buckets"].items():
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, ('le', _format_value(bound)))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, values)} {_format_value(sample['sum'])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, values)} {sample['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds the library's metrics; readable with snapshot() or as Prometheus text with render()."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs: Any) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, registry=self, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} is already registered with a different type or labels")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {
+            metric.name: {"type": metric.type, "help": metric.documentation, "samples": metric.samples()}
+            for metric in metrics
+        }
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+REQUESTS = REGISTRY.counter("lineoa_requests_total", "HTTP requests sent by ChatService.", ("endpoint", "method", "status"))
+REQUEST_DURATION = REGISTRY.histogram("lineoa_request_duration_seconds", "ChatService request latency.", ("endpoint", "method"))
+RATELIMIT_REJECTIONS = REGISTRY.counter("lineoa_ratelimit_rejections_total", "Sends refused by the local rate limiter or answered with HTTP 429.", ("source",))
+RATELIMIT_WAIT = REGISTRY.histogram("lineoa_ratelimit_wait_seconds", "Time until the rate limit lifts, observed on each rejection.", (), buckets=(1, 5, 10, 20, 30, 45, 60, 120, 300))
+RESPONSE_CACHE = REGISTRY.counter("lineoa_response_cache_total", "Response cache lookups: hit, miss (fetched) or revalidated (304).", ("kind", "result"))
+SINGLEFLIGHT_SHARED = REGISTRY.counter("lineoa_singleflight_shared_total", "Calls that joined an identical request already in flight instead of sending their own.", ("endpoint",))
+SSE_EVENTS = REGISTRY.counter("lineoa_sse_events_total", "SSE events received, by event type.", ("type",))
+RECONNECTS = REGISTRY.counter("lineoa_reconnects_total", "SSE reconnects, by cause.", ("reason",))
+DISPATCH_QUEUE_DEPTH = REGISTRY.gauge("lineoa_dispatch_queue_depth", "Events received and not yet fully dispatched.")
+READ_RECEIPTS = REGISTRY.counter("lineoa_read_receipts_total", "Mark-as-read calls: sent, coalesced into a newer one, or failed.", ("result",))
+HANDLER_DURATION = REGISTRY.histogram("lineoa_handler_duration_seconds", "Time spent in LineBot event handlers.", ("handler",))
+
+LAG_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+EVENT_DELIVERY = REGISTRY.histogram("lineoa_event_delivery_seconds", "Server event timestamp to local receive, clock-offset corrected.", ("type",), buckets=LAG_BUCKETS)
+EVENT_DISPATCH_DELAY = REGISTRY.histogram("lineoa_event_dispatch_delay_seconds", "Local receive to handler start.", ("type",), buckets=DEFAULT_BUCKETS)
+EVENT_END_TO_END = REGISTRY.histogram("lineoa_event_end_to_end_seconds", "Server event timestamp to handler end, clock-offset corrected.", ("type",), buckets=LAG_BUCKETS)
+
+
+def start_http_server(port: int = 9464, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY) -> "ThreadingHTTPServer":
+    """Serve `registry` in Prometheus text format at http://host:port/metrics from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    lineoa_logger.info(f"Metrics endpoint listening on http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,73 @@
+from typing import Any, Dict, Optional
+
+
+class ChatRecord:
+    """Compact view of one chat from the chat list API."""
+
+    __slots__ = ("chat_id", "chat_type", "name", "picture_url")
+
+    def __init__(self, chat_id: str, chat_type: Optional[str] = None, name: Optional[str] = None, picture_url: Optional[str] = None):
+        self.chat_id = chat_id
+        self.chat_type = chat_type
+        self.name = name
+        self.picture_url = picture_url
+
+    @classmethod
+    def from_api(cls, chat: Dict[str, Any]) -> "ChatRecord":
+        profile = chat.get("profile") if isinstance(chat.get("profile"), dict) else {}
+        return cls(
+            chat_id=chat.get("chatId"),
+            chat_type=chat.get("chatType"),
+            name=profile.get("name"),
+            picture_url=profile.get("pictureUrl"),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"chat_id": self.chat_id, "chat_type": self.chat_type, "name": self.name, "picture_url": self.picture_url}
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ChatRecord):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def __hash__(self) -> int:
+        # equal records share their id, so hashing the id alone is consistent with __eq__
+        return hash(self.chat_id)
+
+    def __repr__(self) -> str:
+        return f"ChatRecord({self.chat_id!r}, {self.chat_type!r}, {self.name!r})"
+
+
+class BotRecord:
+    """Compact view of one bot account from the bot list API."""
+
+    __slots__ = ("bot_id", "basic_search_id", "name", "picture_url")
+
+    def __init__(self, bot_id: str, basic_search_id: Optional[str] = None, name: Optional[str] = None, picture_url: Optional[str] = None):
+        self.bot_id = bot_id
+        self.basic_search_id = basic_search_id
+        self.name = name
+        self.picture_url = picture_url
+
+    @classmethod
+    def from_api(cls, bot: Dict[str, Any]) -> "BotRecord":
+        return cls(
+            bot_id=bot.get("botId"),
+            basic_search_id=bot.get("basicSearchId"),
+            name=bot.get("name", ""),
+            picture_url=bot.get("profileImageUrl") or bot.get("pictureUrl"),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"bot_id": self.bot_id, "basic_search_id": self.basic_search_id, "name": self.name, "picture_url": self.picture_url}
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, BotRecord):
+            return NotImplemented
+        return self.as_dict() == other.as_dict()
+
+    def __hash__(self) -> int:
+        return hash(self.bot_id)
+
+    def __repr__(self) -> str:
+        return f"BotRecord({self.bot_id!r}, {self.basic_search_id!r}, {self.name!r})"
@@ -0,0 +1,126 @@
+import atexit
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .logger import lineoa_logger
+from .metrics import READ_RECEIPTS
+
+
+Key = Tuple[str, str]
+MarkFunc = Callable[[str, str, str, Optional[int]], Any]
+
+
+class ReadReceipts:
+    """
+    Coalesces mark-as-read calls: only the newest (message_id, timestamp) per chat is kept,
+    and it is sent once the chat has been quiet for `debounce` seconds, or at the latest
+    `max_delay` seconds after the first pending mark. One flush marks every due chat
+    concurrently with up to `max_workers` requests.
+    """
+
+    def __init__(self, mark: MarkFunc, debounce: float = 0.5, max_delay: float = 2.0, max_workers: int = 8):
+        if debounce < 0 or max_delay < debounce:
+            raise ValueError("need 0 <= debounce <= max_delay")
+        self._mark = mark
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_workers = max(1, int(max_workers))
+        # key -> [message_id, timestamp, first_at, updated_at]
+        self._pending: Dict[Key, list] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop: Optional[threading.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def mark(self, bot_id: str, chat_id: str, message_id: str, timestamp: Optional[int] = None) -> None:
+        """Queue a read receipt; an older message for the same chat is replaced, a newer one already queued wins."""
+        if timestamp is None:
+            timestamp = int(time.time() * 1000)
+        now = time.monotonic()
+        key = (bot_id, chat_id)
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is None:
+                self._pending[key] = [message_id, timestamp, now, now]
+            else:
+                READ_RECEIPTS.inc(result="coalesced")
+                if timestamp >= entry[1]:
+                    entry[0], entry[1] = message_id, timestamp
+                entry[3] = now
+            if self._thread is None:
+                if self._stop is None:
+                    atexit.register(self.close)
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(self._stop,), name="read-receipts", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _take(self, force: bool) -> Dict[Key, Tuple[str, int]]:
+        now = time.monotonic()
+        due = {}
+        with self._lock:
+            for key, (message_id, timestamp, first_at, updated_at) in list(self._pending.items()):
+                if force or now - updated_at >= self.debounce or now - first_at >= self.max_delay:
+                    due[key] = (message_id, timestamp)
+                    del self._pending[key]
+        return due
+
+    def _next_deadline(self) -> Optional[float]:
+        with self._lock:
+            if not self._pending:
+                return None
+            return min(min(updated_at + self.debounce, first_at + self.max_delay) for _, _, first_at, updated_at in self._pending.values())
+
+    def _send(self, key: Key, message_id: str, timestamp: int) -> Any:
+        bot_id, chat_id = key
+        try:
+            result = self._mark(bot_id, chat_id, message_id, timestamp)
+        except Exception as e:
+            READ_RECEIPTS.inc(result="error")
+            lineoa_logger.error("mark_as_read failed: %s", e, bot_id=bot_id, chat_id=chat_id)
+            return e
+        READ_RECEIPTS.inc(result="sent")
+        return result
+
+    def flush(self, force: bool = True) -> Dict[Key, Any]:
+        """Send pending receipts now (only the due ones when force=False); returns result or exception per (bot_id, chat_id)."""
+        due = self._take(force)
+        if not due:
+            return {}
+        if len(due) == 1:
+            (key, (message_id, timestamp)), = due.items()
+            return {key: self._send(key, message_id, timestamp)}
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="read-receipts")
+        futures = {key: self._executor.submit(self._send, key, *value) for key, value in due.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+    def _run(self, stop: threading.Event) -> None:
+        while not stop.is_set():
+            deadline = self._next_deadline()
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if not stop.is_set():
+                self.flush(force=False)
+
+    def close(self) -> None:
+        """Send everything still pending and stop the background thread; a later mark() starts it again."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if self._stop is not None:
+                self._stop.set()
+        self._wake.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
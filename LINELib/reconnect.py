@@ -0,0 +1,114 @@
+import random
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .config import ListenConfig
+
+
+AUTH_STATUS_CODES = {401, 403}
+
+
+class ReconnectPolicy:
+    """
+    Decides how long the listener waits before reconnecting.
+
+    - clean rotation (the stream ended normally): resume immediately
+    - stall (the watchdog saw no event or ping in time): backoff, like an error
+    - network / server errors: exponential backoff from reconnect_interval up to
+      backoff_max, with `backoff_jitter` of the delay randomized
+    - auth failures (HTTP 401/403): circuit breaker; the circuit opens for
+      auth_failure_cooldown seconds, then a single half-open attempt decides
+      whether it closes again or re-opens with a doubled cooldown
+    """
+
+    CLOSED = "closed"
+    BACKOFF = "backoff"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # an end is only "clean" once the stream delivered an event or stayed open
+    # this long; anything shorter is treated as a failure, so a server that keeps
+    # closing quiet streams does not turn the listener into a busy loop
+    MIN_CLEAN_SECONDS = 300.0
+
+    def __init__(self, config: ListenConfig, rand: Callable[[], float] = random.random):
+        self.config = config
+        self._rand = rand
+        self.state = self.CLOSED
+        self.failures = 0
+        self.auth_failures = 0
+        self.last_error: Optional[BaseException] = None
+        self.last_delay = 0.0
+        self._attempt_started_at: Optional[float] = None
+        self._received = False
+
+    @staticmethod
+    def is_auth_error(error: BaseException) -> bool:
+        code = getattr(error, "code", None)
+        if code is None:
+            response = getattr(error, "response", None)
+            code = getattr(response, "status_code", None)
+        try:
+            return int(code) in AUTH_STATUS_CODES
+        except (TypeError, ValueError):
+            return False
+
+    def attempt(self) -> None:
+        """Call right before connecting."""
+        self._attempt_started_at = time.monotonic()
+        self._received = False
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+
+    @property
+    def received(self) -> bool:
+        """True once the current connection attempt has delivered an event."""
+        return self._received
+
+    def on_connected(self) -> None:
+        """The stream delivered an event: the connection is healthy again."""
+        self._received = True
+        self.state = self.CLOSED
+        self.failures = 0
+        self.auth_failures = 0
+        self.last_error = None
+        self.last_delay = 0.0
+
+    def on_clean(self) -> float:
+        """The stream ended without an error (token rotation, max_stream_seconds)."""
+        started_at = self._attempt_started_at
+        if not self._received and started_at is not None and time.monotonic() - started_at < self.MIN_CLEAN_SECONDS:
+            return self._backoff(None)
+        self.on_connected()
+        return 0.0
+
+    def on_stall(self) -> float:
+        """The watchdog closed a stream that went silent; back off without resetting `failures`."""
+        return self._backoff(None)
+
+    def on_failure(self, error: BaseException) -> float:
+        self.last_error = error
+        if self.is_auth_error(error):
+            self.auth_failures += 1
+            self.state = self.OPEN
+            self.last_delay = float(self.config.auth_failure_cooldown) * (2 ** min(self.auth_failures - 1, 3))
+            return self.last_delay
+        return self._backoff(error)
+
+    def _backoff(self, error: Optional[BaseException]) -> float:
+        self.failures += 1
+        self.state = self.BACKOFF
+        base = float(self.config.reconnect_interval) * (float(self.config.backoff_multiplier) ** (self.failures - 1))
+        delay = min(float(self.config.backoff_max), base)
+        jitter = float(self.config.backoff_jitter)
+        self.last_delay = delay * (1 - jitter * self._rand())
+        return self.last_delay
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "auth_failures": self.auth_failures,
+            "delay": self.last_delay,
+            "error": str(self.last_error) if self.last_error else None,
+        }
@@ -0,0 +1,97 @@
+import threading
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from .metrics import SINGLEFLIGHT_SHARED
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+def freeze(value: Any) -> Hashable:
+    """Hashable form of request parameters (dicts, lists, nested) for use in a flight key."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one: the first caller runs `fn`,
+    callers arriving while it is in flight wait and get the same result (or exception).
+    Nothing is cached once the call finishes.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], label: str = "") -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            SINGLEFLIGHT_SHARED.inc(endpoint=label)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    asyncio counterpart of SingleFlight. The shared call runs as its own task, so a
+    caller being cancelled does not cancel the request for the others.
+    Flights are tracked per event loop.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Tuple[int, Hashable], "asyncio.Task[Any]"] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], label: str = "") -> Any:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        task = self._tasks.get(flight_key)
+        if task is None:
+            task = loop.create_task(fn())
+            self._tasks[flight_key] = task
+            task.add_done_callback(lambda t: self._forget(flight_key, t))
+        else:
+            SINGLEFLIGHT_SHARED.inc(endpoint=label)
+        return await asyncio.shield(task)
+
+    def _forget(self, flight_key: Tuple[int, Hashable], task: "asyncio.Task[Any]") -> None:
+        if self._tasks.get(flight_key) is task:
+            del self._tasks[flight_key]
+        # the exception is delivered to the awaiting callers; mark it retrieved for callers that were cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._tasks)
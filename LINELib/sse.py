@@ -1,18 +1,123 @@
-import json
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Any, Dict, Generator, Iterable, Optional
 
+from . import jsoncodec
+
+
+def message_payload(payload: Any) -> Optional[Dict[str, Any]]:
+    """Return the message dict of an already parsed event payload."""
+    if not isinstance(payload, dict):
+        return None
+    inner = payload.get("payload")
+    if isinstance(inner, dict):
+        message = inner.get("message")
+        if isinstance(message, dict):
+            return message
+    message = payload.get("message")
+    if isinstance(message, dict):
+        return message
+    return None
+
+
+def event_timestamp(payload: Any) -> Optional[int]:
+    """Server-side timestamp (epoch ms) of an already parsed event payload, if it carries one."""
+    if not isinstance(payload, dict):
+        return None
+    inner = payload.get("payload") if isinstance(payload.get("payload"), dict) else {}
+    message = inner.get("message") if isinstance(inner.get("message"), dict) else {}
+    for value in (message.get("timestamp"), inner.get("timestamp"), payload.get("timestamp")):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return int(value)
+        if isinstance(value, str) and value.isdigit():
+            return int(value)
+    return None
+
+
+def normalize_message(payload: Any) -> Optional[Dict[str, Any]]:
+    """Normalize the message of an already parsed event payload (no JSON round trip)."""
+    if not isinstance(payload, dict):
+        return None
+    inner = payload.get("payload") if isinstance(payload.get("payload"), dict) else payload
+    message = None
+    if isinstance(inner, dict):
+        message = inner.get("message")
+    if not isinstance(message, dict):
+        return None
+    message_type = message.get("type")
+    content_provider = message.get("contentProvider") if isinstance(message.get("contentProvider"), dict) else {}
+    content_hash = message.get("contentHash") or content_provider.get("contentHash")
+    bot_id = payload.get("botId")
+    media_url = None
+    if bot_id and content_hash and message_type in {"image", "video", "file"}:
+        media_url = f"https://chat-content.line.biz/bot/{bot_id}/{content_hash}/preview"
+
+    sticker_id = message.get("stickerId") or content_provider.get("stickerId")
+    package_id = message.get("packageId") or content_provider.get("packageId")
+    audio = message.get("audio") if isinstance(message.get("audio"), dict) else {}
+    file_name = message.get("fileName") or message.get("name") or content_provider.get("fileName") or content_provider.get("file_name")
+    extension = None
+    if isinstance(file_name, str) and "." in file_name:
+        extension = file_name.rsplit(".", 1)[-1].lower()
+    elif message_type == "image":
+        extension = "jpg"
+    elif message_type == "video":
+        extension = "mp4"
+    elif message_type == "file":
+        extension = "bin"
+    elif message_type == "audio":
+        extension = "m4a"
+    elif message_type == "sticker":
+        extension = "png"
+
+    return {
+        "kind": "media" if message_type in {"image", "video", "file"} else message_type,
+        "message_type": message_type,
+        "bot_id": bot_id,
+        "chat_id": payload.get("chatId"),
+        "message_id": message.get("id"),
+        "timestamp": message.get("timestamp") or inner.get("timestamp"),
+        "content_hash": content_hash,
+        "media_url": media_url,
+        "sticker_media_url": f"https://stickershop.line-scdn.net/stickershop/v1/sticker/{sticker_id}/android/sticker.png" if sticker_id else None,
+        "expired": message.get("expired"),
+        "expired_at": message.get("expiredAt"),
+        "text": message.get("text"),
+        "url": message.get("url") or message.get("linkUrl") or content_provider.get("url"),
+        "title": message.get("title") or message.get("linkTitle"),
+        "sticker_id": sticker_id,
+        "package_id": package_id,
+        "file_name": file_name,
+        "extension": extension,
+        "duration": message.get("duration") or audio.get("duration"),
+        "audio": audio,
+        "raw": message,
+    }
+
 
 @dataclass(frozen=True)
 class SSEEvent:
+    """
+    One SSE event. `data` is parsed at most once; the parsed payload and the
+    normalized message are cached on the instance (outside the dataclass fields,
+    so equality, replace() and asdict() only see id / event / data).
+    """
+
     id: Optional[str]
     event: Optional[str]
     data: str
 
-    @property
+    @classmethod
+    def from_payload(cls, id: Optional[str], event: Optional[str], payload: Any) -> "SSEEvent":
+        """Build an event from an already parsed payload; the payload is cached so it is not parsed again."""
+        event_obj = cls(id=id, event=event, data=payload if isinstance(payload, str) else jsoncodec.dumps(payload))
+        event_obj.__dict__["payload"] = payload
+        return event_obj
+
+    @cached_property
     def payload(self) -> Any:
         try:
-            return json.loads(self.data)
+            return jsoncodec.loads(self.data)
         except Exception:
             return self.data
 
@@ -20,18 +125,7 @@ class SSEEvent:
         return {"id": self.id, "event": self.event, "data": self.data}
 
     def message_payload(self) -> Optional[Dict[str, Any]]:
-        payload = self.payload
-        if not isinstance(payload, dict):
-            return None
-        inner = payload.get("payload")
-        if isinstance(inner, dict):
-            message = inner.get("message")
-            if isinstance(message, dict):
-                return message
-        message = payload.get("message")
-        if isinstance(message, dict):
-            return message
-        return None
+        return message_payload(self.payload)
 
     def image_url(self) -> Optional[str]:
         normalized = self.normalized_message()
@@ -39,65 +133,12 @@ class SSEEvent:
             return None
         return normalized.get("media_url")
 
+    @cached_property
+    def _normalized(self) -> Optional[Dict[str, Any]]:
+        return normalize_message(self.payload)
+
     def normalized_message(self) -> Optional[Dict[str, Any]]:
-        payload = self.payload
-        if not isinstance(payload, dict):
-            return None
-        inner = payload.get("payload") if isinstance(payload.get("payload"), dict) else payload
-        message = None
-        if isinstance(inner, dict):
-            message = inner.get("message")
-        if not isinstance(message, dict):
-            return None
-        message_type = message.get("type")
-        content_provider = message.get("contentProvider") if isinstance(message.get("contentProvider"), dict) else {}
-        content_hash = message.get("contentHash") or content_provider.get("contentHash")
-        bot_id = payload.get("botId")
-        media_url = None
-        if bot_id and content_hash and message_type in {"image", "video", "file"}:
-            media_url = f"https://chat-content.line.biz/bot/{bot_id}/{content_hash}/preview"
-
-        sticker_id = message.get("stickerId") or (message.get("contentProvider") or {}).get("stickerId")
-        package_id = message.get("packageId") or (message.get("contentProvider") or {}).get("packageId")
-        audio = message.get("audio") if isinstance(message.get("audio"), dict) else {}
-        file_name = message.get("fileName") or message.get("name") or content_provider.get("fileName") or content_provider.get("file_name")
-        extension = None
-        if isinstance(file_name, str) and "." in file_name:
-            extension = file_name.rsplit(".", 1)[-1].lower()
-        elif message_type == "image":
-            extension = "jpg"
-        elif message_type == "video":
-            extension = "mp4"
-        elif message_type == "file":
-            extension = "bin"
-        elif message_type == "audio":
-            extension = "m4a"
-        elif message_type == "sticker":
-            extension = "png"
-
-        return {
-            "kind": "media" if message_type in {"image", "video", "file"} else message_type,
-            "message_type": message_type,
-            "bot_id": bot_id,
-            "chat_id": payload.get("chatId"),
-            "message_id": message.get("id"),
-            "timestamp": message.get("timestamp") or inner.get("timestamp"),
-            "content_hash": content_hash,
-            "media_url": media_url,
-            "sticker_media_url": f"https://stickershop.line-scdn.net/stickershop/v1/sticker/{sticker_id}/android/sticker.png" if sticker_id else None,
-            "expired": message.get("expired"),
-            "expired_at": message.get("expiredAt"),
-            "text": message.get("text"),
-            "url": message.get("url") or message.get("linkUrl") or (message.get("contentProvider") or {}).get("url"),
-            "title": message.get("title") or message.get("linkTitle"),
-            "sticker_id": sticker_id,
-            "package_id": package_id,
-            "file_name": file_name,
-            "extension": extension,
-            "duration": message.get("duration") or audio.get("duration"),
-            "audio": audio,
-            "raw": message,
-        }
+        return self._normalized
 
 
 class SSEParser:
@@ -0,0 +1,134 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from . import jsoncodec
+from .logger import lineoa_logger
+
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = None) -> None:
+    """Write JSON to a temp file in the same directory, fsync it and rename it over `path`."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(jsoncodec.dumps(data, indent=indent).encode("utf-8") if indent else jsoncodec.dumpb(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class CredentialStore:
+    """Login cookies and account info; rarely written, always replaced atomically."""
+
+    def __init__(self, path: str = "lineoa-storage.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._cache: Optional[Dict[str, Any]] = None
+
+    def load(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._cache is None:
+                self._cache = {}
+                if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+                    try:
+                        with open(self.path, "rb") as f:
+                            self._cache = jsoncodec.loads(f.read())
+                    except Exception as e:
+                        lineoa_logger.error(f"credential storage load failed ({self.path}): {e}")
+            return self._cache
+
+    def invalidate(self) -> None:
+        """Forget the cached copy, e.g. after another component rewrote the file."""
+        with self._lock:
+            self._cache = None
+
+    def save(self, data: Dict[str, Any]) -> None:
+        with self._lock:
+            atomic_write_json(self.path, data)
+            self._cache = data
+
+
+class StateStore:
+    """
+    Hot runtime state (send timestamps for the rate limiter, last send time) kept in SQLite,
+    so sending never rewrites the credential file. Safe to share between processes.
+    """
+
+    def __init__(self, path: str = "lineoa-state.sqlite3", keep: int = 20):
+        self.path = path
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS send_log (id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def path_for(credential_path: str) -> str:
+        """Default state path next to a credential file: lineoa-storage.json -> lineoa-storage.state.sqlite3."""
+        root, _ = os.path.splitext(credential_path)
+        return f"{root}.state.sqlite3"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return jsoncodec.loads(row[0]) if row else default
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO state (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                (key, jsoncodec.dumps(value)),
+            )
+            self._conn.commit()
+
+    def add_send_timestamp(self, timestamp: float) -> None:
+        with self._lock:
+            self._conn.execute("INSERT INTO send_log (ts) VALUES (?)", (float(timestamp),))
+            self._conn.execute(
+                "DELETE FROM send_log WHERE id <= (SELECT id FROM send_log ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.keep,),
+            )
+            self._conn.commit()
+
+    def send_timestamps(self, window: Optional[float] = None) -> List[float]:
+        """Send timestamps, oldest first; only those newer than `window` seconds when given."""
+        since = time.time() - window if window is not None else float("-inf")
+        with self._lock:
+            rows = self._conn.execute("SELECT ts FROM send_log WHERE ts > ? ORDER BY id", (since,)).fetchall()
+        return [row[0] for row in rows][-self.keep:]
+
+    def clear_send_timestamps(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM send_log")
+            self._conn.commit()
+
+    def import_legacy(self, data: Dict[str, Any]) -> bool:
+        """Move SendTimestamps / FinalsendTime out of an old combined storage dict; returns True if anything moved."""
+        moved = False
+        if "FinalsendTime" in data:
+            if data["FinalsendTime"] is not None and self.get("FinalsendTime") is None:
+                self.set("FinalsendTime", data["FinalsendTime"])
+            del data["FinalsendTime"]
+            moved = True
+        if "SendTimestamps" in data:
+            if not self.send_timestamps():
+                for timestamp in (data["SendTimestamps"] or [])[-self.keep:]:
+                    self.add_send_timestamp(timestamp)
+            del data["SendTimestamps"]
+            moved = True
+        return moved
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,172 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from .logger import lineoa_logger
+
+_otel_trace: Any = None
+
+
+def _opentelemetry_trace() -> Any:
+    """opentelemetry.trace if installed (imported on first use), else None."""
+    global _otel_trace
+    if _otel_trace is None:
+        try:
+            from opentelemetry import trace
+        except ImportError:  # optional dependency
+            _otel_trace = False
+        else:
+            _otel_trace = trace
+    return _otel_trace or None
+
+
+_SPAN = "_trace_span"
+_SCOPE = "_trace_scope"
+
+
+class RecordedSpan:
+    """Minimal span with the subset of the OpenTelemetry span API used by TracingHooks."""
+
+    __slots__ = ("name", "attributes", "start_time", "end_time", "exception", "_tracer")
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None, start_time: Optional[int] = None, tracer: Optional["RecordingTracer"] = None):
+        self._tracer = tracer
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_time = start_time if start_time is not None else time.time_ns()
+        self.end_time: Optional[int] = None
+        self.exception: Optional[BaseException] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.exception = exception
+
+    def end(self, end_time: Optional[int] = None) -> None:
+        self.end_time = end_time if end_time is not None else time.time_ns()
+        if self._tracer is not None:
+            self._tracer.spans.append(self)
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.end_time is None:
+            return None
+        return (self.end_time - self.start_time) / 1e9
+
+    def __repr__(self) -> str:
+        return f"RecordedSpan({self.name!r}, duration={self.duration!r})"
+
+
+class RecordingTracer:
+    """Dependency-free tracer that keeps the last `maxlen` finished spans in memory."""
+
+    def __init__(self, maxlen: int = 1000):
+        self.spans: Deque[RecordedSpan] = deque(maxlen=maxlen)
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None, start_time: Optional[int] = None) -> RecordedSpan:
+        return RecordedSpan(name, attributes, start_time, tracer=self)
+
+    def slowest(self, n: int = 10) -> List[RecordedSpan]:
+        return sorted(self.spans, key=lambda span: span.duration or 0.0, reverse=True)[:n]
+
+
+class TracingHooks:
+    """
+    Adapter turning request and event hooks into tracing spans.
+
+    `tracer` is anything with OpenTelemetry's `start_span(name, attributes=..., start_time=...)`.
+    When omitted, the OpenTelemetry tracer is used if the package is installed,
+    otherwise a RecordingTracer. With OpenTelemetry, the event span is made current
+    while the handler runs, so HTTP calls from a handler become its children.
+    """
+
+    def __init__(self, tracer: Any = None):
+        if tracer is None:
+            otel = _opentelemetry_trace()
+            tracer = otel.get_tracer("LINELib") if otel is not None else RecordingTracer()
+        self.tracer = tracer
+        self._installed: List[Any] = []
+
+    def instrument(self, target: Any) -> "TracingHooks":
+        """Attach to a LineBot, LINELib or ChatService."""
+        request_hooks = getattr(target, "request_hooks", None)
+        if request_hooks is None and hasattr(target, "_chat_service"):
+            request_hooks = target._chat_service.request_hooks
+        if request_hooks is not None:
+            request_hooks.on_before(self._before_request)
+            request_hooks.on_after(self._after_request)
+            self._installed.append(request_hooks)
+        event_hooks = getattr(target, "event_hooks", None)
+        if event_hooks is not None:
+            event_hooks.on_before(self._before_event)
+            event_hooks.on_after(self._after_event)
+            self._installed.append(event_hooks)
+        return self
+
+    def uninstrument(self) -> None:
+        for hooks in self._installed:
+            for func in (self._before_request, self._after_request, self._before_event, self._after_event):
+                hooks.remove(func)
+        self._installed = []
+
+    def _start(self, info: Dict[str, Any], name: str, attributes: Dict[str, Any], start_time: Optional[int] = None) -> None:
+        kwargs = {"attributes": {k: v for k, v in attributes.items() if v is not None}}
+        if start_time is not None:
+            kwargs["start_time"] = start_time
+        span = self.tracer.start_span(name, **kwargs)
+        info[_SPAN] = span
+        otel = _opentelemetry_trace()
+        if otel is not None and not isinstance(span, RecordedSpan):
+            scope = otel.use_span(span, end_on_exit=False)
+            scope.__enter__()
+            info[_SCOPE] = scope
+
+    def _end(self, info: Dict[str, Any], attributes: Dict[str, Any]) -> None:
+        span = info.pop(_SPAN, None)
+        scope = info.pop(_SCOPE, None)
+        if span is None:
+            return
+        try:
+            for key, value in attributes.items():
+                if value is not None:
+                    span.set_attribute(key, value)
+            error = info.get("error")
+            if error is not None:
+                span.record_exception(error)
+            span.end()
+        finally:
+            if scope is not None:
+                try:
+                    scope.__exit__(None, None, None)
+                except Exception as e:
+                    lineoa_logger.error(f"tracing scope error: {e}")
+
+    def _before_request(self, info: Dict[str, Any]) -> None:
+        self._start(info, f"{info['method']} {info['url_template']}", {
+            "http.request.method": info["method"],
+            "url.full": info["url"],
+            "url.template": info["url_template"],
+            "lineoa.retries": info.get("retries"),
+        })
+
+    def _after_request(self, info: Dict[str, Any]) -> None:
+        self._end(info, {
+            "http.response.status_code": info.get("status"),
+            "http.response.body.size": info.get("bytes"),
+        })
+
+    def _before_event(self, info: Dict[str, Any]) -> None:
+        waited = max(0.0, info["dispatched_at"] - info["received_at"])
+        self._start(info, f"event {info.get('type') or 'message'}", {
+            "lineoa.event_id": info.get("event_id"),
+            "lineoa.event_type": info.get("type"),
+        }, start_time=time.time_ns() - int(waited * 1e9))
+
+    def _after_event(self, info: Dict[str, Any]) -> None:
+        self._end(info, {
+            "lineoa.handler": info.get("handler"),
+            "lineoa.skipped": info.get("skipped"),
+            "lineoa.listeners_duration": info.get("listeners_duration"),
+            "lineoa.handler_duration": info.get("handler_duration"),
+        })
@@ -0,0 +1,109 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from .logger import lineoa_logger
+
+
+Key = Tuple[str, str]
+SendFunc = Callable[[str, str], Any]
+
+
+class TypingIndicator:
+    """
+    Typing indicators with per-chat throttling.
+
+    ping() sends at most one PUT per chat every `interval` seconds. Inside typing(),
+    a single background thread re-sends the indicator for every active chat each
+    `keepalive` seconds until the block exits or stop() is called, which the send
+    paths do as soon as the reply has gone out.
+    """
+
+    def __init__(self, send: SendFunc, interval: float = 5.0, keepalive: Optional[float] = None):
+        if interval <= 0:
+            raise ValueError("interval must be > 0")
+        self._send = send
+        self.interval = interval
+        self.keepalive = keepalive if keepalive is not None else interval
+        if self.keepalive < self.interval:
+            raise ValueError("keepalive must be >= interval")
+        self._sent_at: Dict[Key, float] = {}
+        # key -> number of open typing() blocks
+        self._active: Dict[Key, int] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def ping(self, bot_id: str, chat_id: str) -> bool:
+        """Send the indicator unless it was sent for this chat within `interval`; returns True when a request went out."""
+        key = (bot_id, chat_id)
+        now = time.monotonic()
+        with self._cond:
+            sent_at = self._sent_at.get(key)
+            if sent_at is not None and now - sent_at < self.interval:
+                return False
+            self._sent_at[key] = now
+            if len(self._sent_at) > 4096:
+                self._sent_at = {k: t for k, t in self._sent_at.items() if now - t < self.keepalive or k in self._active}
+        try:
+            self._send(bot_id, chat_id)
+        except Exception as e:
+            # failures count against the throttle too, so a broken chat is not hammered
+            lineoa_logger.error("set_typing failed: %s", e, bot_id=bot_id, chat_id=chat_id)
+            return False
+        return True
+
+    def start(self, bot_id: str, chat_id: str) -> None:
+        """Show the indicator and keep it alive until a matching stop() / end()."""
+        key = (bot_id, chat_id)
+        with self._cond:
+            self._active[key] = self._active.get(key, 0) + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="typing-keepalive", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        self.ping(bot_id, chat_id)
+
+    def end(self, bot_id: str, chat_id: str) -> None:
+        """Close one start(); the keepalive stops when the last one closes."""
+        key = (bot_id, chat_id)
+        with self._cond:
+            count = self._active.get(key, 0) - 1
+            if count > 0:
+                self._active[key] = count
+            else:
+                self._active.pop(key, None)
+
+    def stop(self, bot_id: str, chat_id: str) -> None:
+        """Stop the keepalive for a chat right away, e.g. because the reply was sent."""
+        key = (bot_id, chat_id)
+        with self._cond:
+            self._active.pop(key, None)
+            # a reply clears the indicator on the client, so the next ping must not be throttled
+            self._sent_at.pop(key, None)
+
+    @contextmanager
+    def typing(self, bot_id: str, chat_id: str) -> Iterator[None]:
+        self.start(bot_id, chat_id)
+        try:
+            yield
+        finally:
+            self.end(bot_id, chat_id)
+
+    def active(self, bot_id: str, chat_id: str) -> bool:
+        return (bot_id, chat_id) in self._active
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._active:
+                    self._cond.wait()
+                now = time.monotonic()
+                due = [key for key in self._active if now - self._sent_at.get(key, float("-inf")) >= self.keepalive]
+                if not due:
+                    next_at = min(self._sent_at.get(key, now) + self.keepalive for key in self._active)
+                    self._cond.wait(max(0.0, next_at - now))
+                    continue
+            for bot_id, chat_id in due:
+                if self.active(bot_id, chat_id):
+                    self.ping(bot_id, chat_id)
@@ -1,7 +1,13 @@
-from typing import Dict, Any, Optional
-import json
+from typing import Dict, Any, Iterable, Optional
+import atexit
 import os
+import re
+import threading
 import time
+from . import jsoncodec
+from .logger import lineoa_logger
+from .storage import atomic_write_json
+from urllib.parse import urlsplit
 
 def merge_dicts(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
     c = a.copy()
@@ -10,29 +16,161 @@ def merge_dicts(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
 
 _IDMAP_PATH = os.path.join(os.path.dirname(__file__), '../id_map.json')
 
-def _load_idmap() -> Dict[str, Dict[str, str]]:
-    if os.path.exists(_IDMAP_PATH):
-        with open(_IDMAP_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {"group_to_chat": {}, "chat_to_group": {}}
 
-def _save_idmap(data: Dict[str, Dict[str, str]]):
-    with open(_IDMAP_PATH, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+def _find_group_id(*candidates: Any) -> Optional[str]:
+    for candidate in candidates:
+        if isinstance(candidate, dict):
+            value = candidate.get("groupId")
+            if isinstance(value, str) and value:
+                return value
+    return None
+
+
+class IdMap:
+    """
+    Bidirectional group id <-> chat id index, loaded once and kept in memory.
+    The file is re-read when another process changes it (mtime, checked at most every
+    `reload_interval` seconds) and links are written back in batches from a background
+    thread every `flush_interval` seconds.
+    """
+
+    def __init__(self, path: str = _IDMAP_PATH, flush_interval: float = 1.0, reload_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.reload_interval = reload_interval
+        self._group_to_chat: Dict[str, str] = {}
+        self._chat_to_group: Dict[str, str] = {}
+        self._pending: Dict[str, str] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._load()
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def _load(self) -> None:
+        mtime = self._file_mtime()
+        data = {"group_to_chat": {}}
+        if mtime is not None:
+            try:
+                with open(self.path, 'rb') as f:
+                    data = jsoncodec.loads(f.read())
+            except (OSError, ValueError):
+                return
+        self._group_to_chat = dict(data.get("group_to_chat") or {})
+        self._chat_to_group = {chat_id: group_id for group_id, chat_id in self._group_to_chat.items()}
+        for group_id, chat_id in self._pending.items():
+            self._set(group_id, chat_id)
+        self._mtime = mtime
+        self._checked_at = time.monotonic()
+
+    def _maybe_reload(self) -> None:
+        if time.monotonic() - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            self._checked_at = time.monotonic()
+            if self._file_mtime() != self._mtime:
+                self._load()
+
+    def _set(self, group_id: str, chat_id: str) -> None:
+        old_chat = self._group_to_chat.get(group_id)
+        if old_chat is not None and self._chat_to_group.get(old_chat) == group_id:
+            del self._chat_to_group[old_chat]
+        old_group = self._chat_to_group.get(chat_id)
+        if old_group is not None and self._group_to_chat.get(old_group) == chat_id:
+            del self._group_to_chat[old_group]
+        self._group_to_chat[group_id] = chat_id
+        self._chat_to_group[chat_id] = group_id
+
+    def link(self, group_id: str, chat_id: str) -> None:
+        with self._lock:
+            if self._group_to_chat.get(group_id) == chat_id and self._chat_to_group.get(chat_id) == group_id:
+                return
+            self._set(group_id, chat_id)
+            self._pending[group_id] = chat_id
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+        self._wake.set()
+
+    def chat_id(self, group_id: str) -> Optional[str]:
+        self._maybe_reload()
+        return self._group_to_chat.get(group_id)
+
+    def group_id(self, chat_id: str) -> Optional[str]:
+        self._maybe_reload()
+        return self._chat_to_group.get(chat_id)
+
+    def flush(self) -> None:
+        """Write pending links now, merged over whatever other processes saved meanwhile."""
+        with self._lock:
+            if not self._pending:
+                return
+            if self._file_mtime() != self._mtime:
+                self._load()
+            data = {"group_to_chat": dict(self._group_to_chat), "chat_to_group": dict(self._chat_to_group)}
+            atomic_write_json(self.path, data, indent=2)
+            self._pending.clear()
+            self._mtime = self._file_mtime()
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._wake.wait()
+            time.sleep(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                lineoa_logger.error(f"id map flush failed ({self.path}): {e}")
+
+    def observe_event(self, event: Dict[str, Any]) -> None:
+        """LineBot listener: record the group id / chat id pair carried by an SSE event, if any."""
+        payload = event.get("payload") if isinstance(event, dict) else None
+        if not isinstance(payload, dict):
+            return
+        chat_id = payload.get("chatId")
+        inner = payload.get("payload") if isinstance(payload.get("payload"), dict) else {}
+        group_id = _find_group_id(payload, inner, inner.get("source"), inner.get("chat"), payload.get("source"))
+        if isinstance(chat_id, str) and chat_id and group_id:
+            self.link(group_id, chat_id)
+
+    def observe_chats(self, chats: Iterable[Dict[str, Any]]) -> None:
+        """Record group id / chat id pairs from get_chats entries."""
+        for chat in chats:
+            if not isinstance(chat, dict):
+                continue
+            chat_id = chat.get("chatId")
+            group_id = _find_group_id(chat, chat.get("profile"), chat.get("group"))
+            if isinstance(chat_id, str) and chat_id and group_id:
+                self.link(group_id, chat_id)
+
+
+_default_idmap: Optional[IdMap] = None
+_default_idmap_lock = threading.Lock()
+
+def default_idmap() -> IdMap:
+    global _default_idmap
+    if _default_idmap is None:
+        with _default_idmap_lock:
+            if _default_idmap is None:
+                _default_idmap = IdMap()
+    return _default_idmap
 
 def link_group_and_chat(group_id: str, chat_id: str):
-    data = _load_idmap()
-    data["group_to_chat"][group_id] = chat_id
-    data["chat_to_group"][chat_id] = group_id
-    _save_idmap(data)
+    default_idmap().link(group_id, chat_id)
 
 def get_chatid_from_groupid(group_id: str) -> Optional[str]:
-    data = _load_idmap()
-    return data["group_to_chat"].get(group_id)
+    return default_idmap().chat_id(group_id)
 
 def get_groupid_from_chatid(chat_id: str) -> Optional[str]:
-    data = _load_idmap()
-    return data["chat_to_group"].get(chat_id)
+    return default_idmap().group_id(chat_id)
 
 def ratelimiter(timestamps: list, limit: int = 18, window: float = 60) -> bool:
     """
@@ -54,4 +192,17 @@ def ratelimit_after(timestamps: list, limit: int = 18, window: float = 60) -> fl
     oldest = sorted(timestamps)[-limit]
     return oldest + window
 
-Ratelimiter = ratelimiter
\ No newline at end of file
+Ratelimiter = ratelimiter
+
+
+_ID_SEGMENT = re.compile(r"^(?:[UCR][0-9a-f]{32}|\d+|@.+|[0-9A-Za-z_-]{20,}|[0-9a-f-]{36})$")
+
+def url_template(url: str) -> str:
+    """
+    Reduce a request URL to its route, e.g. "chat.line.biz/api/v1/bots/{id}/chats/{id}/messages".
+    Query strings are dropped and id-like path segments are replaced, so the result
+    is safe to use as a low-cardinality metrics label.
+    """
+    parts = urlsplit(url)
+    segments = ["{id}" if _ID_SEGMENT.match(segment) else segment for segment in parts.path.split("/")]
+    return parts.netloc + "/".join(segments)
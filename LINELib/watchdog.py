@@ -0,0 +1,83 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from .logger import lineoa_logger
+
+
+class StreamWatchdog:
+    """
+    Watches an SSE connection from a side thread.
+    Every received line (events and ping comments) calls touch(); when nothing has
+    arrived for `stall_timeout` seconds, or the connection is older than
+    `max_stream_seconds`, the watchdog calls `on_trip` (normally closing the
+    response) so the listener reconnects and resumes from the last event id.
+    While an event is being handled (pause/resume) the stall clock is stopped,
+    so slow handlers are not mistaken for a dead connection.
+    """
+
+    STALLED = "stalled"
+    EXPIRED = "max_stream_seconds"
+
+    def __init__(self, stall_timeout: float, max_stream_seconds: Optional[float] = None, check_interval: Optional[float] = None):
+        self.stall_timeout = float(stall_timeout)
+        self.max_stream_seconds = max_stream_seconds
+        self.check_interval = check_interval if check_interval is not None else max(0.05, min(1.0, self.stall_timeout / 4))
+        self.reason: Optional[str] = None
+        self._started_at: Optional[float] = None
+        self._last_activity: Optional[float] = None
+        self._stall_base: Optional[float] = None
+        self._paused = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def tripped(self) -> bool:
+        return self.reason is not None
+
+    @property
+    def lag(self) -> float:
+        """Seconds since the last line was received on the current connection."""
+        last = self._last_activity
+        if last is None:
+            return 0.0
+        return time.monotonic() - last
+
+    def touch(self) -> None:
+        self._last_activity = self._stall_base = time.monotonic()
+
+    def pause(self) -> None:
+        self._paused = True
+
+    def resume(self) -> None:
+        self._stall_base = time.monotonic()
+        self._paused = False
+
+    def start(self, on_trip: Callable[[], None]) -> None:
+        self.stop()
+        self.reason = None
+        self._stop = threading.Event()
+        self._paused = False
+        self._started_at = self._last_activity = self._stall_base = time.monotonic()
+        self._thread = threading.Thread(target=self._run, args=(on_trip, self._stop), daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self, on_trip: Callable[[], None], stop: threading.Event) -> None:
+        while not stop.wait(self.check_interval):
+            now = time.monotonic()
+            if not self._paused and now - (self._stall_base or now) >= self.stall_timeout:
+                self.reason = self.STALLED
+            elif self.max_stream_seconds is not None and now - (self._started_at or now) >= self.max_stream_seconds:
+                self.reason = self.EXPIRED
+            else:
+                continue
+            if self.reason == self.STALLED:
+                lineoa_logger.error("SSE stream stalled: no data for %.1fs, reconnecting", self.lag)
+            try:
+                on_trip()
+            except Exception:
+                pass
+            return
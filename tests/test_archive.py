@@ -0,0 +1,58 @@
+from LINELib.archive import MessageArchive
+
+
+class _Lib:
+    """Serves a fixed history, newest first, honouring `since` like LINELib.iter_chat_messages."""
+
+    def __init__(self, history):
+        self.history = history
+        self.calls = []
+
+    def iter_chat_messages(self, bot_id, chat_id, since=None, page_size=50):
+        self.calls.append((chat_id, since))
+        for message in sorted(self.history.get(chat_id, []), key=lambda m: m["timestamp"], reverse=True):
+            if since is None or message["timestamp"] >= since:
+                yield message
+
+    def iter_chats(self, bot_id):
+        return []
+
+
+def _message(message_id, timestamp, text="hi"):
+    return {"id": message_id, "timestamp": timestamp, "type": "text", "text": text}
+
+
+def test_sync_only_fetches_messages_newer_than_the_last_run(tmp_path):
+    lib = _Lib({"Uchat": [_message("1", 1000), _message("2", 2000)]})
+    archive = MessageArchive(str(tmp_path / "archive.sqlite3"), lib=lib, fts=False)
+    assert archive.sync("Ubot", chat_ids=["Uchat"]) == 2
+    assert archive.last_message_id("Ubot", "Uchat") == "2"
+
+    lib.history["Uchat"].append(_message("3", 3000))
+    assert archive.sync("Ubot", chat_ids=["Uchat"]) == 1
+    assert lib.calls == [("Uchat", None), ("Uchat", 2000)]
+    assert [m["id"] for m in archive.get_messages("Ubot", "Uchat")] == ["1", "2", "3"]
+    archive.close()
+
+
+def test_stream_events_are_stored_once(tmp_path):
+    archive = MessageArchive(str(tmp_path / "archive.sqlite3"), fts=False)
+    event = {
+        "id": "e1",
+        "payload": {"botId": "Ubot", "chatId": "Uchat", "payload": {"message": {"id": "m1", "type": "text", "text": "hello"}, "timestamp": 5000}},
+    }
+    assert archive.store_event(event)
+    assert not archive.store_event(event)
+    assert archive.get_message("Ubot", "m1")["timestamp"] == 5000
+    assert not archive.store_event({"id": "e2", "payload": {"subEvent": "read"}})
+    archive.close()
+
+
+def test_reads_are_bounded_and_ordered(tmp_path):
+    archive = MessageArchive(str(tmp_path / "archive.sqlite3"), fts=False)
+    archive.store_messages("Ubot", "Uchat", [_message(str(i), i * 1000) for i in range(1, 6)])
+    messages = archive.get_messages("Ubot", "Uchat", since=2000, until=4000, newest_first=True)
+    assert [m["id"] for m in messages] == ["4", "3", "2"]
+    assert [m["id"] for m in archive.get_messages("Ubot", "Uchat", limit=2)] == ["1", "2"]
+    assert archive.chat_ids("Ubot") == ["Uchat"]
+    archive.close()
@@ -0,0 +1,27 @@
+from LINELib.archive import MessageArchive
+
+
+MESSAGES = [
+    {"id": "1", "timestamp": 1000, "type": "text", "text": "the invoice is attached"},
+    {"id": "2", "timestamp": 2000, "type": "text", "text": "thanks, see you tomorrow"},
+    {"id": "3", "timestamp": 3000, "type": "file", "fileName": "invoice-2026.pdf"},
+]
+
+
+def test_search_matches_text_and_file_names(tmp_path):
+    with MessageArchive(str(tmp_path / "archive.sqlite3")) as archive:
+        archive.store_messages("Ubot", "Uchat", MESSAGES)
+        archive.store_messages("Ubot", "Uother", [{"id": "9", "timestamp": 9000, "type": "text", "text": "invoice elsewhere"}])
+        assert sorted(hit["message_id"] for hit in archive.search("invoice", chat_ids=["Uchat"])) == ["1", "3"]
+        assert [hit["message_id"] for hit in archive.search("invoice", since=5000)] == ["9"]
+        assert archive.search("invoice", chat_ids=[]) == []
+
+
+def test_rows_stored_without_fts_are_indexed_on_reopen(tmp_path):
+    path = str(tmp_path / "archive.sqlite3")
+    with MessageArchive(path) as archive:
+        archive.store_messages("Ubot", "Uchat", MESSAGES[:1])
+    with MessageArchive(path, fts=False) as archive:
+        archive.store_messages("Ubot", "Uchat", MESSAGES[1:])
+    with MessageArchive(path) as archive:
+        assert [hit["message_id"] for hit in archive.search("tomorrow")] == ["2"]
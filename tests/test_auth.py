@@ -0,0 +1,35 @@
+import requests
+
+from LINELib import AuthService
+
+
+BROWSER_COOKIES = [
+    {"name": "ses", "value": "browser", "domain": ".line.biz", "path": "/"},
+    {"name": "XSRF-TOKEN", "value": "x1", "domain": "chat.line.biz", "path": "/"},
+]
+
+
+def _visit(self, url, **kwargs):
+    """A chat page visit: sets the bot's own cookie and rotates the session cookie."""
+    bot_id = url.rsplit("/", 1)[-1]
+    if bot_id != "Ubroken":
+        self.cookies.set("chat-bot", bot_id, domain="chat.line.biz", path=f"/{bot_id}")
+    self.cookies.set("ses", "rotated", domain=".line.biz", path="/")
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    return response
+
+
+def test_harvest_returns_only_cookies_the_visits_set_or_changed(monkeypatch):
+    monkeypatch.setattr(requests.Session, "get", _visit)
+    harvested, failed = AuthService()._harvest_bot_cookies(BROWSER_COOKIES, ["Ua", "Ub", "Ubroken"])
+
+    assert failed == ["Ubroken"]
+    assert {(c["name"], c["value"], c["path"]) for c in harvested} == {
+        ("chat-bot", "Ua", "/Ua"),
+        ("chat-bot", "Ub", "/Ub"),
+        ("ses", "rotated", "/"),
+    }
+    # the unchanged XSRF cookie is not sent back
+    assert not any(c["name"] == "XSRF-TOKEN" for c in harvested)
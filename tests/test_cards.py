@@ -0,0 +1,73 @@
+import itertools
+import json
+
+from LINELib import ChatService, LINELib, LINEOAError
+from LINELib.cards import CardPool
+
+SPEC = {"title": "item", "image_url": "https://example.com/a.png"}
+# the spec create_and_send_flex pools under, defaults included
+SENT_SPEC = dict(SPEC, tag_name="", tag_color="info", description="", action_label="", action_text="")
+
+
+class _Manager:
+    """Fake manager.line.biz card API: numbered cards, deletions recorded."""
+
+    def __init__(self, start=1):
+        self.ids = itertools.count(start)
+        self.created = []
+        self.deleted = []
+
+    def create(self, at_id, spec):
+        card_id = next(self.ids)
+        self.created.append(card_id)
+        return card_id
+
+    def delete(self, at_id, card_id):
+        self.deleted.append(card_id)
+
+
+def test_send_retries_once_with_a_new_card_when_the_pooled_card_is_gone(tmp_path):
+    manager = _Manager()
+    pool = CardPool(manager.create, manager.delete, path=str(tmp_path / "cards.json"))
+    dead = pool.acquire("@bot", SENT_SPEC)
+
+    service = ChatService()
+    sent = []
+
+    def send_flex_message(bot_id, chat_id, card_type_message_id, session=None, xsrf_token=None):
+        if card_type_message_id == dead:
+            raise LINEOAError("send_flex_message failed: HTTP 404", code=404)
+        sent.append(card_type_message_id)
+        return {}
+
+    service.send_flex_message = send_flex_message
+    service.create_card_type_message = lambda at_id, session=None, xsrf_token=None, **spec: manager.create(at_id, spec)
+
+    card_id = service.create_and_send_flex("Ubot", "@bot", "Uchat", card_pool=pool, **SPEC)
+    assert card_id != dead
+    assert sent == [card_id]
+    assert pool.acquire("@bot", SENT_SPEC) == card_id
+    assert pool.pending_deletes == 1
+
+
+def test_pools_sharing_an_index_keep_each_others_cards(tmp_path):
+    path = str(tmp_path / "cards.json")
+    first = CardPool(_Manager(1).create, _Manager().delete, path=path)
+    second = CardPool(_Manager(100).create, _Manager().delete, path=path)
+
+    first_id = first.acquire("@one", SPEC)
+    second_id = second.acquire("@two", SPEC)
+
+    with open(path, encoding="utf-8") as f:
+        saved = {entry["card_id"] for entry in json.load(f)["cards"].values()}
+    assert saved == {first_id, second_id}
+    # the second pool adopted the first pool's card instead of creating its own
+    assert second.acquire("@one", SPEC) == first_id
+
+
+def test_client_builds_its_card_pool_on_first_use(tmp_path):
+    lib = LINELib(storage=str(tmp_path / "lineoa-storage.json"))
+    lazy = ("cards", "id_map", "receipts", "typing", "clock", "state")
+    assert not any(name in vars(lib) for name in lazy)
+    assert lib.cards is lib.cards
+    assert lib.cards.path == str(tmp_path / "lineoa-storage.cards.json")
@@ -0,0 +1,98 @@
+import pytest
+
+from LINELib import LineBot
+from LINELib.LINELib import LINELib
+from LINELib.checkpoint import STREAM, FileCheckpointStore, SQLiteCheckpointStore
+
+
+def _message_event(event_id):
+    return {
+        "id": event_id,
+        "type": None,
+        "payload": {
+            "subEvent": "message",
+            "botId": "Ubot",
+            "chatId": "Uchat",
+            "payload": {"type": "message", "message": {"id": "m" + event_id, "type": "text", "text": "hi"}},
+        },
+        "received_at": 0.0,
+    }
+
+
+@pytest.fixture(params=["file", "sqlite"])
+def open_store(request, tmp_path):
+    stores = []
+
+    def open_store():
+        if request.param == "file":
+            store = FileCheckpointStore(str(tmp_path / "checkpoint.json"), flush_every=1, flush_interval=0)
+        else:
+            store = SQLiteCheckpointStore(str(tmp_path / "checkpoint.sqlite3"), flush_every=1, flush_interval=0)
+        stores.append(store)
+        return store
+
+    yield open_store
+    for store in stores:
+        store.close()
+
+
+@pytest.fixture
+def make_bot(tmp_path, monkeypatch):
+    monkeypatch.setattr(LINELib, "_fetch_bots", lambda self: None)
+
+    def make_bot(checkpoint):
+        return LineBot(cookie_path=str(tmp_path / "lineoa-storage.json"), clock_sync=False, checkpoint=checkpoint)
+
+    return make_bot
+
+
+def test_acks_survive_a_restart(open_store):
+    store = open_store()
+    store.ack(STREAM, "1")
+    store.ack(STREAM, "2")
+    store.close()
+    reopened = open_store()
+    assert reopened.last_event_id() == "2"
+    assert reopened.seen(STREAM, "1") and reopened.seen(STREAM, "2")
+    assert not reopened.seen(STREAM, "3")
+
+
+def test_a_failed_event_holds_the_position_until_it_is_acked(open_store):
+    store = open_store()
+    store.ack(STREAM, "1")
+    store.fail(STREAM, "2")
+    store.ack(STREAM, "3")
+    assert store.last_event_id() == "1"
+    assert store.failed() == {"2"}
+    store.ack(STREAM, "2")
+    assert store.last_event_id() == "3"
+    assert store.failed() == set()
+
+
+def test_a_failing_handler_is_retried_once_and_others_are_not_repeated(open_store, make_bot):
+    calls = []
+    attempts = {"2": 0}
+    bot = make_bot(open_store())
+
+    @bot.event
+    def on_message(event):
+        calls.append(event["id"])
+        if event["id"] in attempts:
+            attempts[event["id"]] += 1
+            if attempts[event["id"]] == 1:
+                raise RuntimeError("boom")
+
+    for event_id in ("1", "2", "3"):
+        bot.dispatch(None, _message_event(event_id))
+    assert bot.checkpoint.last_event_id() == "1"
+
+    # after a restart the stream resumes from "1", so the server replays "2" and "3"
+    bot.checkpoint.close()
+    bot = make_bot(open_store())
+    bot.handlers["on_message"] = on_message
+    assert bot.checkpoint.last_event_id() == "1"
+    for event_id in ("2", "3", "4"):
+        bot.dispatch(None, _message_event(event_id))
+
+    assert calls == ["1", "2", "3", "2", "4"]
+    assert bot.checkpoint.last_event_id() == "4"
@@ -0,0 +1,66 @@
+import re
+import time
+
+import pytest
+import requests
+
+from LINELib import ChatService
+from LINELib.clock import ClockSync
+
+
+class _Session(requests.Session):
+    """Serves a fixed SSE body."""
+
+    def __init__(self, body):
+        super().__init__()
+        self.body = body
+
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = _Raw(self.body)
+        response.encoding = "utf-8"
+        response.url = url
+        return response
+
+
+class _Raw:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, chunk_size, decode_content=True):
+        yield self.body
+
+    def close(self):
+        pass
+
+
+def test_sync_measures_the_skew_and_skips_unusable_samples():
+    server_now = (time.time() + 30) * 1000
+    responses = iter([{"now": server_now}, "not a time", {"serverTime": str(server_now)}])
+    clock = ClockSync(lambda: next(responses), samples=3)
+    clock.sync()
+    assert clock.synced
+    assert clock.skew == pytest.approx(30, abs=0.5)
+
+
+def test_failed_sync_keeps_the_local_clock():
+    clock = ClockSync(lambda: {"unrelated": 1})
+    clock.maybe_sync()
+    assert not clock.synced
+    assert clock.skew == pytest.approx(0, abs=0.01)
+
+
+def test_lag_is_measured_against_the_server_clock():
+    clock = ClockSync(lambda: {"now": time.time()})
+    clock.offset = 1000.0
+    assert clock.lag(999_000, monotonic=0.0) == pytest.approx(1.0)
+
+
+def test_stream_events_carry_the_receive_time():
+    session = _Session(b'id: 1\ndata: {"a": 1}\n\n')
+    before = time.monotonic()
+    [event] = ChatService().stream_events("token", session=session)
+    assert before <= event["received_at"] <= time.monotonic()
+    # the display time kept from before received_at existed
+    assert re.fullmatch(r"\d\d:\d\d:\d\d\.\d{3}", event["time"])
@@ -0,0 +1,114 @@
+import requests
+
+from LINELib import ChatService
+from LINELib.cache import ResponseCache
+from LINELib.endpoints import ENDPOINTS, EndpointClient
+
+
+class _Session(requests.Session):
+    """A real Session (so its cookies are used) that answers every request with `{}`."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        self.calls.append((method, url, params, headers))
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"{}"
+        response.url = url
+        return response
+
+
+# what the hand-written get_chats / get_chat_messages sent before they moved onto the registry
+BASELINE_HEADERS = {
+    "accept": "application/json, text/plain, */*",
+    "accept-encoding": "gzip, deflate, br, zstd",
+    "accept-language": "ja,en;q=0.9,en-GB;q=0.8,en-US;q=0.7",
+    "priority": "u=1, i",
+    "sec-ch-ua": '"Not(A:Brand";v="8", "Chromium";v="144", "Microsoft Edge";v="144"',
+    "sec-ch-ua-mobile": "?0",
+    "sec-ch-ua-platform": '"Windows"',
+    "sec-fetch-dest": "empty",
+    "sec-fetch-mode": "cors",
+    "sec-fetch-site": "same-origin",
+    "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36 Edg/144.0.0.0",
+    "x-oa-chat-client-version": "20240513144702",
+    "cookie": "__Host-chat-ses=s1; XSRF-TOKEN=cookie-token",
+    "x-xsrf-token": "token",
+}
+
+
+def _logged_in_session():
+    session = _Session()
+    session.cookies.set("__Host-chat-ses", "s1", domain="chat.line.biz")
+    session.cookies.set("XSRF-TOKEN", "cookie-token", domain="chat.line.biz")
+    return session
+
+
+def _sent(session):
+    method, url, params, headers = session.calls[-1]
+    prepared = requests.Request(method, url, params=params).prepare()
+    return prepared.url, {name.lower(): value for name, value in headers.items()}
+
+
+def test_get_chats_matches_the_baseline_request():
+    session = _logged_in_session()
+    ChatService().get_chats("Ubot", session=session, xsrf_token="token")
+    url, headers = _sent(session)
+    assert url == "https://chat.line.biz/api/v2/bots/Ubot/chats?folderType=ALL&tagIds=&autoTagIds=&limit=25&prioritizePinnedChat=true"
+    assert headers == dict(BASELINE_HEADERS, referer="https://chat.line.biz/Ubot")
+
+
+def test_get_chat_messages_matches_the_baseline_request():
+    session = _logged_in_session()
+    ChatService().get_chat_messages("Ubot", "Uchat", session=session, xsrf_token="token", before="123")
+    url, headers = _sent(session)
+    assert url == "https://chat.line.biz/api/v3/bots/Ubot/chats/Uchat/messages?limit=50&before=123"
+    assert headers == dict(BASELINE_HEADERS, referer="https://chat.line.biz/Ubot/chat/Uchat")
+
+
+def test_sends_use_the_same_browser_headers():
+    session = _logged_in_session()
+    ChatService().send_message("Ubot", "Uchat", {"type": "text", "text": "hi"}, session=session, xsrf_token="token")
+    _, headers = _sent(session)
+    assert headers == dict(
+        BASELINE_HEADERS,
+        referer="https://chat.line.biz/Ubot/chat/Uchat",
+        origin="https://chat.line.biz",
+        **{"content-type": "application/json"},
+    )
+
+
+def test_message_pages_use_v3_and_numeric_cursors():
+    session = _Session()
+    ChatService().get_chat_messages("Ubot", "Uchat", session=session, xsrf_token="token", before="123", after="cursor")
+    method, url, params, headers = session.calls[-1]
+    assert url == "https://chat.line.biz/api/v3/bots/Ubot/chats/Uchat/messages"
+    # non-numeric cursors are dropped, as before the wrappers
+    assert params == {"limit": 50, "before": 123}
+    assert headers["x-xsrf-token"] == "token"
+
+
+def test_xsrf_cookie_is_sent_when_no_token_is_given():
+    session = _Session()
+    session.cookies.set("XSRF-TOKEN", "from-cookie", domain="chat.line.biz")
+    ChatService().get_chats("Ubot", session=session)
+    assert [call[1] for call in session.calls] == ["https://chat.line.biz/api/v2/bots/Ubot/chats"]
+    assert session.calls[0][3]["x-xsrf-token"] == "from-cookie"
+
+
+def test_flex_json_cache_ignores_the_timestamp():
+    service = ChatService()
+    service.response_cache = ResponseCache({"flex_json": 60})
+    session = _Session()
+    service.get_flex_json("Ubot", "Uchat", "m1", timestamp=1, session=session)
+    service.get_flex_json("Ubot", "Uchat", "m1", timestamp=2, session=session)
+    assert len(session.calls) == 1
+
+
+def test_sends_are_not_in_the_registry():
+    # text and card sends only go through ChatService / LINELib, behind the rate limiter
+    assert "send_message" not in ENDPOINTS and "send_flex_message" not in ENDPOINTS
+    assert not hasattr(EndpointClient, "send_message")
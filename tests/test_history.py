@@ -0,0 +1,57 @@
+import asyncio
+
+from LINELib import ChatService
+
+
+# ten messages, ids 1..10, one second apart; pages are served newest first
+MESSAGES = [{"id": str(i), "timestamp": 1700000000000 + i * 1000} for i in range(1, 11)]
+
+
+def _page(limit, before=None):
+    older = [m for m in MESSAGES if before is None or int(m["id"]) < int(before)]
+    return {"list": list(reversed(older))[:limit]}
+
+
+def _service(calls):
+    service = ChatService()
+
+    def get_chat_messages(bot_id, chat_id, session=None, xsrf_token=None, limit=50, before=None, after=None):
+        calls.append(before)
+        return _page(limit, before)
+
+    async def async_get_chat_messages(bot_id, chat_id, cookies=None, xsrf_token=None, limit=50, before=None, after=None, session=None):
+        calls.append(before)
+        return _page(limit, before)
+
+    service.get_chat_messages = get_chat_messages
+    service.async_get_chat_messages = async_get_chat_messages
+    return service
+
+
+def test_iterates_every_page_newest_first():
+    calls = []
+    ids = [m["id"] for m in _service(calls).iter_chat_messages("Ubot", "Uchat", page_size=4)]
+    assert ids == [str(i) for i in range(10, 0, -1)]
+    # the walk ends on the first empty page
+    assert calls == [None, "7", "3", "1"]
+
+
+def test_since_and_until_bound_the_walk():
+    calls = []
+    since = MESSAGES[3]["timestamp"]
+    until = MESSAGES[7]["timestamp"]
+    ids = [m["id"] for m in _service(calls).iter_chat_messages("Ubot", "Uchat", since=since, until=until, page_size=4)]
+    assert ids == ["8", "7", "6", "5", "4"]
+    # the page holding a message older than `since` is the last one fetched
+    assert calls == [None, "7"]
+
+
+def test_async_iterator_matches_the_sync_one():
+    calls = []
+
+    async def collect():
+        service = _service(calls)
+        return [m["id"] async for m in service.async_iter_chat_messages("Ubot", "Uchat", page_size=4, session=object())]
+
+    assert asyncio.run(collect()) == [str(i) for i in range(10, 0, -1)]
+    assert calls == [None, "7", "3", "1"]
@@ -0,0 +1,73 @@
+import requests
+
+from LINELib import ChatService, LineBot
+from LINELib.LINELib import LINELib
+from LINELib.hooks import Hooks
+from LINELib.tracing import RecordingTracer, TracingHooks
+
+
+BOT_ID = "U" + "0123456789abcdef" * 2
+
+
+class _Session(requests.Session):
+    def request(self, method, url, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"{}"
+        response.url = url
+        return response
+
+
+def test_before_and_after_share_one_info_dict():
+    hooks = Hooks("test")
+    seen = []
+    hooks.on_before(lambda info: info.update(stash="span"))
+    hooks.on_after(lambda info: seen.append(info["stash"]))
+    info = {}
+    hooks.emit_before(info)
+    hooks.emit_after(info)
+    assert seen == ["span"]
+
+
+def test_a_failing_hook_does_not_stop_the_others():
+    hooks = Hooks("test")
+    calls = []
+
+    @hooks.on_before
+    def broken(info):
+        raise RuntimeError("boom")
+
+    hooks.on_before(lambda info: calls.append("ran"))
+    hooks.emit_before({})
+    assert calls == ["ran"]
+    hooks.remove(broken)
+    assert len(hooks.before) == 1
+
+
+def test_request_hooks_see_every_http_call():
+    service = ChatService()
+    finished = []
+    service.request_hooks.on_after(finished.append)
+    service.get_chats(BOT_ID, session=_Session(), xsrf_token="token")
+    [info] = finished
+    assert (info["method"], info["status"], info["error"]) == ("GET", 200, None)
+    assert info["url_template"] == "chat.line.biz/api/v2/bots/{id}/chats"
+    assert info["duration"] >= 0
+
+
+def test_tracing_records_request_and_event_spans(tmp_path, monkeypatch):
+    monkeypatch.setattr(LINELib, "_fetch_bots", lambda self: None)
+    bot = LineBot(cookie_path=str(tmp_path / "lineoa-storage.json"), clock_sync=False)
+    tracer = RecordingTracer()
+    tracing = TracingHooks(tracer).instrument(bot)
+
+    @bot.event
+    def on_message(event):
+        bot._lib._chat_service.get_chats(BOT_ID, session=_Session(), xsrf_token="token")
+
+    bot.dispatch(None, {"id": "1", "type": None, "payload": {"subEvent": "message", "payload": {"type": "message"}}})
+    assert [span.name for span in tracer.spans] == ["GET chat.line.biz/api/v2/bots/{id}/chats", "event message"]
+    assert tracer.spans[1].attributes["lineoa.handler"] == "on_message"
+
+    tracing.uninstrument()
+    assert not bot.event_hooks and not bot.request_hooks
@@ -0,0 +1,50 @@
+import json
+import os
+
+from LINELib.util import IdMap
+
+
+def _write(path, group_to_chat, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"group_to_chat": group_to_chat}, f)
+    os.utime(path, (mtime, mtime))
+
+
+def test_links_are_written_back_and_read_in_both_directions(tmp_path):
+    path = str(tmp_path / "id_map.json")
+    id_map = IdMap(path, flush_interval=60)
+    id_map.link("g1", "C1")
+    assert id_map.chat_id("g1") == "C1" and id_map.group_id("C1") == "g1"
+    # re-linking a group drops its old chat from the reverse index
+    id_map.link("g1", "C2")
+    assert id_map.group_id("C1") is None
+    id_map.flush()
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["group_to_chat"] == {"g1": "C2"}
+
+
+def test_changes_from_another_process_are_reloaded(tmp_path):
+    path = str(tmp_path / "id_map.json")
+    _write(path, {"g1": "C1"}, mtime=1000)
+    id_map = IdMap(path, reload_interval=0)
+    assert id_map.chat_id("g1") == "C1"
+    _write(path, {"g1": "C1", "g2": "C2"}, mtime=2000)
+    assert id_map.chat_id("g2") == "C2"
+
+
+def test_flush_merges_over_links_saved_meanwhile(tmp_path):
+    path = str(tmp_path / "id_map.json")
+    _write(path, {}, mtime=1000)
+    id_map = IdMap(path, flush_interval=60, reload_interval=60)
+    id_map.link("g1", "C1")
+    _write(path, {"g2": "C2"}, mtime=2000)
+    id_map.flush()
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["group_to_chat"] == {"g2": "C2", "g1": "C1"}
+
+
+def test_events_carrying_a_group_id_are_linked(tmp_path):
+    id_map = IdMap(str(tmp_path / "id_map.json"), flush_interval=60)
+    id_map.observe_event({"payload": {"chatId": "C9", "payload": {"source": {"groupId": "g9"}}}})
+    assert id_map.chat_id("g9") == "C9"
+    id_map.flush()
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# optional or heavy modules that must only load on first use
+DEFERRED = ("selenium", "aiohttp", "orjson", "http.server", "opentelemetry", "asyncio")
+
+# generous enough for a cold CI runner; a regression that pulls selenium or aiohttp back in costs more
+IMPORT_BUDGET = float(os.environ.get("LINEOA_IMPORT_BUDGET", "1.0"))
+
+_PROBE = """
+import json, sys, time
+started_at = time.perf_counter()
+import LINELib
+elapsed = time.perf_counter() - started_at
+loaded = sorted(name for name in sys.modules if name.split(".")[0] in {top} or name in {full})
+print(json.dumps({{"elapsed": elapsed, "loaded": loaded}}))
+"""
+
+
+def _import_lineoa():
+    tops = {name.split(".")[0] for name in DEFERRED if "." not in name}
+    full = {name for name in DEFERRED if "." in name}
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    env.pop("LINEOA_JSON_CODEC", None)
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(top=repr(tops), full=repr(full))],
+        env=env,
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_does_not_load_optional_modules():
+    assert _import_lineoa()["loaded"] == []
+
+
+def test_import_time_budget():
+    # best of three, so one slow cold start does not fail the run
+    elapsed = min(_import_lineoa()["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET, f"import LINELib took {elapsed:.3f}s (budget {IMPORT_BUDGET:.1f}s)"
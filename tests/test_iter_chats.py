@@ -0,0 +1,48 @@
+import pytest
+
+from LINELib import ChatService, LINEOAError
+
+
+def _chat(chat_id):
+    return {"chatId": chat_id, "chatType": "USER", "profile": {"name": chat_id}}
+
+
+# folderType -> pages, each page chained to the next by its `next` cursor
+PARTITIONS = {
+    "ALL": [[_chat("U1"), _chat("U2")], [_chat("U3")]],
+    "UNREAD": [[_chat("U2"), _chat("U4")]],
+}
+
+
+def _service(calls, fail=None):
+    service = ChatService()
+
+    def get_chats(bot_id, session=None, xsrf_token=None, folder_type="ALL", tag_ids="", limit=25, next_cursor=None, **kwargs):
+        calls.append((folder_type, next_cursor))
+        if folder_type == fail:
+            raise LINEOAError("get_chats failed", code=500)
+        index = int(next_cursor or 0)
+        pages = PARTITIONS[folder_type]
+        return {"list": pages[index], "next": str(index + 1) if index + 1 < len(pages) else None}
+
+    service.get_chats = get_chats
+    return service
+
+
+def test_follows_the_cursor_through_every_page():
+    calls = []
+    records = list(_service(calls).iter_chats("Ubot"))
+    assert [record.chat_id for record in records] == ["U1", "U2", "U3"]
+    assert calls == [("ALL", None), ("ALL", "1")]
+
+
+def test_partitions_are_merged_without_duplicates():
+    calls = []
+    records = list(_service(calls).iter_chats("Ubot", folder_types=("ALL", "UNREAD"), max_workers=2))
+    assert sorted(record.chat_id for record in records) == ["U1", "U2", "U3", "U4"]
+    assert sorted(calls, key=str) == [("ALL", "1"), ("ALL", None), ("UNREAD", None)]
+
+
+def test_a_failing_partition_raises():
+    with pytest.raises(LINEOAError):
+        list(_service([], fail="UNREAD").iter_chats("Ubot", folder_types=("ALL", "UNREAD")))
@@ -0,0 +1,41 @@
+import pytest
+
+from LINELib import jsoncodec
+
+
+SAMPLE = {"text": "こんにちは", "list": [1, 2.5, None, True], "nested": {"b": 1, "a": 2}}
+
+
+@pytest.fixture(autouse=True)
+def restore_codec():
+    yield
+    jsoncodec.set_codec(None)
+
+
+@pytest.fixture
+def orjson_codec():
+    pytest.importorskip("orjson")
+    return jsoncodec.OrjsonCodec()
+
+
+def test_orjson_output_matches_stdlib(orjson_codec):
+    stdlib = jsoncodec.JSONCodec()
+    assert orjson_codec.dumps(SAMPLE) == stdlib.dumps(SAMPLE)
+    assert orjson_codec.dumpb(SAMPLE) == stdlib.dumpb(SAMPLE)
+    assert orjson_codec.dumps(SAMPLE, indent=2, sort_keys=True) == stdlib.dumps(SAMPLE, indent=2, sort_keys=True)
+    assert orjson_codec.loads(stdlib.dumpb(SAMPLE)) == SAMPLE
+
+
+def test_orjson_falls_back_for_what_it_refuses(orjson_codec):
+    assert orjson_codec.dumps({1: "int key"}) == '{"1":"int key"}'
+    assert orjson_codec.dumps({"big": 2 ** 70}) == '{"big":%d}' % 2 ** 70
+    assert orjson_codec.dumps({"a": 1}, indent=4) == '{\n    "a": 1\n}'
+
+
+def test_codec_can_be_chosen_by_name_or_environment(monkeypatch):
+    assert jsoncodec.set_codec("json").name == "json"
+    assert jsoncodec.loads(b'{"a": 1}') == {"a": 1}
+    with pytest.raises(ValueError):
+        jsoncodec.set_codec("simplejson")
+    monkeypatch.setenv("LINEOA_JSON_CODEC", "json")
+    assert jsoncodec.set_codec(None).name == "json"
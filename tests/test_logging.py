@@ -0,0 +1,45 @@
+import io
+import json
+import logging
+import queue
+
+from LINELib.logger import DroppingQueueHandler, LineOALogger
+
+
+def _logger(name, **options):
+    stream = io.StringIO()
+    log = LineOALogger(name).configure(stream=stream, **options)
+    return log, stream
+
+
+def test_json_lines_carry_the_context_fields():
+    log, stream = _logger("test-json", json_lines=True)
+    log.info("sent %s", "hi", bot_id="Ubot", chat_id="Uchat")
+    record = json.loads(stream.getvalue())
+    assert (record["message"], record["tag"], record["bot_id"], record["chat_id"]) == ("sent hi", "INFO", "Ubot", "Uchat")
+    assert "event_id" not in record
+
+
+def test_queued_records_are_written_by_the_listener():
+    log, stream = _logger("test-queue", use_queue=True)
+    for i in range(5):
+        log.info("record %s", i)
+    log.stop()
+    assert stream.getvalue().count("[INFO] [INFO] record") == 5
+
+
+def test_sampling_thins_info_but_keeps_errors():
+    log, stream = _logger("test-sample", sample_rate=0.25)
+    for i in range(8):
+        log.info("tick %s", i)
+        log.error("failure %s", i)
+    output = stream.getvalue()
+    assert output.count("tick") == 2
+    assert output.count("failure") == 8
+
+
+def test_a_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    for i in range(3):
+        handler.handle(logging.makeLogRecord({"msg": f"record {i}"}))
+    assert handler.dropped == 2
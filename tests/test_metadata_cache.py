@@ -0,0 +1,66 @@
+import pytest
+
+from LINELib import LineBot
+from LINELib.LINELib import ChatsInfo, LINELib
+
+
+def _message_event(chat_id, event_id="1"):
+    """A chat message as stream_events yields it (no `event:` line, JSON data)."""
+    return {
+        "id": event_id,
+        "type": None,
+        "payload": {
+            "subEvent": "message",
+            "botId": "Ubot",
+            "chatId": chat_id,
+            "payload": {
+                "type": "message",
+                "message": {"id": "100" + event_id, "type": "text", "text": "hi", "timestamp": 1700000000000},
+            },
+        },
+        "received_at": 0.0,
+    }
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    fetched = []
+
+    def fetch_chats(self, bot_id):
+        fetched.append(bot_id)
+        return ChatsInfo([{"chatId": "Uknown", "chatType": "USER", "profile": {"name": "known"}}])
+
+    monkeypatch.setattr(LINELib, "_fetch_bots", lambda self: None)
+    monkeypatch.setattr(LINELib, "_fetch_chats", fetch_chats)
+    bot = LineBot(cookie_path=str(tmp_path / "lineoa-storage.json"), clock_sync=False)
+    bot.fetched = fetched
+    return bot
+
+
+def test_message_from_a_new_chat_drops_the_cached_chat_list(bot):
+    metadata = bot._lib.metadata
+    assert "Uknown" in metadata.chats("Ubot")
+
+    bot.dispatch(None, _message_event("Uknown", "1"))
+    metadata.chats("Ubot")
+    assert bot.fetched == ["Ubot"]
+
+    bot.dispatch(None, _message_event("Unew", "2"))
+    metadata.chats("Ubot")
+    assert bot.fetched == ["Ubot", "Ubot"]
+
+
+def test_init_drops_every_chat_entry(bot):
+    metadata = bot._lib.metadata
+    metadata.chats("Ubot")
+    bot.dispatch("init", {"id": None, "type": "init", "payload": {"event": "init"}, "received_at": 0.0})
+    metadata.chats("Ubot")
+    assert bot.fetched == ["Ubot", "Ubot"]
+
+
+def test_ping_keeps_the_cache(bot):
+    metadata = bot._lib.metadata
+    metadata.chats("Ubot")
+    bot.dispatch("ping", {"id": None, "type": "ping", "payload": {"event": "ping"}, "received_at": 0.0})
+    metadata.chats("Ubot")
+    assert bot.fetched == ["Ubot"]
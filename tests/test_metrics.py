@@ -0,0 +1,69 @@
+import urllib.request
+
+import pytest
+
+from LINELib.metrics import MetricsRegistry, start_http_server
+
+
+def test_counters_and_gauges_render_as_prometheus_text():
+    registry = MetricsRegistry()
+    requests_total = registry.counter("t_requests_total", "Requests.", ("method",))
+    depth = registry.gauge("t_depth", "Depth.")
+    requests_total.inc(method="GET")
+    requests_total.inc(2, method='P"OST')
+    depth.inc()
+    depth.dec(0.5)
+    assert registry.render().splitlines() == [
+        "# HELP t_requests_total Requests.",
+        "# TYPE t_requests_total counter",
+        't_requests_total{method="GET"} 1',
+        't_requests_total{method="P\\"OST"} 2',
+        "# HELP t_depth Depth.",
+        "# TYPE t_depth gauge",
+        "t_depth 0.5",
+    ]
+
+
+def test_histograms_render_cumulative_buckets():
+    registry = MetricsRegistry()
+    latency = registry.histogram("t_latency_seconds", "Latency.", ("endpoint",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, endpoint="x")
+    assert registry.render().splitlines()[2:] == [
+        't_latency_seconds_bucket{endpoint="x",le="0.1"} 1',
+        't_latency_seconds_bucket{endpoint="x",le="1"} 2',
+        't_latency_seconds_bucket{endpoint="x",le="+Inf"} 3',
+        't_latency_seconds_sum{endpoint="x"} 5.55',
+        't_latency_seconds_count{endpoint="x"} 3',
+    ]
+
+
+def test_registration_and_labels_are_checked():
+    registry = MetricsRegistry()
+    counter = registry.counter("t_total", "Total.", ("kind",))
+    assert registry.counter("t_total", "Total.", ("kind",)) is counter
+    with pytest.raises(ValueError):
+        registry.gauge("t_total", "Total.", ("kind",))
+    with pytest.raises(ValueError):
+        counter.inc(other="x")
+    with pytest.raises(ValueError):
+        counter.inc(-1, kind="x")
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    counter = registry.counter("t_total", "Total.")
+    counter.inc()
+    assert counter.value() == 0.0
+
+
+def test_http_endpoint_serves_the_registry():
+    registry = MetricsRegistry()
+    registry.counter("t_served_total", "Served.").inc()
+    server = start_http_server(port=0, registry=registry)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:
+            assert "t_served_total 1" in response.read().decode("utf-8")
+    finally:
+        server.shutdown()
+        server.server_close()
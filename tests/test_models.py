@@ -0,0 +1,44 @@
+from LINELib.LINELib import BotsInfo, ChatsInfo
+from LINELib.models import BotRecord, ChatRecord
+
+
+def _chat(chat_id, chat_type="USER", name=None):
+    return {"chatId": chat_id, "chatType": chat_type, "profile": {"name": name or chat_id}}
+
+
+def test_records_are_hashable_and_consistent_with_equality():
+    a = ChatRecord("U1", "USER", "alice")
+    assert a == ChatRecord("U1", "USER", "alice")
+    assert a != ChatRecord("U1", "USER", "renamed")
+    assert {a, ChatRecord("U1", "USER", "alice")} == {a}
+    assert {BotRecord("Ubot", "@bot"): 1}[BotRecord("Ubot", "@bot")] == 1
+
+
+def test_chats_are_indexed_by_id_name_and_type():
+    chats = ChatsInfo([_chat("U1", name="alice"), _chat("C1", "GROUP", "team"), _chat("U2", name="alice")])
+    assert "U1" in chats and len(chats) == 3
+    assert chats.get("C1").name == "team"
+    assert [record.chat_id for record in chats.by_name("alice")] == ["U1", "U2"]
+    assert chats.user.ids == ["U1", "U2"]
+    assert chats.group.ids == ["C1"]
+
+
+def test_type_views_follow_add_and_remove():
+    chats = ChatsInfo([_chat("U1")])
+    assert chats.user.ids == ["U1"]
+    chats.add(_chat("U2"))
+    chats.remove("U1")
+    assert chats.user.ids == ["U2"]
+    # re-adding an id with a new type moves it between views
+    chats.add(_chat("U2", "GROUP"))
+    assert chats.user.ids == [] and chats.group.ids == ["U2"]
+
+
+def test_bots_are_indexed_by_search_id_and_name():
+    bots = BotsInfo([{"botId": "Ubot", "basicSearchId": "@abc", "name": "shop"}])
+    assert bots.by_search_id("abc").bot_id == "Ubot"
+    assert bots.by_search_id("@abc").bot_id == "Ubot"
+    assert bots.by_name("shop").bot_id == "Ubot"
+    assert bots.ids == {"@abc": "Ubot"} and bots.first_id == "Ubot"
+    bots.remove("Ubot")
+    assert bots.by_name("shop") is None and bots.first_id is None
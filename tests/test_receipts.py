@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+from LINELib.receipts import ReadReceipts
+
+
+def test_marks_for_one_chat_coalesce_into_the_newest():
+    sent = []
+    receipts = ReadReceipts(lambda *args: sent.append(args), debounce=60, max_delay=60)
+    receipts.mark("Ubot", "Uchat", "m2", timestamp=2000)
+    receipts.mark("Ubot", "Uchat", "m1", timestamp=1000)
+    receipts.mark("Ubot", "Uother", "m9", timestamp=9000)
+    assert receipts.pending == 2
+    results = receipts.flush()
+    assert sorted(sent) == [("Ubot", "Uchat", "m2", 2000), ("Ubot", "Uother", "m9", 9000)]
+    assert set(results) == {("Ubot", "Uchat"), ("Ubot", "Uother")}
+    receipts.close()
+
+
+def test_a_quiet_chat_is_sent_after_the_debounce():
+    sent = threading.Event()
+    receipts = ReadReceipts(lambda *args: sent.set(), debounce=0.05, max_delay=1)
+    started_at = time.monotonic()
+    receipts.mark("Ubot", "Uchat", "m1", timestamp=1)
+    assert sent.wait(2)
+    assert time.monotonic() - started_at >= 0.05
+    receipts.close()
+
+
+def test_errors_are_returned_per_chat_and_close_sends_the_rest():
+    def mark(bot_id, chat_id, message_id, timestamp):
+        if chat_id == "Ubad":
+            raise RuntimeError("boom")
+        return "ok"
+
+    receipts = ReadReceipts(mark, debounce=60, max_delay=60)
+    receipts.mark("Ubot", "Ubad", "m1", timestamp=1)
+    results = receipts.flush()
+    assert isinstance(results[("Ubot", "Ubad")], RuntimeError)
+    receipts.mark("Ubot", "Ugood", "m2", timestamp=2)
+    receipts.close()
+    assert receipts.pending == 0
+
+
+def test_debounce_must_not_exceed_max_delay():
+    with pytest.raises(ValueError):
+        ReadReceipts(lambda *args: None, debounce=2, max_delay=1)
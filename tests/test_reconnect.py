@@ -0,0 +1,96 @@
+import pytest
+import requests
+
+from LINELib import ChatService, LineBot, LINEOAError, ListenConfig
+from LINELib.LINELib import LINELib
+from LINELib.reconnect import ReconnectPolicy
+from LINELib.watchdog import StreamWatchdog
+
+
+class _Session:
+    """Stands in for a requests.Session; every request gets the same canned response."""
+
+    def __init__(self, status_code, body=b""):
+        self.status_code = status_code
+        self.body = body
+        self.calls = []
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        response = requests.Response()
+        response.status_code = self.status_code
+        response._content = self.body
+        response.url = url
+        return response
+
+
+@pytest.mark.parametrize("status", [401, 403])
+def test_auth_failure_on_token_fetch_opens_circuit(status):
+    session = _Session(status, b'{"message":"unauthorized"}')
+    with pytest.raises(LINEOAError) as excinfo:
+        ChatService().get_streaming_api_token("Ubot", session=session, xsrf_token="token")
+    assert excinfo.value.code == status
+    assert session.calls and session.calls[0][0] == "POST"
+
+    policy = ReconnectPolicy(ListenConfig(auth_failure_cooldown=600), rand=lambda: 0.0)
+    policy.attempt()
+    assert ReconnectPolicy.is_auth_error(excinfo.value)
+    assert policy.on_failure(excinfo.value) == 600
+    assert policy.state == ReconnectPolicy.OPEN
+    assert policy.auth_failures == 1 and policy.failures == 0
+
+
+def test_server_error_on_token_fetch_backs_off():
+    with pytest.raises(LINEOAError) as excinfo:
+        ChatService().get_streaming_api_token("Ubot", session=_Session(503))
+    assert excinfo.value.code == 503
+
+    policy = ReconnectPolicy(ListenConfig(reconnect_interval=2), rand=lambda: 0.0)
+    policy.attempt()
+    assert policy.on_failure(excinfo.value) == 2
+    assert policy.state == ReconnectPolicy.BACKOFF
+
+
+def test_stalled_streams_back_off_and_keep_counting_failures(tmp_path, monkeypatch):
+    monkeypatch.setattr(LINELib, "_fetch_bots", lambda self: None)
+    bot = LineBot(
+        cookie_path=str(tmp_path / "lineoa-storage.json"),
+        clock_sync=False,
+        reconnect_interval=0.01,
+        backoff_jitter=0,
+    )
+    states = []
+    calls = []
+
+    @bot.event
+    def on_connection_state(info):
+        states.append(info)
+
+    def listen(**kwargs):
+        calls.append(kwargs["last_event_id"])
+        if len(calls) == 1:
+            # the first stream delivers an event before going silent
+            kwargs["on_event"]({"id": "1", "type": "ping", "payload": {}, "received_at": 0.0})
+        elif len(calls) == 3:
+            bot._stop_event.set()
+        # the watchdog cut the stream: the call returns without raising
+        bot.watchdog.reason = StreamWatchdog.STALLED
+        return "1"
+
+    monkeypatch.setattr(bot._lib, "get_streaming_api_token_and_listen_stream_events", listen)
+    bot._polling_loop("Ubot")
+
+    backoffs = [info for info in states if info["state"] == ReconnectPolicy.BACKOFF]
+    assert [info["failures"] for info in backoffs] == [1, 2]
+    assert [info["delay"] for info in backoffs] == pytest.approx([0.01, 0.02])
+
+
+def test_a_quiet_stream_that_closes_quickly_is_not_clean():
+    policy = ReconnectPolicy(ListenConfig(reconnect_interval=2), rand=lambda: 0.0)
+    policy.attempt()
+    assert policy.on_clean() == 2
+    assert policy.failures == 1
+    policy.attempt()
+    policy.on_connected()
+    assert policy.on_clean() == 0.0
+    assert policy.failures == 0
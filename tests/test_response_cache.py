@@ -0,0 +1,64 @@
+import time
+
+import requests
+
+from LINELib import ChatService
+from LINELib.cache import ResponseCache, TTLCache
+
+
+class _Session(requests.Session):
+    """Answers with canned responses in order; records the headers of each request."""
+
+    def __init__(self, *responses):
+        super().__init__()
+        self.responses = list(responses)
+        self.calls = []
+
+    def request(self, method, url, params=None, headers=None, **kwargs):
+        self.calls.append(dict(headers or {}))
+        status_code, body, response_headers = self.responses.pop(0)
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = body
+        response.headers.update(response_headers)
+        response.url = url
+        return response
+
+
+def _service(ttl):
+    service = ChatService()
+    service.response_cache = ResponseCache({"holiday": ttl})
+    return service
+
+
+def test_fresh_entries_are_served_without_a_request():
+    session = _Session((200, b'{"holidays": ["2026-01-01"]}', {}))
+    service = _service(60)
+    first = service.get_holiday("JP", session=session)
+    second = service.get_holiday("JP", session=session)
+    assert first == second == {"holidays": ["2026-01-01"]}
+    assert len(session.calls) == 1
+
+
+def test_callers_get_copies_they_can_mutate():
+    session = _Session((200, b'{"holidays": ["2026-01-01"]}', {}))
+    service = _service(60)
+    service.get_holiday("JP", session=session)["holidays"].append("mutated")
+    assert service.get_holiday("JP", session=session) == {"holidays": ["2026-01-01"]}
+
+
+def test_stale_entries_are_revalidated_with_the_etag():
+    session = _Session((200, b'{"holidays": []}', {"ETag": '"v1"'}), (304, b"", {}))
+    service = _service(0.01)
+    service.get_holiday("JP", session=session)
+    time.sleep(0.02)
+    assert service.get_holiday("JP", session=session) == {"holidays": []}
+    assert session.calls[1]["If-None-Match"] == '"v1"'
+
+
+def test_ttl_cache_hands_out_copies():
+    cache = TTLCache(ttl=60)
+    loaded = cache.get_or_load("k", lambda: {"items": [1]})
+    loaded["items"].append(2)
+    assert cache.get("k") == {"items": [1]}
+    assert cache.get_or_load("k", lambda: {"items": []}) == {"items": [1]}
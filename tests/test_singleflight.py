@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from LINELib.singleflight import AsyncSingleFlight, SingleFlight, freeze
+
+
+def test_concurrent_calls_share_one_run():
+    flights = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def fetch():
+        runs.append(1)
+        release.wait(5)
+        return {"ok": True}
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flights.do, "key", fetch) for _ in range(4)]
+        # give every caller time to join the first one's flight
+        time.sleep(0.2)
+        release.set()
+        results = [future.result() for future in futures]
+    assert len(runs) == 1
+    assert all(result is results[0] for result in results)
+    assert flights.in_flight() == 0
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    flights = SingleFlight()
+    with pytest.raises(RuntimeError):
+        flights.do("key", lambda: (_ for _ in ()).throw(RuntimeError("boom")))
+    assert flights.do("key", lambda: "retried") == "retried"
+
+
+def test_async_flight_survives_a_cancelled_caller():
+    flights = AsyncSingleFlight()
+    runs = []
+
+    async def fetch():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "value"
+
+    async def main():
+        first = asyncio.ensure_future(flights.do("key", fetch))
+        second = asyncio.ensure_future(flights.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "value"
+    assert runs == [1]
+
+
+def test_freeze_makes_nested_params_hashable():
+    assert freeze({"b": [1, {"c": 2}], "a": 1}) == freeze({"a": 1, "b": (1, {"c": 2})})
+    hash(freeze({"tags": {"x", "y"}}))
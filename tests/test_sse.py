@@ -0,0 +1,38 @@
+import dataclasses
+
+from LINELib.sse import SSEEvent, SSEParser, event_timestamp, normalize_message
+
+
+IMAGE_PAYLOAD = {
+    "subEvent": "message",
+    "botId": "Ubot",
+    "chatId": "Uchat",
+    "payload": {"message": {"id": "m1", "type": "image", "contentHash": "abc", "timestamp": 1700000000000}},
+}
+
+
+def test_parser_splits_events_and_skips_comments():
+    lines = [": ping", "", "id: 1", "event: chat", 'data: {"a": 1}', "", "id: 2", "data: line one", "data: line two"]
+    events = list(SSEParser.iter_events(lines))
+    assert [(e.id, e.event) for e in events] == [("1", "chat"), ("2", None)]
+    assert events[0].payload == {"a": 1}
+    # data that is not JSON stays a string, with multi-line data joined
+    assert events[1].payload == "line one\nline two"
+
+
+def test_payload_is_parsed_once_and_kept_out_of_equality():
+    event = SSEEvent.from_payload("1", None, IMAGE_PAYLOAD)
+    assert event.payload is IMAGE_PAYLOAD
+    assert event == SSEEvent("1", None, event.data)
+    assert dataclasses.asdict(event) == event.as_dict()
+    assert event.normalized_message() is event.normalized_message()
+
+
+def test_media_messages_are_normalized():
+    normalized = normalize_message(IMAGE_PAYLOAD)
+    assert normalized["kind"] == "media"
+    assert normalized["media_url"] == "https://chat-content.line.biz/bot/Ubot/abc/preview"
+    assert normalized["extension"] == "jpg"
+    assert SSEEvent.from_payload("1", None, IMAGE_PAYLOAD).image_url() == normalized["media_url"]
+    assert event_timestamp(IMAGE_PAYLOAD) == 1700000000000
+    assert normalize_message({"subEvent": "read"}) is None
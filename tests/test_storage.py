@@ -0,0 +1,43 @@
+import json
+import os
+import time
+
+from LINELib import LINELib
+from LINELib.storage import CredentialStore, StateStore
+
+
+def test_state_database_is_only_created_on_first_use(tmp_path):
+    storage = str(tmp_path / "lineoa-storage.json")
+    lib = LINELib(storage=storage)
+    assert os.listdir(tmp_path) == []
+
+    assert lib.check_rate_limit()["count"] == 0
+    assert os.path.exists(StateStore.path_for(storage))
+
+
+def test_legacy_send_history_moves_out_of_the_credential_file(tmp_path):
+    storage = tmp_path / "lineoa-storage.json"
+    now = time.time()
+    storage.write_text(json.dumps({"cookies": [], "SendTimestamps": [now - 1, now], "FinalsendTime": now}))
+    lib = LINELib(storage=str(storage))
+
+    assert lib.get_send_timestamps() == [now - 1, now]
+    assert lib.get_final_send_time() == now
+    assert json.loads(storage.read_text()) == {"cookies": []}
+
+
+def test_state_store_keeps_the_newest_timestamps(tmp_path):
+    state = StateStore(str(tmp_path / "state.sqlite3"), keep=3)
+    for timestamp in range(1, 6):
+        state.add_send_timestamp(timestamp)
+    assert state.send_timestamps() == [3.0, 4.0, 5.0]
+    state.close()
+
+
+def test_credential_save_replaces_the_file_atomically(tmp_path):
+    path = tmp_path / "cookies.json"
+    store = CredentialStore(str(path))
+    store.save({"cookies": [{"name": "a", "value": "1"}]})
+    assert json.loads(path.read_text()) == {"cookies": [{"name": "a", "value": "1"}]}
+    # no temp files are left next to it
+    assert os.listdir(tmp_path) == ["cookies.json"]
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from LINELib.typing_indicator import TypingIndicator
+
+
+def test_pings_are_throttled_per_chat():
+    sent = []
+    typing = TypingIndicator(lambda *key: sent.append(key), interval=60)
+    assert typing.ping("Ubot", "Ua")
+    assert not typing.ping("Ubot", "Ua")
+    assert typing.ping("Ubot", "Ub")
+    assert sent == [("Ubot", "Ua"), ("Ubot", "Ub")]
+
+
+def test_keepalive_runs_until_the_block_exits():
+    sent = []
+    typing = TypingIndicator(lambda *key: sent.append(time.monotonic()), interval=0.05)
+    with typing.typing("Ubot", "Ua"):
+        assert typing.active("Ubot", "Ua")
+        time.sleep(0.18)
+    count = len(sent)
+    assert count >= 3
+    time.sleep(0.12)
+    assert len(sent) == count
+    assert not typing.active("Ubot", "Ua")
+
+
+def test_stop_after_a_reply_lifts_the_throttle():
+    sent = []
+    typing = TypingIndicator(lambda *key: sent.append(key), interval=60)
+    with typing.typing("Ubot", "Ua"):
+        typing.stop("Ubot", "Ua")
+        assert not typing.active("Ubot", "Ua")
+        assert typing.ping("Ubot", "Ua")
+    assert len(sent) == 2
+
+
+def test_failed_sends_still_count_against_the_throttle():
+    attempts = []
+
+    def send(bot_id, chat_id):
+        attempts.append(chat_id)
+        raise RuntimeError("boom")
+
+    typing = TypingIndicator(send, interval=60)
+    assert not typing.ping("Ubot", "Ua")
+    assert not typing.ping("Ubot", "Ua")
+    assert attempts == ["Ua"]
+    with pytest.raises(ValueError):
+        TypingIndicator(send, interval=5, keepalive=1)
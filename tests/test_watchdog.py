@@ -0,0 +1,62 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from LINELib import ChatService
+from LINELib.watchdog import StreamWatchdog
+
+
+class _SilentStream(BaseHTTPRequestHandler):
+    """Sends one event as a chunk (like the real SSE endpoint), then keeps the connection open without writing anything."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        body = b': ping\n\nid: 1\ndata: {"a":1}\n\n'
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(body), body))
+        self.wfile.flush()
+        self.server.release.wait(30)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def silent_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SilentStream)
+    server.daemon_threads = True
+    server.release = threading.Event()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def test_stalled_stream_ends_when_watchdog_trips(silent_server):
+    watchdog = StreamWatchdog(0.5)
+    started_at = time.monotonic()
+    events = list(ChatService().stream_events("token", ping_secs=1, base_url=silent_server, watchdog=watchdog))
+    elapsed = time.monotonic() - started_at
+
+    assert [event["id"] for event in events] == ["1"]
+    assert watchdog.reason == StreamWatchdog.STALLED
+    # the blocked read ends on the read timeout (ping_secs * 1.5), not the old fixed 90s
+    assert elapsed < 3
+
+
+def test_read_timeout_is_reported_as_a_stall(silent_server):
+    # the watchdog itself would wait far longer; the read timeout from ping_secs ends the stream first
+    watchdog = StreamWatchdog(30)
+    started_at = time.monotonic()
+    events = list(ChatService().stream_events("token", ping_secs=1, base_url=silent_server, watchdog=watchdog))
+
+    assert [event["id"] for event in events] == ["1"]
+    assert watchdog.reason == StreamWatchdog.STALLED
+    assert time.monotonic() - started_at < 3